@@ -6,18 +6,42 @@ from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 
 from config import config
+from commands import register_commands
 from models import db
 
 # Import routes
+from routes.health import health_bp
+from routes.metrics import metrics_bp
 from routes.auth import auth_bp
 from routes.tenants import tenants_bp
 from routes.users import users_bp
 from routes.projects import projects_bp
 from routes.lists import lists_bp
 from routes.tasks import tasks_bp
+from routes.batch import batch_bp
+from routes.profiles import profiles_bp
+from routes.slow_queries import slow_queries_bp
 
 # Import middleware
+from middleware.compression import compression
+from middleware.metrics import request_metrics
+from middleware.profiler import request_profiler
+from middleware.tracing import request_tracer
 from middleware.tenant_middleware import TenantMiddleware
+from middleware.query_budget import query_budget
+from middleware.query_guard import query_guard
+from middleware.replica import replica_router
+
+# Import background services
+from utils.activity import activity
+from utils.events import board_events
+from utils.passwords import password_hasher
+from utils.revocation import revocation_store
+from utils.slow_queries import slow_query_log
+from utils.write_behind import write_behind
+from utils.database import ensure_master_tables
+from utils.fieldsets import FieldsetError
+from utils.readiness import readiness
 
 
 def create_app(config_name=None):
@@ -31,47 +55,69 @@ def create_app(config_name=None):
     # Initialize extensions
     db.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
-    JWTManager(app)
+    jwt = JWTManager(app)
     Migrate(app, db)
     
+    # Trace sampled requests (registered first so the root span covers all hooks)
+    request_tracer.init_app(app)
+    
+    # Record request metrics (registered early so its hooks wrap the others)
+    request_metrics.init_app(app)
+    
+    # Compress JSON responses (runs after every other after_request hook)
+    compression.init_app(app)
+    
+    # Initialize token revocation (JWT blocklist)
+    revocation_store.init_app(app, jwt)
+    
+    # Initialize password hashing service
+    password_hasher.init_app(app)
+    
     # Initialize multi-tenant middleware
     TenantMiddleware(app)
     
+    # Profile single requests on demand (after the tenant is resolved)
+    request_profiler.init_app(app)
+    
+    # Initialize per-tenant/per-endpoint query timeouts and circuit breakers
+    query_budget.init_app(app)
+    
+    # Count sampled requests' queries against per-route budgets (N+1 guard)
+    query_guard.init_app(app)
+    
+    # Log slow statements and capture plans of repeat offenders
+    slow_query_log.init_app(app)
+    
+    # Route safe reads to the read replica, if one is configured
+    replica_router.init_app(app)
+    
+    # Initialize live board event fan-out
+    board_events.init_app(app)
+    
+    # Initialize batched activity recording
+    activity.init_app(app)
+    
+    # Initialize write-behind buffer for low-value updates
+    write_behind.init_app(app)
+    
+    # Initialize deep readiness checks (/health/ready)
+    readiness.init_app(app)
+    
     # Register blueprints
+    app.register_blueprint(health_bp)
+    app.register_blueprint(metrics_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(tenants_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(projects_bp)
     app.register_blueprint(lists_bp)
     app.register_blueprint(tasks_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(profiles_bp)
+    app.register_blueprint(slow_queries_bp)
     
-    # Initialize database tables on first run
-    with app.app_context():
-        try:
-            # Check if tables exist by trying to query
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            
-            if not tables or 'tenants' not in tables:
-                print("📦 Initializing database tables...")
-                db.create_all()
-                print("✅ Database tables created successfully!")
-            else:
-                print(f"✓ Database already initialized ({len(tables)} tables found)")
-        except Exception as e:
-            print(f"⚠️  Database initialization check failed: {e}")
-            print("📦 Attempting to create tables...")
-            try:
-                db.create_all()
-                print("✅ Database tables created successfully!")
-            except Exception as create_error:
-                print(f"❌ Failed to create tables: {create_error}")
-    
-    # Health check endpoint
-    @app.route('/health')
-    def health():
-        return jsonify({'status': 'healthy', 'service': 'multi-tenant-saas'}), 200
+    # Register CLI maintenance commands
+    register_commands(app)
     
     # Root endpoint
     @app.route('/')
@@ -87,6 +133,10 @@ def create_app(config_name=None):
     def not_found(error):
         return jsonify({'error': 'Resource not found'}), 404
     
+    @app.errorhandler(FieldsetError)
+    def invalid_fields(error):
+        return jsonify({'error': str(error)}), 400
+    
     @app.errorhandler(500)
     def internal_error(error):
         db.session.rollback()
@@ -97,4 +147,7 @@ def create_app(config_name=None):
 
 if __name__ == '__main__':
     app = create_app()
+    # The dev server bootstraps itself; deployments run `flask bootstrap-db`
+    with app.app_context():
+        ensure_master_tables()
     app.run(host='0.0.0.0', port=5000, debug=True)
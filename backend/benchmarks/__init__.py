@@ -0,0 +1 @@
+"""Benchmarks run against a live database; see each module's docstring"""
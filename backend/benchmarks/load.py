@@ -0,0 +1,378 @@
+"""
+Synthetic multi-tenant load benchmark
+
+Seeds tenants through POST /api/tenants (the create_tenant path) and the
+public API, then replays a mix of board traffic from concurrent virtual
+users and reports throughput and p50/p95/p99 latency per operation. Run
+from the backend directory against a bootstrapped local Postgres
+(`flask bootstrap-db`), in-process or against a running server:
+
+    python -m benchmarks.load --tenants 5 --duration 60 --concurrency 16
+    python -m benchmarks.load --url http://127.0.0.1:5000 --save-baseline main
+    python -m benchmarks.load --compare main
+
+Baselines are JSON files in benchmarks/baselines/. --compare exits with
+status 1 when an operation's p95 or throughput regressed by more than
+--tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Operation mix of the replay, as relative weights
+MIX = {
+    'login': 5,
+    'board': 35,
+    'project_lists': 15,
+    'list': 15,
+    'task_move': 15,
+    'comment': 15,
+}
+
+BATCH_SIZE = 25
+PASSWORD = 'Benchmark-password-1'
+
+
+class AppClient:
+    """Drives the app in-process through Flask's test client (one per thread)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        # Reading the body also drains streamed responses
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Drives a running server over HTTP"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = dict(headers or {}, **({'Content-Type': 'application/json'} if data else {}))
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=120) as response:
+                status, raw = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, raw = e.code, e.read()
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+
+def expect(result, *statuses):
+    """Return a response body, failing the seed on an unexpected status"""
+    status, body = result
+    if status not in statuses:
+        raise RuntimeError(f'Seeding failed with {status}: {body}')
+    return body
+
+
+def run_batch(client, headers, operations):
+    """Run operations through POST /api/batch in atomic chunks; returns their bodies"""
+    bodies = []
+    for start in range(0, len(operations), BATCH_SIZE):
+        chunk = operations[start:start + BATCH_SIZE]
+        body = expect(client.request('POST', '/api/batch', {'operations': chunk, 'atomic': True},
+                                     headers), 200)
+        if not body['committed']:
+            failed = next(r for r in body['results'] if r['status'] >= 400)
+            raise RuntimeError(f"Seeding batch failed with {failed['status']}: {failed['body']}")
+        bodies += [result['body'] for result in body['results']]
+    return bodies
+
+
+def login(client, subdomain, email):
+    """Log in; returns the headers of an authenticated tenant request"""
+    body = expect(client.request('POST', '/api/auth/login', {'email': email, 'password': PASSWORD},
+                                 {'X-Tenant-Subdomain': subdomain}), 200)
+    return {'X-Tenant-Subdomain': subdomain, 'Authorization': f"Bearer {body['access_token']}"}
+
+
+def seed_tenant(client, subdomain, args):
+    """
+    Create one tenant with users, projects, lists, tasks and comments
+
+    Returns:
+        dict: Subdomain, user logins and the ids of the seeded boards
+    """
+    tenant = expect(client.request('POST', '/api/tenants', {
+        'name': f'Benchmark {subdomain}',
+        'subdomain': subdomain,
+        'admin_email': f'admin@{subdomain}.test',
+        'admin_password': PASSWORD,
+        'admin_first_name': 'Bench',
+        'admin_last_name': 'Admin',
+        'max_users': args.users + 1,
+        # The benchmark measures the app, not the per-tenant quotas
+        'rate_limit_per_second': 100000,
+        'rate_limit_burst': 100000,
+        'max_concurrent_requests': 10000,
+    }), 201)['tenant']
+    admin = login(client, subdomain, f'admin@{subdomain}.test')
+
+    # Managers may view and edit every board they belong to
+    emails = [f'user{i}@{subdomain}.test' for i in range(args.users)]
+    user_ids = [expect(client.request('POST', '/api/auth/register', {
+        'email': email, 'password': PASSWORD, 'first_name': 'Bench', 'last_name': f'User {i}',
+        'role': 'manager'
+    }, admin), 201)['user']['id'] for i, email in enumerate(emails)]
+
+    projects = []
+    for p in range(args.projects):
+        project = expect(client.request('POST', '/api/projects', {'name': f'Board {p}'}, admin),
+                         201)['project']
+        run_batch(client, admin, [{'method': 'POST', 'path': f"/projects/{project['id']}/members",
+                                   'body': {'user_id': user_id}} for user_id in user_ids])
+        lists = run_batch(client, admin, [
+            {'method': 'POST', 'path': f"/lists/projects/{project['id']}/lists",
+             'body': {'name': f'List {i}'}} for i in range(args.lists)
+        ])
+        list_ids = [body['list']['id'] for body in lists]
+        tasks = run_batch(client, admin, [
+            {'method': 'POST', 'path': f'/tasks/lists/{list_id}/tasks',
+             'body': {'title': f'Task {t}', 'description': 'Synthetic benchmark task ' * 4,
+                      'assignee_id': random.choice(user_ids) if user_ids else None,
+                      'labels': ['bench']}}
+            for list_id in list_ids for t in range(args.tasks)
+        ])
+        task_ids = [body['task']['id'] for body in tasks]
+        run_batch(client, admin, [
+            {'method': 'POST', 'path': f'/tasks/{task_id}/comments',
+             'body': {'content': f'Comment {c} on a synthetic task'}}
+            for task_id in task_ids for c in range(args.comments)
+        ])
+        projects.append({'id': project['id'], 'lists': list_ids, 'tasks': task_ids})
+
+    return {'id': tenant['id'], 'subdomain': subdomain, 'emails': emails or [f'admin@{subdomain}.test'],
+            'projects': projects}
+
+
+class VirtualUser:
+    """Runs random operations of the mix for one tenant user"""
+
+    def __init__(self, client, tenant):
+        self.client = client
+        self.tenant = tenant
+        self.email = random.choice(tenant['emails'])
+        self.headers = login(client, tenant['subdomain'], self.email)
+
+    def run(self, operation):
+        """Run one operation; returns its status code"""
+        project = random.choice(self.tenant['projects'])
+        request = self.client.request
+        if operation == 'login':
+            status, body = request('POST', '/api/auth/login', {'email': self.email, 'password': PASSWORD},
+                                   {'X-Tenant-Subdomain': self.tenant['subdomain']})
+            if status == 200:
+                self.headers['Authorization'] = f"Bearer {body['access_token']}"
+            return status
+        if operation == 'board':
+            return request('GET', f"/api/projects/{project['id']}", headers=self.headers)[0]
+        if operation == 'project_lists':
+            return request('GET', f"/api/lists/projects/{project['id']}/lists", headers=self.headers)[0]
+        if operation == 'list':
+            return request('GET', f"/api/lists/{random.choice(project['lists'])}", headers=self.headers)[0]
+        if operation == 'task_move':
+            return request('PUT', f"/api/tasks/{random.choice(project['tasks'])}/move", {
+                'list_id': random.choice(project['lists']), 'position': random.randint(0, 20)
+            }, self.headers)[0]
+        if operation == 'comment':
+            return request('POST', f"/api/tasks/{random.choice(project['tasks'])}/comments",
+                           {'content': 'Load test comment'}, self.headers)[0]
+        raise ValueError(f'Unknown operation: {operation}')
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def replay(client, tenants, args):
+    """
+    Run the mix from `concurrency` threads for `duration` seconds
+
+    Returns:
+        dict: {operation: {'latencies': [...seconds], 'errors': int}}
+    """
+    samples = {operation: {'latencies': [], 'errors': 0} for operation in MIX}
+    lock = threading.Lock()
+    operations, weights = zip(*MIX.items())
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+
+    def worker():
+        user = VirtualUser(client, random.choice(tenants))
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            operation = random.choices(operations, weights)[0]
+            try:
+                status = user.run(operation)
+            except Exception:
+                status = 599
+            elapsed = time.perf_counter() - now
+            if now >= measure_from:
+                with lock:
+                    samples[operation]['latencies'].append(elapsed)
+                    if status >= 400:
+                        samples[operation]['errors'] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    """Reduce raw samples to throughput and latency percentiles (ms) per operation"""
+    results = {}
+    for operation, sample in samples.items():
+        ordered = sorted(sample['latencies'])
+        if not ordered:
+            continue
+        results[operation] = {
+            'requests': len(ordered),
+            'errors': sample['errors'],
+            'rps': round(len(ordered) / duration, 2),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2),
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 2),
+        }
+    total = sum(result['requests'] for result in results.values())
+    results['total'] = {'requests': total, 'errors': sum(r['errors'] for r in results.values()),
+                        'rps': round(total / duration, 2)}
+    return results
+
+
+def print_report(results):
+    print(f"{'operation':<15}{'requests':>10}{'errors':>8}{'rps':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for operation, result in results.items():
+        if operation == 'total':
+            continue
+        print(f"{operation:<15}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}{result['max_ms']:>10}")
+    total = results['total']
+    print(f"{'total':<15}{total['requests']:>10}{total['errors']:>8}{total['rps']:>10}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a saved baseline
+
+    Returns:
+        list: Human-readable regressions (empty if none)
+    """
+    regressions = []
+    for operation, base in baseline['results'].items():
+        current = results.get(operation)
+        if current is None:
+            continue
+        if 'p95_ms' in base and current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{operation}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if base['rps'] and current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{operation}: {current['rps']} rps vs baseline {base['rps']} rps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Benchmark a running server instead of the app in-process')
+    parser.add_argument('--config', default='production', help='App config for in-process runs')
+    parser.add_argument('--tenants', type=int, default=3)
+    parser.add_argument('--users', type=int, default=5, help='Users per tenant')
+    parser.add_argument('--projects', type=int, default=2, help='Projects per tenant')
+    parser.add_argument('--lists', type=int, default=5, help='Lists per project')
+    parser.add_argument('--tasks', type=int, default=20, help='Tasks per list')
+    parser.add_argument('--comments', type=int, default=2, help='Comments per task')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before measuring')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for a repeatable mix')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded tenants afterwards')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression (0.2 = 20%%)')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.url:
+        client = HttpClient(args.url)
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from app import create_app
+
+        client = AppClient(create_app(args.config))
+
+    run_id = format(int(time.time()), 'x')
+    print(f'Seeding {args.tenants} tenants ({args.users} users, {args.projects} projects x '
+          f'{args.lists} lists x {args.tasks} tasks x {args.comments} comments each)...')
+    tenants = [seed_tenant(client, f'bench{run_id}t{i}', args) for i in range(args.tenants)]
+
+    try:
+        print(f'Replaying for {args.duration:.0f}s with {args.concurrency} virtual users...')
+        results = summarize(replay(client, tenants, args), args.duration)
+    finally:
+        if not args.keep:
+            for tenant in tenants:
+                client.request('DELETE', f"/api/tenants/{tenant['id']}")
+
+    print_report(results)
+    run = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'target': args.url or f'in-process ({args.config})',
+        'params': {key: getattr(args, key) for key in
+                   ('tenants', 'users', 'projects', 'lists', 'tasks', 'comments', 'concurrency', 'duration')},
+        'results': results,
+    }
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f'Saved baseline {path}')
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against baseline {args.compare} (tolerance {args.tolerance:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure time-to-first-request of a gunicorn boot
+
+Starts gunicorn with gunicorn.conf.py, polls until the first request
+succeeds, then shuts it down. Run from the backend directory against a
+bootstrapped database (`flask bootstrap-db`):
+
+    python -m benchmarks.startup --runs 5 --workers 4
+    python -m benchmarks.startup --runs 5 --workers 4 --preload
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def free_port():
+    """Get a TCP port nobody is listening on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_first_request(url, timeout):
+    """Poll a URL until it answers 200; returns False on timeout"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def run_once(workers, preload, path, timeout):
+    """
+    Boot gunicorn once and time it
+
+    Returns:
+        float: Seconds from spawning gunicorn to the first 200 response
+    """
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD='true' if preload else 'false')
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_first_request(f'http://127.0.0.1:{port}{path}', timeout):
+            raise RuntimeError(f'No successful response within {timeout}s')
+        return time.perf_counter() - started
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--preload', action='store_true', help='Boot with GUNICORN_PRELOAD=true')
+    parser.add_argument('--path', default='/health/ready', help='Path of the first request')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    timings = []
+    for run in range(1, args.runs + 1):
+        elapsed = run_once(args.workers, args.preload, args.path, args.timeout)
+        timings.append(elapsed)
+        print(f'run {run}: {elapsed * 1000:.0f} ms')
+
+    mode = 'preload' if args.preload else 'no preload'
+    print(f'time-to-first-request ({args.workers} workers, {mode}): '
+          f'median {statistics.median(timings) * 1000:.0f} ms, '
+          f'min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
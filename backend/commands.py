@@ -0,0 +1,133 @@
+"""Flask CLI commands for database maintenance"""
+import click
+from flask import current_app
+from models import db
+from models.tenant import Tenant
+from utils.database import ensure_master_tables, ensure_tenant_tables, use_schema
+
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI"""
+    app.cli.add_command(bootstrap_db)
+    app.cli.add_command(upgrade_tenants)
+    app.cli.add_command(prune_change_log_command)
+    app.cli.add_command(drop_activity_partitions_command)
+    app.cli.add_command(archive_tasks_command)
+    app.cli.add_command(prune_revoked_tokens_command)
+    app.cli.add_command(shards_command)
+
+
+def iter_tenant_schemas():
+    """Yield each tenant with the session search_path set to its schema"""
+    for tenant in Tenant.query.order_by(Tenant.id).all():
+        db.session.commit()
+        use_schema(tenant.schema_name)
+        try:
+            yield tenant
+        finally:
+            db.session.rollback()
+            use_schema(None)
+
+
+@click.command('bootstrap-db')
+@click.option('--with-tenants', is_flag=True, help='Also upgrade every tenant schema')
+def bootstrap_db(with_tenants):
+    """Create master tables; run once per deploy, not in every worker"""
+    ensure_master_tables()
+    click.echo('✓ public')
+    if with_tenants:
+        upgrade_tenant_schemas()
+
+
+def upgrade_tenant_schemas():
+    """Create missing tables and columns in every tenant schema"""
+    tenants = Tenant.query.order_by(Tenant.id).all()
+    for tenant in tenants:
+        ensure_tenant_tables(tenant.schema_name)
+        click.echo(f'✓ {tenant.schema_name}')
+    click.echo(f'Upgraded {len(tenants)} tenant schemas')
+
+
+@click.command('upgrade-tenants')
+def upgrade_tenants():
+    """Create tables missing from the master and existing tenant schemas"""
+    ensure_master_tables()
+    click.echo('✓ public')
+    upgrade_tenant_schemas()
+
+
+@click.command('prune-change-log')
+@click.option('--days', type=int, default=None, help='Days of changes to keep')
+def prune_change_log_command(days):
+    """Delete delta sync change log entries older than the retention window"""
+    from utils.changes import prune_change_log
+
+    if days is None:
+        days = current_app.config['CHANGE_LOG_RETENTION_DAYS']
+
+    total = 0
+    for tenant in iter_tenant_schemas():
+        total += prune_change_log(days)
+    click.echo(f'Pruned {total} change log entries older than {days} days')
+
+
+@click.command('drop-activity-partitions')
+@click.option('--keep-months', type=int, default=None, help='Months of activity to keep')
+def drop_activity_partitions_command(keep_months):
+    """Drop monthly activity log partitions past the retention window"""
+    from utils.activity import drop_activity_partitions
+
+    if keep_months is None:
+        keep_months = current_app.config['ACTIVITY_RETENTION_MONTHS']
+
+    for tenant in iter_tenant_schemas():
+        for name in drop_activity_partitions(tenant.schema_name, keep_months):
+            click.echo(f'✓ Dropped {tenant.schema_name}.{name}')
+
+
+@click.command('archive-tasks')
+@click.option('--days', type=int, default=None, help='Archive tasks completed more than this many days ago')
+@click.option('--batch-size', type=int, default=None, help='Tasks moved per transaction')
+def archive_tasks_command(days, batch_size):
+    """Move old completed tasks and their comments to the archive tables"""
+    from utils.archive import archive_completed_tasks
+
+    if days is None:
+        days = current_app.config['ARCHIVE_AFTER_DAYS']
+    if batch_size is None:
+        batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+
+    total_tasks = total_comments = 0
+    for tenant in iter_tenant_schemas():
+        tasks, comments = archive_completed_tasks(tenant.schema_name, days, batch_size)
+        if tasks:
+            click.echo(f'✓ {tenant.schema_name}: {tasks} tasks, {comments} comments')
+        total_tasks += tasks
+        total_comments += comments
+    click.echo(f'Archived {total_tasks} tasks and {total_comments} comments completed more than {days} days ago')
+
+
+@click.command('prune-revoked-tokens')
+def prune_revoked_tokens_command():
+    """Delete revoked token entries whose tokens have expired"""
+    from utils.revocation import prune_revoked_tokens
+
+    click.echo(f'Pruned {prune_revoked_tokens()} expired revoked tokens')
+
+
+@click.command('shards')
+def shards_command():
+    """List tenant counts and sizes per database shard"""
+    from utils.shards import shard_stats
+
+    click.echo(f'{"shard":<20} {"tenants":>8} {"schemas MB":>12} {"database MB":>12}')
+    for entry in shard_stats():
+        schema_mb = _megabytes(entry['schema_bytes'])
+        database_mb = _megabytes(entry['database_bytes'])
+        click.echo(f'{entry["shard"]:<20} {entry["tenants"]:>8} {schema_mb:>12} {database_mb:>12}')
+        if 'error' in entry:
+            click.echo(f'  ! {entry["error"]}')
+
+
+def _megabytes(value):
+    return '-' if value is None else f'{value / 1048576:.1f}'
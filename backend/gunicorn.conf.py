@@ -0,0 +1,67 @@
+"""Gunicorn settings; run with `gunicorn -c gunicorn.conf.py 'app:create_app()'`"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 120
+# Load the app once in the master and fork it into workers
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def _metrics_dir():
+    from config import config
+
+    directory = config[os.environ.get('FLASK_ENV', 'development')].METRICS_DIR
+    return None if directory == ':memory:' else directory
+
+
+def on_starting(server):
+    """Discard metric snapshots left by a previous run"""
+    directory = _metrics_dir()
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.startswith('metrics-'):
+                os.remove(os.path.join(directory, filename))
+
+
+def worker_exit(server, worker):
+    """Write a last metrics snapshot with the requests since the previous one"""
+    from middleware.metrics import request_metrics
+    from utils.metrics import write_snapshot
+
+    if request_metrics.enabled and request_metrics.directory:
+        write_snapshot(request_metrics.directory, request_metrics.registry.snapshot())
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics into the dead-workers aggregate"""
+    from utils.metrics import retire_snapshot
+
+    directory = _metrics_dir()
+    if directory:
+        retire_snapshot(directory, worker.pid)
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from a preloaded master"""
+    app = worker.app.callable
+    if app is None:
+        return
+    from models import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's sockets alone
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Open database connections before the worker accepts requests"""
+    from utils.pool import warm_pool
+
+    app = worker.wsgi
+    with app.app_context():
+        opened = warm_pool(app.config['DB_POOL_WARMUP'])
+    worker.log.info('Warmed %d database connections', opened)
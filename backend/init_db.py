@@ -3,6 +3,7 @@ import os
 from app import create_app
 from models import db
 from models.tenant import Tenant
+from utils.database import ensure_master_tables
 
 def init_database():
     """Initialize the master database with required tables"""
@@ -10,7 +11,7 @@ def init_database():
     
     with app.app_context():
         print("Creating database tables...")
-        db.create_all()
+        ensure_master_tables()
         print("✓ Database tables created successfully!")
         
         # Verify tables exist
@@ -15,6 +15,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import create_app
 from models import db
 from sqlalchemy import inspect, text
+from utils.database import ensure_master_tables
 
 def init_database():
     """Initialize the master database with required tables"""
@@ -45,7 +46,7 @@ def init_database():
             
             # Create all tables
             print("\n3️⃣  Creating database tables...")
-            db.create_all()
+            ensure_master_tables()
             print("   ✅ Tables created successfully!")
             
             # Verify tables were created
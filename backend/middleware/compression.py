@@ -0,0 +1,106 @@
+"""Response compression negotiated from Accept-Encoding"""
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+
+class Compression:
+    """
+    Compresses JSON responses with brotli or gzip
+
+    Buffered responses are compressed when at least COMPRESSION_MIN_SIZE
+    bytes. Streamed responses (board loads) have no known size and are
+    always compressed, chunk by chunk, so memory stays flat.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize compression with Flask app"""
+        self.enabled = app.config['COMPRESSION_ENABLED']
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+        app.extensions['compression'] = self
+        app.after_request(self.after_request)
+
+    def choose_encoding(self, accept_encodings):
+        """
+        Pick the best supported encoding the client accepts
+
+        Args:
+            accept_encodings: Werkzeug Accept object for Accept-Encoding
+
+        Returns:
+            str: 'br', 'gzip' or None
+        """
+        candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+        best = max(candidates, key=lambda encoding: accept_encodings[encoding])
+        return best if accept_encodings[best] > 0 else None
+
+    def after_request(self, response):
+        """Compress eligible responses"""
+        if not self.enabled or response.status_code < 200 or response.status_code == 204 \
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES \
+                or 'Content-Encoding' in response.headers:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.direct_passthrough = False
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            response.set_data(self._compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    def _compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, finish = compressor.process, compressor.finish
+        else:
+            # wbits=31 writes a gzip header and trailer
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = compress(chunk)
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            # Let stream_with_context tear down the request context
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+
+compression = Compression()
@@ -0,0 +1,123 @@
+"""Per-endpoint, per-tenant request and SQL metrics"""
+import os
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.metrics import (MetricsRegistry, merge_snapshots, read_snapshots, render_prometheus,
+                           write_snapshot)
+from utils.batch import in_batch_operation
+
+
+class RequestMetrics:
+    """
+    Records latency, response size and SQL work of every request
+
+    Series are labelled by endpoint and tenant. Latency is measured until
+    teardown, so streamed responses are timed until their last chunk. With
+    METRICS_DIR, each worker writes a snapshot at most every
+    METRICS_SNAPSHOT_SECONDS and /metrics serves the sum of all workers.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.registry = MetricsRegistry()
+        self.directory = None
+        self.snapshot_seconds = 5.0
+        self._last_snapshot = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize metrics with Flask app"""
+        self.enabled = app.config['METRICS_ENABLED']
+        self.registry = MetricsRegistry(app.config['METRICS_MAX_TENANTS'])
+        directory = app.config['METRICS_DIR']
+        self.directory = None if directory == ':memory:' else directory
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.snapshot_seconds = app.config['METRICS_SNAPSHOT_SECONDS']
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def before_request(self):
+        """Start timing the request"""
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    def after_request(self, response):
+        """Count the bytes sent (runs after compression)"""
+        g.metrics_status = response.status_code
+        if response.is_streamed:
+            g.metrics_bytes = [0]
+            response.response = self._count_bytes(response.response, g.metrics_bytes)
+        else:
+            g.metrics_bytes = [response.calculate_content_length() or 0]
+        return response
+
+    def teardown_request(self, exception=None):
+        """Record the finished request"""
+        # Batch operations are counted as part of the batch request
+        if in_batch_operation():
+            return
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        status = g.pop('metrics_status', 500)
+        sent = g.pop('metrics_bytes', [0])[0]
+
+        tenant = g.get('tenant')
+        labels = (('endpoint', request.endpoint or 'unmatched'),
+                  ('tenant', self.registry.tenant_label(tenant.subdomain) if tenant else '-'))
+        registry = self.registry
+        registry.inc('http_requests_total',
+                     labels + (('method', request.method), ('status', f'{status // 100}xx')))
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.observe('http_response_size_bytes', labels, sent)
+        registry.inc('db_statements_total', labels, g.get('sql_statements', 0))
+        registry.inc('db_statement_seconds_total', labels, g.get('sql_seconds', 0.0))
+
+        if self.directory and time.monotonic() - self._last_snapshot >= self.snapshot_seconds:
+            self._last_snapshot = time.monotonic()
+            write_snapshot(self.directory, registry.snapshot())
+
+    def exposition(self):
+        """Get all workers' metrics in the Prometheus text format"""
+        snapshots = [self.registry.snapshot()]
+        if self.directory:
+            snapshots += read_snapshots(self.directory, exclude_pid=os.getpid())
+        counters, histograms = merge_snapshots(snapshots, self.registry.max_tenants)
+        return render_prometheus(counters, histograms)
+
+    def _count_bytes(self, chunks, counter):
+        try:
+            for chunk in chunks:
+                counter[0] += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                yield chunk
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            conn.info['metrics_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('metrics_started', None)
+        if started is not None and has_request_context():
+            g.sql_seconds = g.get('sql_seconds', 0.0) + time.perf_counter() - started
+            g.sql_statements = g.get('sql_statements', 0) + 1
+
+
+request_metrics = RequestMetrics()
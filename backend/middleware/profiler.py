@@ -0,0 +1,214 @@
+"""On-demand sampling profiler for single requests"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from flask import g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from utils.batch import in_batch_operation
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_ARG = '_profile'
+
+# Sample categories, checked innermost frame first
+SQL_MODULES = (os.sep + 'sqlalchemy' + os.sep + 'engine' + os.sep, os.sep + 'psycopg2' + os.sep)
+SERIALIZER_NAMES = {'to_dict', 'row_to_dict'}
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def classify(codes):
+    """
+    Attribute one sampled stack to SQL, serialization or plain Python
+
+    Args:
+        codes: Code objects of the stack, outermost first
+    """
+    for code in reversed(codes):
+        if any(module in code.co_filename for module in SQL_MODULES):
+            return 'sql'
+    for code in reversed(codes):
+        if code.co_name in SERIALIZER_NAMES:
+            return 'serialization'
+    return 'python'
+
+
+def frame_label(code):
+    """Label a frame for a folded (flamegraph) stack"""
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ',')
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name=f'profiler-{thread_id}', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.categories = {'sql': 0, 'serialization': 0, 'python': 0}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.record(frame)
+
+    def record(self, frame):
+        """Add one sample of a frame's stack"""
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        category = classify(codes)
+        self.categories[category] += 1
+        folded = ';'.join([category] + [frame_label(code) for code in codes])
+        self.stacks[folded] = self.stacks.get(folded, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    """
+    Profiles requests that carry a profile token issued to an admin
+
+    A request with a valid token in the X-Profile-Token header (or the
+    _profile query argument) is sampled every PROFILER_INTERVAL_MS until
+    its last streamed byte. The folded stacks, grouped under sql,
+    serialization and python roots, are saved in PROFILER_DIR under the
+    request id returned in X-Profile-Id. Other requests only pay for the
+    header lookup.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self.interval = 0.005
+        self.max_files = 200
+        self.token_seconds = 3600
+        self.serializer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize profiler with Flask app"""
+        self.enabled = app.config['PROFILER_ENABLED']
+        self.directory = app.config['PROFILER_DIR']
+        self.interval = app.config['PROFILER_INTERVAL_MS'] / 1000.0
+        self.max_files = app.config['PROFILER_MAX_FILES']
+        self.token_seconds = app.config['PROFILER_TOKEN_SECONDS']
+        self.serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='request-profile')
+        app.extensions['profiler'] = self
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def issue_token(self, tenant, user):
+        """Sign a token that lets `user` profile requests of `tenant`"""
+        return self.serializer.dumps({'tenant': tenant.subdomain, 'user': user.id})
+
+    def before_request(self):
+        """Start sampling if the request carries a valid profile token"""
+        token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+        if not token:
+            return
+        try:
+            claims = self.serializer.loads(token, max_age=self.token_seconds)
+        except BadSignature:
+            logger.warning('Ignoring invalid profile token on %s', request.path)
+            return
+        tenant = g.get('tenant')
+        if tenant is None or claims.get('tenant') != tenant.subdomain:
+            return
+
+        g.profile = {
+            'id': uuid.uuid4().hex,
+            'tenant': tenant.subdomain,
+            'requested_by': claims.get('user'),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'started': time.time(),
+            'wall_started': time.perf_counter()
+        }
+        g.profile_sampler = StackSampler(threading.get_ident(), self.interval)
+        g.profile_sampler.start()
+
+    def after_request(self, response):
+        """Tell the caller where to find the profile"""
+        profile = g.get('profile')
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile['id']
+        return response
+
+    def teardown_request(self, exception=None):
+        """Stop sampling and store the profile"""
+        # Batch operations are profiled as part of the batch request
+        if in_batch_operation():
+            return
+        sampler = g.pop('profile_sampler', None)
+        profile = g.pop('profile', None)
+        if sampler is None:
+            return
+        sampler.stop()
+
+        interval_ms = self.interval * 1000
+        profile['wall_ms'] = round((time.perf_counter() - profile.pop('wall_started')) * 1000, 1)
+        profile['interval_ms'] = interval_ms
+        profile['samples'] = sum(sampler.categories.values())
+        profile['breakdown_ms'] = {category: round(count * interval_ms, 1)
+                                   for category, count in sampler.categories.items()}
+        profile['folded'] = [f'{stack} {count}' for stack, count in
+                             sorted(sampler.stacks.items(), key=lambda item: -item[1])]
+        try:
+            self._save(profile)
+        except OSError as e:
+            logger.warning('Could not store profile %s: %s', profile['id'], e)
+
+    def load(self, request_id):
+        """
+        Load a stored profile
+
+        Returns:
+            dict: The profile, or None if it does not exist
+        """
+        if not _PROFILE_ID.match(request_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f'{request_id}.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, profile):
+        path = os.path.join(self.directory, f"{profile['id']}.json")
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(profile, f)
+        os.replace(f'{path}.tmp', path)
+
+        # Keep only the newest profiles
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.endswith('.json')]
+        if len(files) > self.max_files:
+            files.sort(key=os.path.getmtime)
+            for old in files[:len(files) - self.max_files]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+
+request_profiler = RequestProfiler()
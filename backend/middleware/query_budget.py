@@ -0,0 +1,136 @@
+"""Transaction-scoped statement/lock timeouts per tenant and endpoint"""
+from flask import g, has_app_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from models import db
+from utils.circuit_breaker import tenant_breakers
+from utils.batch import in_batch_operation
+
+# query_canceled (statement_timeout) and lock_not_available (lock_timeout)
+TIMEOUT_PGCODES = {'57014', '55P03'}
+
+
+def is_timeout_error(error):
+    """Check whether a DB error was caused by statement_timeout or lock_timeout"""
+    orig = getattr(error, 'orig', error)
+    return getattr(orig, 'pgcode', None) in TIMEOUT_PGCODES
+
+
+class QueryBudget:
+    """
+    Bounds how long any one request's queries may run
+
+    Every transaction a request opens starts with SET LOCAL
+    statement_timeout/lock_timeout, so the limits never leak onto pooled
+    connections. The statement budget is the tightest of the tenant's
+    statement_timeout_ms and the endpoint's entry in
+    ENDPOINT_STATEMENT_TIMEOUTS_MS, falling back to STATEMENT_TIMEOUT_MS.
+    Timeouts are fed to the tenant's circuit breaker.
+    """
+
+    def __init__(self, app=None):
+        self.statement_timeout_ms = 30000
+        self.lock_timeout_ms = 5000
+        self.endpoint_timeouts = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize query budgets with Flask app"""
+        self.statement_timeout_ms = app.config['STATEMENT_TIMEOUT_MS']
+        self.lock_timeout_ms = app.config['LOCK_TIMEOUT_MS']
+        self.endpoint_timeouts = app.config['ENDPOINT_STATEMENT_TIMEOUTS_MS']
+        tenant_breakers.configure(
+            app.config['CIRCUIT_BREAKER_FAILURES'],
+            app.config['CIRCUIT_BREAKER_WINDOW_SECONDS'],
+            app.config['CIRCUIT_BREAKER_OPEN_SECONDS']
+        )
+        app.extensions['query_budget'] = self
+
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+        app.register_error_handler(OperationalError, self._operational_error)
+        if not event.contains(db.session, 'after_begin', self._after_begin):
+            event.listen(db.session, 'after_begin', self._after_begin)
+        if not event.contains(Engine, 'handle_error', self._handle_error):
+            event.listen(Engine, 'handle_error', self._handle_error)
+
+    def budget_for(self, endpoint, tenant=None):
+        """Get the statement timeout in milliseconds for an endpoint and tenant"""
+        candidates = [ms for ms in (
+            getattr(tenant, 'statement_timeout_ms', None),
+            self.endpoint_timeouts.get(endpoint)
+        ) if ms]
+        return min(candidates) if candidates else self.statement_timeout_ms
+
+    def before_request(self):
+        """Pick the budget once the tenant is known"""
+        g.statement_timeout_ms = self.budget_for(request.endpoint, g.get('tenant'))
+        g.lock_timeout_ms = self.lock_timeout_ms
+
+    def use_tenant(self, tenant):
+        """
+        Apply a tenant's breaker and budget to a request outside its context
+
+        Used by master-level routes that query a tenant schema directly,
+        such as tenant statistics.
+
+        Returns:
+            tuple: 503 response if the tenant's breaker is open, else None
+        """
+        breaker = tenant_breakers.get(tenant.subdomain)
+        if not breaker.allow():
+            return breaker_open_response(breaker)
+        g.budget_tenant = tenant.subdomain
+        g.statement_timeout_ms = self.budget_for(request.endpoint, tenant)
+        return None
+
+    def teardown_request(self, exception=None):
+        """Report a request that finished without timeouts to its breaker"""
+        # Batch operations are settled with the batch request itself
+        if in_batch_operation():
+            return
+        key = g.pop('budget_tenant', None)
+        if key is not None and not g.pop('query_timed_out', False):
+            breaker = tenant_breakers.peek(key)
+            if breaker is not None:
+                breaker.record_success()
+
+    def _after_begin(self, session, transaction, connection):
+        if not has_app_context():
+            return
+        statement_ms = g.get('statement_timeout_ms')
+        if statement_ms:
+            connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(statement_ms)}')
+        lock_ms = g.get('lock_timeout_ms')
+        if lock_ms:
+            connection.exec_driver_sql(f'SET LOCAL lock_timeout = {int(lock_ms)}')
+
+    def _handle_error(self, context):
+        if not has_app_context() or not is_timeout_error(context.original_exception):
+            return
+        g.query_timed_out = True
+        key = g.get('budget_tenant')
+        if key is not None:
+            tenant_breakers.get(key).record_failure()
+
+    def _operational_error(self, error):
+        db.session.rollback()
+        if is_timeout_error(error):
+            response = jsonify({'error': 'Query timed out, please retry later'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        response = jsonify({'error': 'Internal server error'})
+        response.status_code = 500
+        return response
+
+
+def breaker_open_response(breaker):
+    """Build the 503 returned while a tenant's breaker is open"""
+    return ({'error': 'Workspace temporarily unavailable, please retry later'}, 503,
+            {'Retry-After': str(max(1, int(breaker.retry_after() + 0.5)))})
+
+
+query_budget = QueryBudget()
@@ -0,0 +1,210 @@
+"""Per-request query counting, N+1 detection and per-route query budgets"""
+import logging
+import random
+import re
+import threading
+from contextlib import contextmanager
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from middleware.metrics import request_metrics
+from utils.batch import in_batch_operation
+
+logger = logging.getLogger(__name__)
+
+# Bound parameters, expanded IN lists and literals all become '?'
+_PARAMETER = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)|:\w+|%\(\w+\)s|'(?:[^']|'')*'|\b\d+\b")
+_WHITESPACE = re.compile(r'\s+')
+
+_active = threading.local()
+
+
+def max_queries(limit):
+    """Declare the most statements a view may run, e.g. @max_queries(6)"""
+    def decorator(view):
+        view.max_queries = limit
+        return view
+    return decorator
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by track_queries() and QueryGuard.assert_clean() when a query budget is broken"""
+
+
+def normalize_statement(statement):
+    """Reduce a statement to its shape so calls differing only in parameters match"""
+    return _WHITESPACE.sub(' ', _PARAMETER.sub('?', statement)).strip()
+
+
+class QueryReport:
+    """Statements one request (or `track_queries` block) ran through the session"""
+
+    def __init__(self, route=None, limit=None):
+        self.route = route
+        self.limit = limit
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold):
+        """
+        Get statement shapes run at least `threshold` times (likely N+1)
+
+        Returns:
+            list: (normalized statement, times) pairs, most repeated first
+        """
+        counts = {}
+        for statement in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return sorted(((s, n) for s, n in counts.items() if n >= threshold), key=lambda item: -item[1])
+
+    def problems(self, repeat_threshold):
+        """
+        Describe the budget and N+1 violations of this report
+
+        Returns:
+            list: (kind, message) pairs, empty if the request was fine
+        """
+        route = self.route or 'block'
+        problems = []
+        if self.limit is not None and self.count > self.limit:
+            problems.append(('budget', f'{route} ran {self.count} queries (budget {self.limit})'))
+        for statement, times in self.repeated(repeat_threshold):
+            problems.append(('repeated', f'{route} ran the same query {times} times: {statement[:300]}'))
+        return problems
+
+
+def _record(orm_execute_state):
+    reports = getattr(_active, 'reports', None)
+    if reports:
+        statement = normalize_statement(str(orm_execute_state.statement))
+        for report in reports:
+            report.statements.append(statement)
+
+
+def install():
+    """Count statements run through any ORM session (queries and lazy loads)"""
+    if not event.contains(Session, 'do_orm_execute', _record):
+        event.listen(Session, 'do_orm_execute', _record)
+
+
+def start_report(report):
+    """Start collecting statements run by this thread into a report"""
+    install()
+    if not hasattr(_active, 'reports'):
+        _active.reports = []
+    _active.reports.append(report)
+    return report
+
+
+def stop_report(report):
+    """Stop collecting statements into a report"""
+    reports = getattr(_active, 'reports', [])
+    if report in reports:
+        reports.remove(report)
+
+
+@contextmanager
+def track_queries(limit=None, repeat_threshold=None, route=None):
+    """
+    Count the statements run inside a block, e.g. in tests
+
+    Usage:
+        with track_queries(limit=6) as report:
+            load_board()
+        assert report.count <= 6
+
+    Raises:
+        QueryBudgetExceeded: On exit, if `limit` is exceeded or a statement
+        repeats `repeat_threshold` times
+    """
+    report = start_report(QueryReport(route, limit))
+    try:
+        yield report
+    finally:
+        stop_report(report)
+    problems = report.problems(repeat_threshold or float('inf'))
+    if problems:
+        raise QueryBudgetExceeded('; '.join(message for _, message in problems))
+
+
+class QueryGuard:
+    """
+    Counts the statements of sampled requests and reports N+1 patterns
+
+    A sampled request (QUERY_GUARD_SAMPLE_RATE) that runs more statements
+    than its view's @max_queries budget, or repeats one statement shape
+    QUERY_GUARD_REPEAT_THRESHOLD times, is logged and counted in
+    /metrics. With QUERY_GUARD_MODE 'record' (tests) violations are also
+    kept until assert_clean() fails the test; the check runs in teardown,
+    where raising would skip the other teardown handlers, so the request
+    itself never fails.
+    """
+
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.repeat_threshold = 5
+        self.mode = 'log'
+        self.violations = []
+        self._violations_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize query guard with Flask app"""
+        self.sample_rate = app.config['QUERY_GUARD_SAMPLE_RATE']
+        self.repeat_threshold = app.config['QUERY_GUARD_REPEAT_THRESHOLD']
+        self.mode = app.config['QUERY_GUARD_MODE']
+        app.extensions['query_guard'] = self
+        if self.sample_rate <= 0:
+            return
+
+        install()
+        app.before_request(self.before_request)
+        app.teardown_request(self.teardown_request)
+
+    def before_request(self):
+        """Start counting this request's statements if it is sampled"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+        g.query_report = start_report(QueryReport(request.endpoint, getattr(view, 'max_queries', None)))
+
+    def teardown_request(self, exception=None):
+        """Check the finished request against its budget"""
+        # Batch operations are counted as part of the batch request
+        if in_batch_operation():
+            return
+        report = g.pop('query_report', None)
+        if report is None:
+            return
+        stop_report(report)
+        problems = report.problems(self.repeat_threshold)
+        if not problems:
+            return
+
+        for kind, message in problems:
+            logger.warning('Query guard: %s', message)
+            if request_metrics.enabled:
+                request_metrics.registry.inc('db_query_guard_violations_total',
+                                             (('endpoint', report.route), ('kind', kind)))
+        if self.mode == 'record':
+            with self._violations_lock:
+                self.violations += [message for _, message in problems]
+
+    def assert_clean(self):
+        """
+        Fail if requests recorded violations since the last call (tests)
+
+        Raises:
+            QueryBudgetExceeded: With the recorded violations, which are cleared
+        """
+        with self._violations_lock:
+            violations, self.violations = self.violations, []
+        if violations:
+            raise QueryBudgetExceeded('; '.join(violations))
+
+
+query_guard = QueryGuard()
@@ -0,0 +1,236 @@
+"""Per-tenant token-bucket rate limits and in-flight concurrency caps"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryLimitStore:
+    """Limit state kept in this process only (tests, single-worker setups)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._inflight = {}
+
+    def acquire(self, key, rate, burst, max_concurrent, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False, (1 - tokens) / rate
+            if self._inflight.get(key, 0) >= max_concurrent:
+                self._buckets[key] = (tokens, now)
+                return False, 1.0
+            self._buckets[key] = (tokens - 1, now)
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+            return True, 0.0
+
+    def release(self, key):
+        with self._lock:
+            self._inflight[key] = max(0, self._inflight.get(key, 0) - 1)
+
+
+class SqliteLimitStore:
+    """
+    Limit state shared by all workers on a host through a local SQLite file
+
+    Each admission is one short IMMEDIATE transaction on a file that should
+    live on local (ideally tmpfs) storage. In-flight counts are kept per
+    worker pid so counts left behind by a crashed worker can be discarded.
+    Releases that fail (the file stays locked for longer than `timeout`)
+    are kept in memory and applied by the next acquire() or release().
+    """
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized_pid = None
+        # Key -> releases not written yet
+        self._unreleased = {}
+        self._unreleased_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn):
+        with self._init_lock:
+            if self._initialized_pid == os.getpid():
+                return
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS inflight '
+                         '(key TEXT NOT NULL, pid INTEGER NOT NULL, count INTEGER NOT NULL, '
+                         'PRIMARY KEY (key, pid))')
+            # Forget requests counted by workers that no longer exist
+            for (pid,) in conn.execute('SELECT DISTINCT pid FROM inflight').fetchall():
+                if pid == os.getpid() or not _pid_alive(pid):
+                    conn.execute('DELETE FROM inflight WHERE pid = ?', (pid,))
+            self._initialized_pid = os.getpid()
+
+    def acquire(self, key, rate, burst, max_concurrent, now):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        unreleased = self._take_unreleased()
+        try:
+            self._release_counts(conn, unreleased)
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+
+            allowed, retry_after = True, 0.0
+            if tokens < 1:
+                allowed, retry_after = False, (1 - tokens) / rate
+            else:
+                inflight = conn.execute('SELECT COALESCE(SUM(count), 0) FROM inflight WHERE key = ?',
+                                        (key,)).fetchone()[0]
+                if inflight >= max_concurrent:
+                    allowed, retry_after = False, 1.0
+
+            if allowed:
+                tokens -= 1
+                conn.execute('INSERT INTO inflight (key, pid, count) VALUES (?, ?, 1) '
+                             'ON CONFLICT (key, pid) DO UPDATE SET count = count + 1',
+                             (key, os.getpid()))
+            conn.execute('INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                         'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, '
+                         'updated = excluded.updated', (key, tokens, now))
+            conn.execute('COMMIT')
+            return allowed, retry_after
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self._defer_releases(unreleased)
+            raise
+
+    def release(self, key):
+        conn = self._connection()
+        counts = self._take_unreleased()
+        counts[key] = counts.get(key, 0) + 1
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._release_counts(conn, counts)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Keep the slot counted until a later write gets through
+            self._defer_releases(counts)
+            raise
+
+    def _release_counts(self, conn, counts):
+        for key, count in counts.items():
+            conn.execute('UPDATE inflight SET count = MAX(count - ?, 0) WHERE key = ? AND pid = ?',
+                         (count, key, os.getpid()))
+
+    def _take_unreleased(self):
+        with self._unreleased_lock:
+            counts, self._unreleased = self._unreleased, {}
+        return counts
+
+    def _defer_releases(self, counts):
+        with self._unreleased_lock:
+            for key, count in counts.items():
+                self._unreleased[key] = self._unreleased.get(key, 0) + count
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TenantRateLimiter:
+    """Admits or rejects requests per tenant before any database work"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.store = None
+        self.default_rate = 20.0
+        self.default_burst = 40
+        self.default_concurrency = 8
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize limiter with Flask app"""
+        self.enabled = app.config['RATE_LIMIT_ENABLED']
+        self.default_rate = app.config['TENANT_RATE_LIMIT_PER_SECOND']
+        self.default_burst = app.config['TENANT_RATE_LIMIT_BURST']
+        self.default_concurrency = app.config['TENANT_MAX_CONCURRENT_REQUESTS']
+        path = app.config['RATE_LIMIT_STORAGE']
+        self.store = MemoryLimitStore() if path == ':memory:' else SqliteLimitStore(path)
+        app.extensions['rate_limiter'] = self
+
+    def admit(self, tenant):
+        """
+        Take a token and a concurrency slot for the tenant
+
+        Args:
+            tenant: Tenant the request belongs to
+
+        Returns:
+            tuple: (body, status, headers) 429 response, or None if admitted
+        """
+        if not self.enabled:
+            return None
+
+        # NULL quotas use the defaults; an explicit 0 is a real quota
+        rate = tenant.rate_limit_per_second
+        rate = rate if rate is not None else self.default_rate
+        burst = tenant.rate_limit_burst
+        burst = burst if burst is not None else self.default_burst
+        max_concurrent = tenant.max_concurrent_requests
+        max_concurrent = max_concurrent if max_concurrent is not None else self.default_concurrency
+
+        if rate <= 0 or burst < 1 or max_concurrent < 1:
+            # A zero quota never admits anything, so there is no point retrying
+            return {'error': 'This workspace has no API request quota'}, 429, {}
+
+        key = tenant.subdomain
+        try:
+            allowed, retry_after = self.store.acquire(key, rate, burst, max_concurrent, time.time())
+        except Exception as e:
+            # Fail open: a busy limit store must not take the API down
+            logger.warning('Rate limit check for %s failed, admitting: %s', key, e)
+            return None
+        if not allowed:
+            return ({'error': 'Too many requests for this workspace, please retry later'}, 429,
+                    {'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+        g.rate_limit_key = key
+        return None
+
+    def release(self):
+        """Give back the concurrency slot taken by admit()"""
+        key = g.pop('rate_limit_key', None)
+        if key is None:
+            return
+        try:
+            self.store.release(key)
+        except Exception as e:
+            logger.warning('Rate limit release for %s deferred: %s', key, e)
+
+
+rate_limiter = TenantRateLimiter()
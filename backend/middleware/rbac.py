@@ -3,6 +3,7 @@ from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from models.user import User
+from utils.tracing import span, traced
 
 
 def require_role(*allowed_roles):
@@ -14,11 +15,13 @@ def require_role(*allowed_roles):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             # Verify JWT token
-            verify_jwt_in_request()
+            with span('auth.verify_jwt'):
+                verify_jwt_in_request()
             
             # Get current user
             current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
+            with span('auth.load_user'):
+                user = User.query.get(current_user_id)
             
             if not user or not user.is_active:
                 return jsonify({'error': 'User not found or inactive'}), 401
@@ -50,13 +53,16 @@ def require_manager(fn):
 def get_current_user():
     """Get current authenticated user"""
     try:
-        verify_jwt_in_request()
+        with span('auth.verify_jwt'):
+            verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        return User.query.get(current_user_id)
+        with span('auth.load_user'):
+            return User.query.get(current_user_id)
     except:
         return None
 
 
+@traced('rbac.check_permission')
 def check_permission(user, resource, action):
     """
     Check if user has permission to perform action on resource
@@ -107,3 +113,17 @@ def check_permission(user, resource, action):
         return action == 'view'
     
     return False
+
+
+def permission_class(user, resource):
+    """
+    Get the actions a user may perform on a resource, as one key
+
+    Users with the same class are served identical responses, so it can
+    key shared or cached renderings.
+
+    Returns:
+        str: e.g. 'view,edit,delete', or '' without access
+    """
+    return ','.join(action for action in ('view', 'edit', 'delete')
+                    if check_permission(user, resource, action))
@@ -0,0 +1,224 @@
+"""Read-replica routing for safe GET requests with read-your-writes stickiness"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import jwt as pyjwt
+from flask import current_app, g, request
+from models import db
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {'GET', 'HEAD'}
+
+# Seconds of replay lag, 0 when the replica has applied everything it received
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def primary_only(view):
+    """Mark a GET view that must read from the primary (e.g. change feeds)"""
+    view.primary_only = True
+    return view
+
+
+class MemoryStickyStore:
+    """Write timestamps kept in this process only"""
+
+    def __init__(self):
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def mark(self, key, until):
+        with self._lock:
+            self._until[key] = max(until, self._until.get(key, 0.0))
+
+    def is_sticky(self, key, now):
+        until = self._until.get(key)
+        if until is None:
+            return False
+        if until <= now:
+            with self._lock:
+                self._until.pop(key, None)
+            return False
+        return True
+
+
+class SqliteStickyStore:
+    """Write timestamps shared by the workers of one host through SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS sticky '
+                         '(key TEXT PRIMARY KEY, until REAL NOT NULL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def mark(self, key, until):
+        conn = self._connection()
+        conn.execute('INSERT INTO sticky (key, until) VALUES (?, ?) '
+                     'ON CONFLICT (key) DO UPDATE SET until = MAX(until, excluded.until)',
+                     (key, until))
+        # Keep the table small; expired rows are useless
+        conn.execute('DELETE FROM sticky WHERE until < ?', (until - 3600,))
+
+    def is_sticky(self, key, now):
+        row = self._connection().execute('SELECT until FROM sticky WHERE key = ?',
+                                         (key,)).fetchone()
+        return row is not None and row[0] > now
+
+
+class ReplicaRouter:
+    """
+    Sends safe reads to the 'replica' bind when it is fresh enough
+
+    A GET/HEAD request reads from the replica unless its view is marked
+    @primary_only, the same user wrote within REPLICA_STICKY_SECONDS, or
+    the replica's measured replay lag exceeds REPLICA_MAX_LAG_SECONDS (or
+    it cannot be measured). Lag is probed by one thread at most every
+    REPLICA_LAG_CHECK_SECONDS; other requests use the last value.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.sticky_seconds = 5.0
+        self.max_lag_seconds = 2.0
+        self.lag_check_seconds = 1.0
+        self.simulated_lag = None
+        self.store = MemoryStickyStore()
+        self.lag = None
+        self._last_probe = None
+        self._probe_lock = threading.Lock()
+        self.reads = {'replica': 0, 'primary': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize router with Flask app"""
+        self.enabled = 'replica' in app.config.get('SQLALCHEMY_BINDS', {})
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        self.max_lag_seconds = app.config['REPLICA_MAX_LAG_SECONDS']
+        self.lag_check_seconds = app.config['REPLICA_LAG_CHECK_SECONDS']
+        self.simulated_lag = app.config['REPLICA_SIMULATED_LAG_SECONDS']
+        path = app.config['REPLICA_STICKY_STORAGE']
+        self.store = MemoryStickyStore() if path == ':memory:' else SqliteStickyStore(path)
+        app.extensions['replica_router'] = self
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def before_request(self):
+        """Route this request's plain SELECTs to the replica when safe"""
+        if not self.enabled:
+            return
+        g.replica_key = self._sticky_key()
+        use_replica = self.should_use_replica(request.method, self._view(), g.replica_key)
+        db.session.info['read_replica'] = use_replica
+        source = 'replica' if use_replica else 'primary'
+        self.reads[source] += 1
+        g.read_source = source
+
+    def after_request(self, response):
+        """Make the writer's following reads sticky to the primary"""
+        if not self.enabled:
+            return response
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            key = g.get('replica_key')
+            if key is not None:
+                try:
+                    self.store.mark(key, time.time() + self.sticky_seconds)
+                except Exception as e:
+                    # The write has committed; don't turn its response into a 500
+                    logger.warning('Could not mark %s sticky to the primary: %s', key, e)
+        if 'read_source' in g:
+            response.headers['X-Read-Source'] = g.read_source
+        return response
+
+    def should_use_replica(self, method, view, key, now=None):
+        """
+        Decide whether a request may read from the replica
+
+        Args:
+            method: HTTP method
+            view: View function serving the request, if any
+            key: Read-your-writes key for the caller, if any
+            now: Current time.time(), for tests
+
+        Returns:
+            bool: True to read from the replica
+        """
+        if method not in SAFE_METHODS or getattr(view, 'primary_only', False):
+            return False
+        if key is not None and self.store.is_sticky(key, time.time() if now is None else now):
+            return False
+        return self.replica_healthy()
+
+    def replica_healthy(self):
+        """Check the last measured lag, probing again if it is stale"""
+        now = time.monotonic()
+        if self._last_probe is None or now - self._last_probe >= self.lag_check_seconds:
+            # Only one thread probes; the others use the previous reading
+            if self._probe_lock.acquire(blocking=False):
+                try:
+                    self.lag = self._probe_lag()
+                    self._last_probe = time.monotonic()
+                finally:
+                    self._probe_lock.release()
+        return self.lag is not None and self.lag <= self.max_lag_seconds
+
+    def _probe_lag(self):
+        try:
+            with db.engines['replica'].connect() as conn:
+                if self.simulated_lag is not None:
+                    conn.exec_driver_sql('SELECT 1')
+                    return self.simulated_lag
+                return float(conn.exec_driver_sql(LAG_QUERY).scalar())
+        except Exception as e:
+            logger.warning('Replica lag probe failed, reading from primary: %s', e)
+            return None
+
+    def stats(self):
+        """Replica state and read counts for this worker"""
+        return {
+            'enabled': self.enabled,
+            'lag_seconds': self.lag,
+            'healthy': self.enabled and self.lag is not None and self.lag <= self.max_lag_seconds,
+            'reads': dict(self.reads)
+        }
+
+    def _view(self):
+        return current_app.view_functions.get(request.endpoint) if request.endpoint else None
+
+    def _sticky_key(self):
+        """Identify the caller from the JWT subject without verifying it"""
+        # Only a spoofed key's reads move to the primary, so skipping
+        # signature verification here is safe and saves the work twice
+        tenant = g.get('tenant')
+        prefix = tenant.subdomain if tenant is not None else '-'
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            try:
+                claims = pyjwt.decode(header[7:], options={'verify_signature': False})
+                return f"{prefix}:{claims.get('sub')}"
+            except pyjwt.PyJWTError:
+                pass
+        return f'{prefix}:{request.remote_addr}'
+
+
+replica_router = ReplicaRouter()
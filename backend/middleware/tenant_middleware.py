@@ -1,8 +1,19 @@
 """Multi-tenant middleware for schema-based tenant isolation"""
+import threading
+import time
 from flask import g, request
-from sqlalchemy import text
 from models import db
 from models.tenant import Tenant
+from utils.database import use_schema
+from utils.shards import remember_shard
+from utils.tracing import span
+from middleware.rate_limit import rate_limiter
+from middleware.query_budget import breaker_open_response
+from utils.circuit_breaker import tenant_breakers
+
+# Active tenants by subdomain: {subdomain: (tenant, expires_at)}
+_tenant_cache = {}
+_tenant_cache_lock = threading.Lock()
 
 
 class TenantMiddleware:
@@ -10,11 +21,14 @@ class TenantMiddleware:
     
     def __init__(self, app=None):
         self.app = app
+        self.cache_seconds = 30
         if app is not None:
             self.init_app(app)
     
     def init_app(self, app):
         """Initialize middleware with Flask app"""
+        self.cache_seconds = app.config['TENANT_CACHE_SECONDS']
+        rate_limiter.init_app(app)
         app.before_request(self.before_request)
         app.teardown_appcontext(self.teardown)
     
@@ -24,29 +38,62 @@ class TenantMiddleware:
         if self._should_skip_tenant_detection():
             return
         
+        with span('tenant.resolve'):
+            return self._resolve_tenant()
+    
+    def _resolve_tenant(self):
+        """Look up, admit and bind the request's tenant"""
         # Extract subdomain from request
         subdomain = self._extract_subdomain()
         
         if not subdomain:
             return {'error': 'Tenant subdomain is required'}, 400
         
-        # Lookup tenant in master database
-        tenant = Tenant.query.filter_by(subdomain=subdomain, is_active=True).first()
+        # Lookup tenant (cached, so a warm worker does no DB work here)
+        tenant = self._lookup_tenant(subdomain)
         
         if not tenant:
             return {'error': f'Tenant not found: {subdomain}'}, 404
         
+        # Enforce per-tenant rate and concurrency quotas
+        limited = rate_limiter.admit(tenant)
+        if limited:
+            return limited
+        
+        # Fast-fail tenants whose queries keep timing out
+        breaker = tenant_breakers.get(tenant.subdomain)
+        if not breaker.allow():
+            return breaker_open_response(breaker)
+        g.budget_tenant = tenant.subdomain
+        
         # Store tenant in Flask g object
         g.tenant = tenant
         
-        # Set PostgreSQL search_path to tenant schema
+        # Bind the session to the tenant's shard and schema
+        remember_shard(tenant.schema_name, tenant.shard)
         self._set_schema(tenant.schema_name)
     
+    def _lookup_tenant(self, subdomain):
+        """Get an active tenant by subdomain from the cache or master database"""
+        now = time.monotonic()
+        cached = _tenant_cache.get(subdomain)
+        if cached and cached[1] > now:
+            return cached[0]
+        
+        tenant = Tenant.query.filter_by(subdomain=subdomain, is_active=True).first()
+        if tenant:
+            # Detach so the cached copy outlives this request's session
+            db.session.expunge(tenant)
+            with _tenant_cache_lock:
+                _tenant_cache[subdomain] = (tenant, now + self.cache_seconds)
+        return tenant
+    
     def _should_skip_tenant_detection(self):
         """Check if tenant detection should be skipped for this route"""
         # Public endpoints that don't require tenant context
         public_endpoints = [
             '/health',
+            '/metrics',
             '/',
             '/api/tenants',  # Tenant creation (POST) and listing (GET)
         ]
@@ -86,25 +133,31 @@ class TenantMiddleware:
     
     def _set_schema(self, schema_name):
         """Set PostgreSQL search_path to tenant schema"""
-        try:
-            # Set search_path for this connection
-            db.session.execute(text(f"SET search_path TO {schema_name}, public"))
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            raise Exception(f'Failed to set schema: {str(e)}')
+        # Applied per transaction, so no round trip is needed here
+        use_schema(schema_name)
     
     def teardown(self, exception=None):
         """Reset schema after request"""
+        rate_limiter.release()
+        
         if hasattr(g, 'tenant'):
-            try:
-                # Reset to public schema
-                db.session.execute(text("SET search_path TO public"))
-                db.session.commit()
-            except:
-                pass
+            db.session.info.pop('search_path', None)
 
 
 def get_current_tenant():
     """Get current tenant from Flask g object"""
     return getattr(g, 'tenant', None)
+
+
+def tenant_cache_size():
+    """Get the number of tenants cached by this worker"""
+    return len(_tenant_cache)
+
+
+def invalidate_tenant_cache(subdomain=None):
+    """Drop a cached tenant (or all of them) after it changes"""
+    with _tenant_cache_lock:
+        if subdomain is None:
+            _tenant_cache.clear()
+        else:
+            _tenant_cache.pop(subdomain, None)
@@ -0,0 +1,155 @@
+"""Request tracing hooks: root spans, SQL spans and traceparent propagation"""
+import logging
+import random
+import threading
+import time
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from middleware.query_guard import normalize_statement
+from utils.tracing import (Trace, current_trace, format_traceparent, load_exporter, new_trace_id,
+                           parse_traceparent)
+from utils.batch import in_batch_operation
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTracer:
+    """
+    Traces a sample of requests into spans for each stage
+
+    A request is traced with probability TRACE_SAMPLE_RATE, or when its
+    incoming traceparent is marked sampled. Callers choose that flag, so
+    each worker honours at most TRACE_UPSTREAM_PER_SECOND of them (a
+    token bucket); the rest fall back to TRACE_SAMPLE_RATE. The root span
+    covers the whole request including streamed bodies; tenant
+    resolution, authentication, permission checks, SQL statements and
+    serialization are child spans. Finished traces go to the exporter
+    named by TRACE_EXPORTER and the response carries our traceparent.
+    """
+
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.max_spans = 500
+        self.exporter = None
+        self.upstream_rate = 1.0
+        self._upstream_tokens = 1.0
+        self._upstream_updated = time.monotonic()
+        self._upstream_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize tracing with Flask app"""
+        self.sample_rate = app.config['TRACE_SAMPLE_RATE']
+        self.max_spans = app.config['TRACE_MAX_SPANS']
+        self.upstream_rate = app.config['TRACE_UPSTREAM_PER_SECOND']
+        self._upstream_tokens = max(self.upstream_rate, 1.0)
+        self.exporter = load_exporter(app.config['TRACE_EXPORTER'], app.config['TRACE_FILE'],
+                                      app.config['TRACE_FILE_MAX_BYTES'])
+        app.extensions['tracer'] = self
+        if self.exporter is None:
+            return
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+
+    def before_request(self):
+        """Start a trace for sampled requests"""
+        parent = parse_traceparent(request.headers.get('traceparent'))
+        if parent is not None:
+            trace_id, parent_id, upstream_sampled = parent
+        else:
+            trace_id, parent_id, upstream_sampled = new_trace_id(), None, False
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and upstream_sampled:
+            sampled = self.allow_upstream_sampled()
+        if not sampled:
+            return
+
+        g.trace = Trace(trace_id, self.max_spans)
+        g.trace_root = g.trace.start(f'{request.method} {request.url_rule or request.path}', {
+            'http.method': request.method,
+            'http.route': request.url_rule.rule if request.url_rule else None,
+            'endpoint': request.endpoint,
+        }, parent_id=parent_id)
+
+    def allow_upstream_sampled(self, now=None):
+        """
+        Take a token for tracing a request because its caller asked to
+
+        Args:
+            now: Current time.monotonic(), for tests
+
+        Returns:
+            bool: True if this worker is under TRACE_UPSTREAM_PER_SECOND
+        """
+        if self.upstream_rate <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._upstream_lock:
+            burst = max(self.upstream_rate, 1.0)
+            elapsed = max(0.0, now - self._upstream_updated)
+            self._upstream_tokens = min(burst, self._upstream_tokens + elapsed * self.upstream_rate)
+            self._upstream_updated = now
+            if self._upstream_tokens < 1:
+                return False
+            self._upstream_tokens -= 1
+            return True
+
+    def after_request(self, response):
+        """Record the status and hand our span context back to the caller"""
+        root = g.get('trace_root')
+        if root is not None:
+            root['attributes']['http.status_code'] = response.status_code
+            response.headers['traceparent'] = format_traceparent(root['trace_id'], root['span_id'])
+        return response
+
+    def teardown_request(self, exception=None):
+        """Finish the trace and export its spans"""
+        # Batch operations are traced inside the batch request
+        if in_batch_operation():
+            return
+        trace = g.pop('trace', None)
+        root = g.pop('trace_root', None)
+        if trace is None:
+            return
+        tenant = g.get('tenant')
+        if tenant is not None:
+            root['attributes']['tenant'] = tenant.subdomain
+        trace.end(root, exception)
+        if trace.dropped:
+            root['attributes']['spans.dropped'] = trace.dropped
+        try:
+            self.exporter.export(trace.spans)
+        except Exception as e:
+            logger.warning('Span export failed: %s', e)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace()
+        if trace is not None:
+            conn.info['trace_span'] = trace.start('sql', {
+                'db.system': 'postgresql',
+                'db.statement': normalize_statement(statement)[:300],
+            })
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        span = conn.info.pop('trace_span', None)
+        trace = current_trace()
+        if span is not None and trace is not None:
+            trace.end(span)
+
+    def _handle_error(self, context):
+        conn = context.connection
+        span = conn.info.pop('trace_span', None) if conn is not None else None
+        trace = current_trace()
+        if span is not None and trace is not None:
+            trace.end(span, context.original_exception)
+
+
+request_tracer = RequestTracer()
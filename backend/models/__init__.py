@@ -1,4 +1,5 @@
 """Database models package"""
 from flask_sqlalchemy import SQLAlchemy
+from models.session import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -0,0 +1,37 @@
+"""Activity log model - stored in tenant-specific schema"""
+from datetime import datetime
+from models import db
+
+
+class Activity(db.Model):
+    """Append-only record of who did what on a board, partitioned by month"""
+    __tablename__ = 'activity_log'
+    __table_args__ = (
+        db.Index('ix_activity_log_project_id', 'project_id', 'id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    # Partitioned tables need the partition key in the primary key
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    created_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
+    # No foreign keys: history must survive deleted projects, rows and users
+    project_id = db.Column(db.Integer, nullable=False)
+    actor_id = db.Column(db.Integer)
+    action = db.Column(db.String(40), nullable=False)  # e.g. task.moved, list.created
+    entity_id = db.Column(db.Integer)
+    details = db.Column(db.JSON)
+
+    def __repr__(self):
+        return f'<Activity {self.action} by {self.actor_id}>'
+
+    def to_dict(self):
+        """Convert activity entry to dictionary"""
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'actor_id': self.actor_id,
+            'action': self.action,
+            'entity_id': self.entity_id,
+            'details': self.details or {},
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,77 @@
+"""Archived task and comment models - stored in tenant-specific schema"""
+from datetime import datetime
+from models import db
+from models.task import Task
+
+
+class ArchivedTask(db.Model):
+    """Completed task moved out of the live tasks table by archive_completed_tasks()"""
+    __tablename__ = 'archived_tasks'
+    __table_args__ = (
+        db.Index('ix_archived_tasks_project_id', 'project_id', 'id'),
+    )
+
+    # Same ids and columns as in tasks. No foreign keys: the archive must
+    # survive deleted lists, projects and users.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    list_id = db.Column(db.Integer, nullable=False)
+    assignee_id = db.Column(db.Integer)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    priority = db.Column(db.String(20))
+    labels = db.Column(db.JSON)
+    due_date = db.Column(db.DateTime)
+    completed = db.Column(db.Boolean, default=True, nullable=False)
+    completed_at = db.Column(db.DateTime)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    # Denormalized so the archive can be read per board without the lists
+    project_id = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<ArchivedTask {self.title}>'
+
+    def to_dict(self, assignee=None):
+        """Convert archived task to dictionary (task fields plus project_id and archived_at)"""
+        data = Task.row_to_dict(self, assignee)
+        data['project_id'] = self.project_id
+        data['archived_at'] = self.archived_at.isoformat()
+        return data
+
+
+class ArchivedComment(db.Model):
+    """Comment of an archived task"""
+    __tablename__ = 'archived_comments'
+    __table_args__ = (
+        db.Index('ix_archived_comments_task_id', 'task_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(db.Text, nullable=False)
+    task_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ArchivedComment on Task {self.task_id}>'
+
+    def to_dict(self, user=None):
+        """
+        Convert archived comment to dictionary
+
+        Args:
+            user: Already serialized author, if any
+        """
+        return {
+            'id': self.id,
+            'content': self.content,
+            'task_id': self.task_id,
+            'user_id': self.user_id,
+            'user': user,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
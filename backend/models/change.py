@@ -0,0 +1,23 @@
+"""Change log model - stored in tenant-specific schema"""
+from datetime import datetime
+from models import db
+
+
+class ChangeLog(db.Model):
+    """Append-only log of board changes, used as the delta sync cursor"""
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.Index('ix_change_log_project_cursor', 'project_id', 'id'),
+    )
+
+    # The id doubles as the sync cursor handed to clients
+    id = db.Column(db.BigInteger, primary_key=True)
+    # No foreign keys: tombstones must outlive the rows they describe
+    project_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # project, list, task, comment, member
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # created, updated, deleted
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ChangeLog {self.id} {self.entity}:{self.entity_id} {self.op}>'
@@ -1,6 +1,7 @@
 """List model - stored in tenant-specific schema"""
 from datetime import datetime
 from models import db
+from utils.tracing import traced
 
 
 class List(db.Model):
@@ -21,6 +22,7 @@ class List(db.Model):
     def __repr__(self):
         return f'<List {self.name}>'
     
+    @traced('serialize')
     def to_dict(self, include_tasks=False):
         """Convert list to dictionary"""
         data = {
@@ -1,6 +1,7 @@
 """Project model - stored in tenant-specific schema"""
 from datetime import datetime
 from models import db
+from utils.tracing import traced
 
 
 # Association table for project members
@@ -34,6 +35,7 @@ class Project(db.Model):
     def __repr__(self):
         return f'<Project {self.name}>'
     
+    @traced('serialize')
     def to_dict(self, include_lists=False, include_members=False):
         """Convert project to dictionary"""
         data = {
@@ -0,0 +1,19 @@
+"""Revoked token model - stored in master database"""
+from datetime import datetime
+from models import db
+
+
+class RevokedToken(db.Model):
+    """JWT revoked before its expiry (logout), shared by all workers"""
+    __tablename__ = 'revoked_tokens'
+    # Pinned to public so tenant search_paths never shadow it
+    __table_args__ = {'schema': 'public', 'info': {'master': True}}
+
+    # The id doubles as the sync watermark for in-memory revocation sets
+    id = db.Column(db.BigInteger, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
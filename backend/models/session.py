@@ -0,0 +1,60 @@
+"""Session class that applies the tenant schema and routes to shards and replicas"""
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.util import find_tables
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session with per-transaction tenant schema and routing
+
+    `info['search_path']` names the tenant schema; every transaction the
+    session begins, on any engine, starts with SET LOCAL search_path so the
+    schema cannot leak across pooled connections. `info['shard_bind']` is
+    the bind key of the tenant's shard: everything except master tables
+    (marked with table info 'master') goes there. On the master database,
+    when `info['read_replica']` is set, plain SELECTs outside a flush go to
+    the 'replica' bind. While `info['defer_commit']` is set (an atomic
+    batch), commit() only flushes so the caller can commit once at the end.
+    """
+
+    def commit(self):
+        if self.info.get('defer_commit'):
+            self.flush()
+            return
+        super().commit()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            shard_bind = self.info.get('shard_bind')
+            if shard_bind is not None and not _touches_master(mapper, clause):
+                return self._db.engines[shard_bind]
+            if self.info.get('read_replica') and _is_plain_select(clause) and not self._flushing:
+                replica = self._db.engines.get('replica')
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _touches_master(mapper, clause):
+    if mapper is not None:
+        table = getattr(mapper, 'local_table', None)
+        if table is None and isinstance(mapper, type):
+            table = getattr(mapper, '__table__', None)
+        if table is not None and table.info.get('master'):
+            return True
+    if clause is not None:
+        return any(table.info.get('master') for table in find_tables(clause, include_crud=True))
+    return False
+
+
+def _is_plain_select(clause):
+    return clause is not None and getattr(clause, 'is_select', False) \
+        and getattr(clause, '_for_update_arg', None) is None
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def _apply_search_path(session, transaction, connection):
+    schema_name = session.info.get('search_path')
+    if schema_name:
+        connection.exec_driver_sql(f'SET LOCAL search_path TO {schema_name}, public')
@@ -1,11 +1,17 @@
 """Task model - stored in tenant-specific schema"""
 from datetime import datetime
+from sqlalchemy import event, inspect, update
 from models import db
+from utils.tracing import traced
 
 
 class Task(db.Model):
     """Task/Card model for Kanban boards"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # Finds archivable tasks (utils/archive.py) without scanning open ones
+        db.Index('ix_tasks_completed_at', 'completed_at', postgresql_where=db.text('completed')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -20,6 +26,8 @@ class Task(db.Model):
     due_date = db.Column(db.DateTime)
     completed = db.Column(db.Boolean, default=False, nullable=False)
     completed_at = db.Column(db.DateTime)
+    # Maintained by the Comment insert/delete listeners below
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -32,34 +40,73 @@ class Task(db.Model):
     def __repr__(self):
         return f'<Task {self.title}>'
     
+    @traced('serialize')
     def to_dict(self, include_comments=False):
         """Convert task to dictionary"""
-        data = {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'list_id': self.list_id,
-            'assignee_id': self.assignee_id,
-            'assignee': self.assignee.to_dict(include_email=False) if self.assignee else None,
-            'position': self.position,
-            'priority': self.priority,
-            'labels': self.labels or [],
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'completed': self.completed,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        assignee = self.assignee.to_dict(include_email=False) if self.assignee else None
+        data = Task.row_to_dict(self, assignee)
         
         if include_comments:
             data['comments'] = [comment.to_dict() for comment in self.comments]
         
         return data
+    
+    @staticmethod
+    def row_to_dict(row, assignee=None, fields=None):
+        """
+        Convert a task row to dictionary without loading relationships
+        
+        Args:
+            row: Task instance or Core row with (at least) the needed columns
+            assignee: Already serialized assignee, if any
+            fields: Field names to include, in order (default: all)
+        """
+        return {
+            field: assignee if field == 'assignee' else TASK_SERIALIZERS[field](row)
+            for field in (fields or TASK_FIELDS) if field in TASK_SERIALIZERS
+        }
+    
+    @staticmethod
+    def columns_for(fields=None):
+        """Get the task table columns needed to serialize the given fields"""
+        if not fields:
+            return list(Task.__table__.c)
+        names = {'assignee_id' if field == 'assignee' else field for field in fields}
+        return [column for column in Task.__table__.c if column.name in names]
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+# Serializers for Task.row_to_dict in default field order ('assignee' is
+# passed in already serialized)
+TASK_SERIALIZERS = {
+    'id': lambda row: row.id,
+    'title': lambda row: row.title,
+    'description': lambda row: row.description,
+    'list_id': lambda row: row.list_id,
+    'assignee_id': lambda row: row.assignee_id,
+    'assignee': None,
+    'position': lambda row: row.position,
+    'priority': lambda row: row.priority,
+    'labels': lambda row: row.labels or [],
+    'due_date': lambda row: _isoformat(row.due_date),
+    'completed': lambda row: row.completed,
+    'completed_at': lambda row: _isoformat(row.completed_at),
+    'comment_count': lambda row: row.comment_count,
+    'created_at': lambda row: row.created_at.isoformat(),
+    'updated_at': lambda row: row.updated_at.isoformat(),
+}
+TASK_FIELDS = list(TASK_SERIALIZERS)
 
 
 class Comment(db.Model):
     """Comment model for tasks"""
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_task_id', 'task_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -75,14 +122,49 @@ class Comment(db.Model):
     def __repr__(self):
         return f'<Comment on Task {self.task_id}>'
     
-    def to_dict(self):
-        """Convert comment to dictionary"""
+    @traced('serialize')
+    def to_dict(self, user=None):
+        """
+        Convert comment to dictionary
+        
+        Args:
+            user: Already serialized author (default: serialize self.user)
+        """
+        if user is None and self.user:
+            user = self.user.to_dict(include_email=False)
         return {
             'id': self.id,
             'content': self.content,
             'task_id': self.task_id,
             'user_id': self.user_id,
-            'user': self.user.to_dict(include_email=False) if self.user else None,
+            'user': user,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+
+
+def _adjust_comment_count(connection, task_id, delta):
+    tasks = Task.__table__
+    connection.execute(
+        update(tasks).where(tasks.c.id == task_id)
+        # Not an edit of the task, so keep updated_at
+        .values(comment_count=tasks.c.comment_count + delta, updated_at=tasks.c.updated_at)
+    )
+
+
+# Keep Task.comment_count in step with comments added or deleted through
+# the ORM, in the same transaction. Bulk deletes must adjust it themselves.
+@event.listens_for(Comment, 'after_insert')
+def _count_inserted_comment(mapper, connection, comment):
+    _adjust_comment_count(connection, comment.task_id, 1)
+
+
+@event.listens_for(Comment, 'after_delete')
+def _count_deleted_comment(mapper, connection, comment):
+    # Comments cascaded from a deleted task leave no count to maintain
+    session = inspect(comment).session
+    if session is not None:
+        task = session.identity_map.get(inspect(Task).identity_key_from_primary_key((comment.task_id,)))
+        if task is not None and task in session.deleted:
+            return
+    _adjust_comment_count(connection, comment.task_id, -1)
@@ -7,6 +7,8 @@ class Tenant(db.Model):
     """Tenant model for multi-tenant architecture"""
     __tablename__ = 'tenants'
     __bind_key__ = None  # Uses default/master database
+    # Never routed to a tenant's shard
+    __table_args__ = {'info': {'master': True}}
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -20,6 +22,15 @@ class Tenant(db.Model):
     contact_email = db.Column(db.String(120))
     max_users = db.Column(db.Integer, default=10)
     
+    # Request quotas per instance (NULL uses the configured defaults)
+    rate_limit_per_second = db.Column(db.Float)
+    rate_limit_burst = db.Column(db.Integer)
+    max_concurrent_requests = db.Column(db.Integer)
+    statement_timeout_ms = db.Column(db.Integer)
+    
+    # Database cluster hosting the tenant schema (see SHARD_DATABASE_URLS)
+    shard = db.Column(db.String(50), nullable=False, default='default', server_default='default')
+    
     def __repr__(self):
         return f'<Tenant {self.subdomain}>'
     
@@ -34,7 +45,12 @@ class Tenant(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'contact_email': self.contact_email,
-            'max_users': self.max_users
+            'max_users': self.max_users,
+            'rate_limit_per_second': self.rate_limit_per_second,
+            'rate_limit_burst': self.rate_limit_burst,
+            'max_concurrent_requests': self.max_concurrent_requests,
+            'statement_timeout_ms': self.statement_timeout_ms,
+            'shard': self.shard
         }
     
     @staticmethod
@@ -1,7 +1,8 @@
 """User model - stored in tenant-specific schema"""
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import db
+from utils.tracing import traced
+from utils.passwords import password_hasher
 
 
 class User(db.Model):
@@ -28,12 +29,17 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the configured method or cost"""
+        return password_hasher.needs_rehash(self.password_hash)
+    
+    @traced('serialize')
     def to_dict(self, include_email=True):
         """Convert user to dictionary"""
         data = {
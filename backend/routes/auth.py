@@ -2,12 +2,14 @@
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
-    create_access_token, create_refresh_token,
+    create_access_token, create_refresh_token, decode_token,
     jwt_required, get_jwt_identity, get_jwt
 )
 from models import db
 from models.user import User
 from middleware.tenant_middleware import get_current_tenant
+from utils.revocation import revocation_store
+from utils.write_behind import write_behind
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -78,18 +80,26 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'Account is inactive'}), 403
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.session.commit()
+    # Transparently upgrade hashes made with an older method or cost
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+    
+    # Update last login through the write-behind buffer (no commit here)
+    last_login = datetime.utcnow()
+    write_behind.touch('users', user.id, last_login=last_login)
     
     # Create tokens
     access_token = create_access_token(identity=user.id)
     refresh_token = create_refresh_token(identity=user.id)
     
+    user_data = user.to_dict()
+    user_data['last_login'] = last_login.isoformat()
+    
     return jsonify({
         'access_token': access_token,
         'refresh_token': refresh_token,
-        'user': user.to_dict()
+        'user': user_data
     }), 200
 
 
@@ -121,6 +131,23 @@ def get_current_user_info():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    """Logout (client should delete tokens)"""
-    # In a production app, you might want to blacklist the token
+    """Logout by revoking the access token (and refresh token, if sent)"""
+    claims = get_jwt()
+    
+    # Validate the refresh token before revoking anything, so a bad one
+    # does not leave the client half logged out
+    refresh_claims = None
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            refresh_claims = decode_token(data['refresh_token'])
+        except Exception:
+            return jsonify({'error': 'Invalid refresh token'}), 400
+        if refresh_claims.get('sub') != claims.get('sub'):
+            return jsonify({'error': 'Refresh token belongs to another user'}), 400
+    
+    revocation_store.revoke(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+    if refresh_claims:
+        revocation_store.revoke(refresh_claims['jti'], datetime.utcfromtimestamp(refresh_claims['exp']))
+    
     return jsonify({'message': 'Logged out successfully'}), 200
@@ -0,0 +1,185 @@
+"""Batch API: several API calls in one HTTP round trip"""
+import re
+from urllib.parse import urlsplit
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
+from werkzeug.exceptions import HTTPException
+from models import db
+from utils.activity import discard_deferred_activity, publish_deferred_activity
+from utils.batch import batch_operation
+
+batch_bp = Blueprint('batch', __name__, url_prefix='/api/batch')
+
+# Blueprints whose routes may run inside a batch (the tenant-scoped API)
+BATCHABLE_BLUEPRINTS = {'users', 'projects', 'lists', 'tasks'}
+
+# Endpoints of those blueprints that stream instead of answering with JSON
+STREAMING_ENDPOINTS = {'projects.stream_project_events'}
+
+# Request headers passed on to every operation
+FORWARDED_HEADERS = ['Authorization', 'X-Tenant-Subdomain']
+
+# "$0.list.id" is the list.id value in the response body of operation 0
+REFERENCE = re.compile(r'\$(\d+)((?:\.\w+)+)')
+
+
+@batch_bp.route('', methods=['POST'])
+@jwt_required()
+def run_batch():
+    """
+    Run an ordered list of API operations
+
+    Body:
+        operations: [{"method": "POST", "path": "/lists/3/tasks", "body": {...}}, ...]
+            Paths are relative to /api and may reference earlier results,
+            e.g. "/tasks/lists/$0.list.id/tasks".
+        atomic: Commit all operations together, or none if one fails
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+
+    max_operations = current_app.config['BATCH_MAX_OPERATIONS']
+    if len(operations) > max_operations:
+        return jsonify({'error': f'A batch can hold at most {max_operations} operations'}), 400
+
+    atomic = bool(data.get('atomic'))
+    results = []
+    failed = False
+
+    # Views commit as usual; in an atomic batch their commits only flush
+    if atomic:
+        db.session.info['defer_commit'] = True
+    try:
+        for operation in operations:
+            if atomic and failed:
+                results.append({'status': 424, 'body': {'error': 'Skipped after a failed operation'}})
+                continue
+            status, body = run_operation(operation, results)
+            results.append({'status': status, 'body': body})
+            failed = failed or status >= 400
+    finally:
+        db.session.info.pop('defer_commit', None)
+
+    committed = not failed
+    if atomic:
+        # Activity recorded by the operations is only kept if the batch commits
+        if failed:
+            db.session.rollback()
+            discard_deferred_activity()
+        else:
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                discard_deferred_activity()
+                return jsonify({'error': f'Batch commit failed: {str(e)}', 'results': results}), 500
+            publish_deferred_activity()
+
+    return jsonify({
+        'results': results,
+        'atomic': atomic,
+        'committed': committed if atomic else None
+    }), 200
+
+
+def run_operation(operation, results):
+    """
+    Dispatch one operation to its view in a sub-request
+
+    The sub-request shares the batch's app context: the tenant resolved by
+    TenantMiddleware, the query budget and the database session (with the
+    user it already loaded) are reused, and before_request hooks do not
+    run again.
+
+    Args:
+        operation: {"method", "path", "body"} of the operation
+        results: Results of the earlier operations, for references
+
+    Returns:
+        tuple: (status code, JSON body)
+    """
+    if not isinstance(operation, dict):
+        return 400, {'error': 'Each operation must be an object'}
+
+    method = str(operation.get('method', 'GET')).upper()
+    try:
+        path = resolve_references(operation.get('path'), results)
+        body = resolve_references(operation.get('body'), results)
+    except LookupError as e:
+        return 400, {'error': f'Unresolved reference: {e}'}
+
+    if not isinstance(path, str) or not path.startswith('/'):
+        return 400, {'error': 'Operation path is required'}
+    if not path.startswith('/api/'):
+        path = '/api' + path
+
+    try:
+        endpoint, _ = current_app.url_map.bind('').match(urlsplit(path).path, method)
+    except HTTPException as e:
+        return e.code, {'error': e.description}
+    if endpoint.split('.')[0] not in BATCHABLE_BLUEPRINTS or endpoint in STREAMING_ENDPOINTS:
+        return 400, {'error': f'{method} {path} cannot run in a batch'}
+
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    with batch_operation():
+        with current_app.test_request_context(path, method=method, json=body, headers=headers,
+                                              base_url=request.host_url):
+            try:
+                rv = current_app.dispatch_request()
+            except Exception as e:
+                try:
+                    rv = current_app.handle_user_exception(e)
+                except Exception as unhandled:
+                    db.session.rollback()
+                    return 500, {'error': f'Operation failed: {str(unhandled)}'}
+            if isinstance(rv, HTTPException):
+                return rv.code, {'error': rv.description}
+            response = current_app.make_response(rv)
+            try:
+                if not response.is_json:
+                    # Event streams and files have no place in a JSON batch
+                    return 400, {'error': f'{method} {path} cannot run in a batch'}
+                # Read streamed bodies while the sub-request is still active
+                return response.status_code, response.get_json(silent=True)
+            finally:
+                # Runs the view's cleanup even if its body was never iterated
+                response.close()
+
+
+def resolve_references(value, results):
+    """
+    Replace "$<index>.<key>..." references with values from earlier results
+
+    A string that is exactly one reference takes the referenced value as
+    is (so ids stay integers); references inside longer strings are
+    formatted in.
+
+    Raises:
+        LookupError: If a reference points at a missing operation or key
+    """
+    if isinstance(value, dict):
+        return {key: resolve_references(item, results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, results) for item in value]
+    if not isinstance(value, str) or '$' not in value:
+        return value
+
+    match = REFERENCE.fullmatch(value)
+    if match:
+        return _lookup(match, results)
+    return REFERENCE.sub(lambda m: str(_lookup(m, results)), value)
+
+
+def _lookup(match, results):
+    index = int(match.group(1))
+    if index >= len(results):
+        raise LookupError(match.group(0))
+    value = results[index]['body']
+    for key in match.group(2)[1:].split('.'):
+        if not isinstance(value, dict) or key not in value:
+            raise LookupError(match.group(0))
+        value = value[key]
+    return value
@@ -0,0 +1,28 @@
+"""Health and readiness routes"""
+from flask import Blueprint, jsonify
+from utils.circuit_breaker import tenant_breakers
+from utils.readiness import UNREADY, readiness
+
+health_bp = Blueprint('health', __name__, url_prefix='/health')
+
+
+@health_bp.route('', methods=['GET'])
+def health():
+    """Liveness check; does no database work"""
+    return jsonify({
+        'status': 'healthy',
+        'service': 'multi-tenant-saas',
+        'circuit_breakers': tenant_breakers.stats()
+    }), 200
+
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness check for load balancers
+
+    Answers 503 when this worker should be taken out of rotation and 200
+    (ready or degraded, with reasons) otherwise.
+    """
+    result = readiness.check()
+    return jsonify(result), 503 if result['status'] == UNREADY else 200
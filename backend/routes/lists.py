@@ -1,20 +1,29 @@
 """List management routes"""
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
+from sqlalchemy.orm import joinedload
 from models import db
 from models.list import List
 from models.project import Project
+from models.task import Task
+from middleware.query_guard import max_queries
 from middleware.rbac import get_current_user, check_permission
+from utils.activity import record_activity
+from utils.board_stream import (iter_board_json, iter_lists_json, load_assignees, load_lists,
+                                stream_json, task_rows)
+from utils.fieldsets import request_fieldsets
+from utils.events import publish_change
 
 lists_bp = Blueprint('lists', __name__, url_prefix='/api/lists')
 
 
 @lists_bp.route('/<int:list_id>', methods=['GET'])
 @jwt_required()
+@max_queries(4)
 def get_list(list_id):
     """Get list with tasks"""
     current_user = get_current_user()
-    lst = List.query.get(list_id)
+    lst = List.query.options(joinedload(List.project).joinedload(Project.members)).get(list_id)
     
     if not lst:
         return jsonify({'error': 'List not found'}), 404
@@ -22,7 +31,20 @@ def get_list(list_id):
     if not check_permission(current_user, lst.project, 'view'):
         return jsonify({'error': 'Access denied'}), 403
     
-    return jsonify(lst.to_dict(include_tasks=True)), 200
+    fieldsets = request_fieldsets('lists')
+    data = fieldsets.filter('lists', lst.to_dict())
+    
+    if fieldsets.includes('lists', 'tasks'):
+        # Select only the columns the requested task fields need
+        fields = fieldsets.get('tasks')
+        condition = Task.list_id == list_id
+        assignees = load_assignees(condition, fields)
+        data['tasks'] = [
+            Task.row_to_dict(row, assignees.get(row.assignee_id) if assignees else None, fields)
+            for row in task_rows(condition, fields)
+        ]
+    
+    return jsonify(data), 200
 
 
 @lists_bp.route('/<int:list_id>', methods=['PUT'])
@@ -46,7 +68,12 @@ def update_list(list_id):
         lst.position = data['position']
     
     try:
+        db.session.flush()
+        publish_change(lst.project_id, 'list', 'updated', lst.id, lst.to_dict())
         db.session.commit()
+        record_activity(current_user, 'list.updated', lst.project_id, list_id, {
+            'fields': [field for field in ('name', 'position') if field in data]
+        })
         return jsonify({
             'message': 'List updated successfully',
             'list': lst.to_dict()
@@ -70,8 +97,11 @@ def delete_list(list_id):
         return jsonify({'error': 'Access denied'}), 403
     
     try:
+        project_id, name = lst.project_id, lst.name
+        publish_change(project_id, 'list', 'deleted', lst.id)
         db.session.delete(lst)
         db.session.commit()
+        record_activity(current_user, 'list.deleted', project_id, list_id, {'name': name})
         return jsonify({'message': 'List deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -108,7 +138,10 @@ def create_list(project_id):
     
     try:
         db.session.add(lst)
+        db.session.flush()
+        publish_change(project_id, 'list', 'created', lst.id, lst.to_dict())
         db.session.commit()
+        record_activity(current_user, 'list.created', project_id, lst.id, {'name': data['name']})
         
         return jsonify({
             'message': 'List created successfully',
@@ -121,10 +154,11 @@ def create_list(project_id):
 
 @lists_bp.route('/projects/<int:project_id>/lists', methods=['GET'])
 @jwt_required()
+@max_queries(5)
 def get_project_lists(project_id):
     """Get all lists for a project"""
     current_user = get_current_user()
-    project = Project.query.get(project_id)
+    project = Project.query.options(joinedload(Project.members)).get(project_id)
     
     if not project:
         return jsonify({'error': 'Project not found'}), 404
@@ -132,9 +166,8 @@ def get_project_lists(project_id):
     if not check_permission(current_user, project, 'view'):
         return jsonify({'error': 'Access denied'}), 403
     
-    lists = List.query.filter_by(project_id=project_id).order_by(List.position).all()
+    fieldsets = request_fieldsets('lists')
+    lists = load_lists(project_id)
     
-    return jsonify({
-        'lists': [lst.to_dict(include_tasks=True) for lst in lists],
-        'total': len(lists)
-    }), 200
+    return stream_json(iter_board_json({'total': len(lists)},
+                                       iter_lists_json(project_id, lists, fieldsets)))
@@ -0,0 +1,23 @@
+"""Prometheus metrics route"""
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from middleware.metrics import request_metrics
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/metrics')
+
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+@metrics_bp.route('', methods=['GET'])
+def metrics():
+    """Request, latency and SQL metrics of all workers in Prometheus format"""
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    # Series name tenants and endpoints: without a token, only scrapers on
+    # this host may read them outside development and tests
+    if not token and not (current_app.debug or current_app.testing) and \
+            request.remote_addr not in LOCAL_ADDRESSES:
+        return jsonify({'error': 'Set METRICS_TOKEN to scrape metrics remotely'}), 403
+    
+    return Response(request_metrics.exposition(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,41 @@
+"""Request profiling routes (admin only)"""
+from flask import Blueprint, Response, request, jsonify
+from flask_jwt_extended import jwt_required
+from middleware.profiler import PROFILE_HEADER, request_profiler
+from middleware.rbac import get_current_user, require_admin
+from middleware.tenant_middleware import get_current_tenant
+
+profiles_bp = Blueprint('profiles', __name__, url_prefix='/api/profiles')
+
+
+@profiles_bp.route('/token', methods=['POST'])
+@jwt_required()
+@require_admin
+def create_profile_token():
+    """Issue a short-lived token that profiles the requests carrying it"""
+    if not request_profiler.enabled:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    
+    token = request_profiler.issue_token(get_current_tenant(), get_current_user())
+    
+    return jsonify({
+        'token': token,
+        'header': PROFILE_HEADER,
+        'expires_in': request_profiler.token_seconds
+    }), 201
+
+
+@profiles_bp.route('/<request_id>', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_profile(request_id):
+    """Get a stored profile; ?format=folded returns flamegraph input"""
+    profile = request_profiler.load(request_id)
+    
+    if not profile or profile['tenant'] != get_current_tenant().subdomain:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    if request.args.get('format') == 'folded':
+        return Response('\n'.join(profile['folded']) + '\n', mimetype='text/plain')
+    
+    return jsonify(profile), 200
@@ -1,13 +1,31 @@
 """Project management routes"""
-from flask import Blueprint, request, jsonify
+import queue
+import time
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
+from sqlalchemy.orm import joinedload, selectinload
 from models import db
+from models.activity import Activity
+from models.archive import ArchivedComment, ArchivedTask
 from models.project import Project
 from models.user import User
-from middleware.rbac import get_current_user, check_permission
+from middleware.metrics import request_metrics
+from middleware.rbac import get_current_user, check_permission, permission_class
+from middleware.query_guard import max_queries
+from middleware.replica import primary_only
+from middleware.tenant_middleware import get_current_tenant
+from utils.changes import collect_changes, current_cursor, cursor_expired
+from utils.activity import record_activity
+from utils.board_stream import iter_board_json, iter_lists_json, load_lists, stream_json
+from utils.events import board_events, format_sse, publish_change
+from utils.fieldsets import request_fieldsets
+from utils.single_flight import SingleFlight
 
 projects_bp = Blueprint('projects', __name__, url_prefix='/api/projects')
 
+# In-flight board loads, keyed by tenant, project, version and viewer
+board_reads = SingleFlight()
+
 
 @projects_bp.route('', methods=['POST'])
 @jwt_required()
@@ -37,6 +55,7 @@ def create_project():
     try:
         db.session.add(project)
         db.session.commit()
+        record_activity(current_user, 'project.created', project.id, project.id, {'name': project.name})
         
         return jsonify({
             'message': 'Project created successfully',
@@ -49,27 +68,235 @@ def create_project():
 
 @projects_bp.route('', methods=['GET'])
 @jwt_required()
+@max_queries(3)
 def list_projects():
     """List all projects user has access to"""
     current_user = get_current_user()
     
-    # Get projects where user is owner or member
-    projects = Project.query.filter(
+    # Get projects where user is owner or member (with owners and members up front)
+    projects = Project.query.options(
+        joinedload(Project.owner), selectinload(Project.members)
+    ).filter(
         (Project.owner_id == current_user.id) | 
         (Project.members.any(id=current_user.id))
     ).filter_by(is_archived=False).all()
     
+    fieldsets = request_fieldsets('projects')
     return jsonify({
-        'projects': [p.to_dict(include_members=True) for p in projects],
+        'projects': [project_to_dict(p, fieldsets) for p in projects],
         'total': len(projects)
     }), 200
 
 
 @projects_bp.route('/<int:project_id>', methods=['GET'])
 @jwt_required()
+@max_queries(6)
 def get_project(project_id):
     """Get project details with lists and tasks"""
     current_user = get_current_user()
+    project = Project.query.options(
+        joinedload(Project.owner), joinedload(Project.members)
+    ).get(project_id)
+    
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    
+    if not check_permission(current_user, project, 'view'):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    fieldsets = request_fieldsets('projects')
+    
+    # Read the cursor first so no change made during the load is skipped
+    cursor = current_cursor()
+    
+    if not fieldsets.includes('projects', 'lists'):
+        head = project_to_dict(project, fieldsets)
+        head['cursor'] = cursor
+        return jsonify(head), 200
+    
+    def board_json():
+        head = project_to_dict(project, fieldsets)
+        head['cursor'] = cursor
+        return iter_board_json(head, iter_lists_json(project_id, load_lists(project_id), fieldsets))
+    
+    if not current_app.config['BOARD_COALESCE_ENABLED']:
+        # Stream the board list by list instead of building it in memory
+        return stream_json(board_json())
+    
+    # Identical concurrent loads of one board version share one encoding
+    tenant = get_current_tenant()
+    key = (tenant.schema_name if tenant else None, project_id, cursor,
+           permission_class(current_user, project), request.args.get('fields', ''))
+    body, shared = board_reads.do(key, lambda: ''.join(board_json()).encode('utf-8'),
+                                  current_app.config['BOARD_COALESCE_WAIT_SECONDS'])
+    if request_metrics.enabled:
+        request_metrics.registry.inc('board_reads_total',
+                                     (('source', 'coalesced' if shared else 'computed'),))
+    return Response(body, mimetype='application/json')
+
+
+def project_to_dict(project, fieldsets):
+    """Serialize a project (with members) limited to the requested fields"""
+    include_members = fieldsets.includes('projects', 'members')
+    data = fieldsets.filter('projects', project.to_dict(include_members=include_members))
+    if include_members:
+        data['members'] = [fieldsets.filter('members', member) for member in data['members']]
+    return data
+
+
+@projects_bp.route('/<int:project_id>/changes', methods=['GET'])
+@jwt_required()
+@primary_only
+def get_project_changes(project_id):
+    """Get lists, tasks, comments and members changed since a cursor"""
+    current_user = get_current_user()
+    project = Project.query.get(project_id)
+    
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    
+    if not check_permission(current_user, project, 'view'):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'error': 'since cursor is required'}), 400
+    
+    if cursor_expired(since):
+        return jsonify({'error': 'Cursor expired, reload the board', 'resync': True}), 410
+    
+    limit = min(request.args.get('limit', current_app.config['CHANGES_PAGE_SIZE'], type=int),
+                current_app.config['CHANGES_PAGE_SIZE'])
+    
+    return jsonify(collect_changes(project_id, since, max(limit, 1),
+                                   current_app.config['CHANGES_OVERLAP_SECONDS'])), 200
+
+
+@projects_bp.route('/<int:project_id>/activity', methods=['GET'])
+@jwt_required()
+def get_project_activity(project_id):
+    """Get the project's activity feed, newest first"""
+    current_user = get_current_user()
+    project = Project.query.get(project_id)
+    
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    
+    if not check_permission(current_user, project, 'view'):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    per_page = min(request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int), 100)
+    before = request.args.get('before', type=int)
+    
+    # Keyset pagination: ?before=<id of the last entry on the previous page>
+    query = Activity.query.filter_by(project_id=project_id)
+    if before is not None:
+        query = query.filter(Activity.id < before)
+    entries = query.order_by(Activity.id.desc()).limit(per_page + 1).all()
+    
+    has_more = len(entries) > per_page
+    entries = entries[:per_page]
+    
+    # Load all actors in one query
+    actor_ids = {entry.actor_id for entry in entries if entry.actor_id}
+    actors = {user.id: user for user in User.query.filter(User.id.in_(actor_ids)).all()} if actor_ids else {}
+    
+    items = []
+    for entry in entries:
+        item = entry.to_dict()
+        actor = actors.get(entry.actor_id)
+        item['actor'] = actor.to_dict(include_email=False) if actor else None
+        items.append(item)
+    
+    return jsonify({
+        'activity': items,
+        'next_before': entries[-1].id if has_more else None
+    }), 200
+
+
+@projects_bp.route('/<int:project_id>/archive', methods=['GET'])
+@jwt_required()
+def get_project_archive(project_id):
+    """Get the project's archived (old completed) tasks, newest first"""
+    current_user = get_current_user()
+    project = Project.query.get(project_id)
+    
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    
+    if not check_permission(current_user, project, 'view'):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    per_page = max(min(request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int), 100), 1)
+    before = request.args.get('before', type=int)
+    
+    # Keyset pagination: ?before=<id of the last task on the previous page>
+    query = ArchivedTask.query.filter_by(project_id=project_id)
+    if before is not None:
+        query = query.filter(ArchivedTask.id < before)
+    tasks = query.order_by(ArchivedTask.id.desc()).limit(per_page + 1).all()
+    
+    has_more = len(tasks) > per_page
+    tasks = tasks[:per_page]
+    
+    # Load all assignees in one query
+    assignees = load_users({task.assignee_id for task in tasks})
+    
+    return jsonify({
+        'tasks': [task.to_dict(assignees.get(task.assignee_id)) for task in tasks],
+        'next_before': tasks[-1].id if has_more else None
+    }), 200
+
+
+@projects_bp.route('/<int:project_id>/archive/<int:task_id>', methods=['GET'])
+@jwt_required()
+def get_archived_task(project_id, task_id):
+    """Get an archived task with a page of its comments, newest first"""
+    current_user = get_current_user()
+    project = Project.query.get(project_id)
+    task = ArchivedTask.query.filter_by(id=task_id, project_id=project_id).first() if project else None
+    
+    if not task:
+        return jsonify({'error': 'Archived task not found'}), 404
+    
+    if not check_permission(current_user, project, 'view'):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    per_page = max(min(request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int), 100), 1)
+    before = request.args.get('before', type=int)
+    
+    query = ArchivedComment.query.filter_by(task_id=task_id)
+    if before is not None:
+        query = query.filter(ArchivedComment.id < before)
+    comments = query.order_by(ArchivedComment.id.desc()).limit(per_page + 1).all()
+    
+    has_more = len(comments) > per_page
+    comments = comments[:per_page]
+    
+    # Load the assignee and all authors in one query
+    users = load_users({task.assignee_id} | {comment.user_id for comment in comments})
+    
+    data = task.to_dict(users.get(task.assignee_id))
+    data['comments'] = [comment.to_dict(users.get(comment.user_id)) for comment in comments]
+    data['comments_next_before'] = comments[-1].id if has_more else None
+    return jsonify(data), 200
+
+
+def load_users(user_ids):
+    """Serialize the users with the given ids (without emails), in one query"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return {}
+    return {user.id: user.to_dict(include_email=False)
+            for user in User.query.filter(User.id.in_(user_ids))}
+
+
+@projects_bp.route('/<int:project_id>/events', methods=['GET'])
+@jwt_required()
+@primary_only
+def stream_project_events(project_id):
+    """Stream board changes as Server-Sent Events"""
+    current_user = get_current_user()
     project = Project.query.get(project_id)
     
     if not project:
@@ -78,7 +305,40 @@ def get_project(project_id):
     if not check_permission(current_user, project, 'view'):
         return jsonify({'error': 'Access denied'}), 403
     
-    return jsonify(project.to_dict(include_lists=True, include_members=True)), 200
+    # Each stream holds a worker thread; past the cap clients poll /changes
+    subscription = board_events.subscribe(get_current_tenant().schema_name, project_id,
+                                          current_app.config['BOARD_EVENTS_MAX_STREAMS'])
+    if subscription is None:
+        return jsonify({'error': 'Too many live board streams, poll for changes instead'}), 503, {
+            'Retry-After': str(current_app.config['BOARD_EVENTS_BUSY_RETRY_SECONDS'])
+        }
+    heartbeat = current_app.config['BOARD_EVENTS_HEARTBEAT_SECONDS']
+    duration = current_app.config['BOARD_EVENTS_STREAM_SECONDS']
+    
+    # Not wrapped in stream_with_context: the request (and its pooled DB
+    # connection) is torn down as soon as streaming starts. The stream ends
+    # after a bounded time so workers are recycled; clients reconnect.
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event, event_id=event.get('cursor'))
+        finally:
+            board_events.unsubscribe(subscription)
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # A generator closed before its first chunk never runs its finally
+    response.call_on_close(lambda: board_events.unsubscribe(subscription))
+    return response
 
 
 @projects_bp.route('/<int:project_id>', methods=['PUT'])
@@ -106,7 +366,12 @@ def update_project(project_id):
         project.is_archived = data['is_archived']
     
     try:
+        db.session.flush()
+        publish_change(project.id, 'project', 'updated', project.id, project.to_dict())
         db.session.commit()
+        record_activity(current_user, 'project.updated', project_id, project_id, {
+            'fields': [field for field in ('name', 'description', 'color', 'is_archived') if field in data]
+        })
         return jsonify({
             'message': 'Project updated successfully',
             'project': project.to_dict()
@@ -130,8 +395,11 @@ def delete_project(project_id):
         return jsonify({'error': 'Access denied'}), 403
     
     try:
+        name = project.name
+        publish_change(project.id, 'project', 'deleted', project.id)
         db.session.delete(project)
         db.session.commit()
+        record_activity(current_user, 'project.deleted', project_id, project_id, {'name': name})
         return jsonify({'message': 'Project deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -167,7 +435,9 @@ def add_member(project_id):
     project.members.append(user)
     
     try:
+        publish_change(project.id, 'member', 'created', user.id, user.to_dict(include_email=False))
         db.session.commit()
+        record_activity(current_user, 'member.added', project_id, user_id)
         return jsonify({
             'message': 'Member added successfully',
             'project': project.to_dict(include_members=True)
@@ -201,7 +471,9 @@ def remove_member(project_id, user_id):
     project.members.remove(user)
     
     try:
+        publish_change(project.id, 'member', 'deleted', user.id)
         db.session.commit()
+        record_activity(current_user, 'member.removed', project_id, user_id)
         return jsonify({'message': 'Member removed successfully'}), 200
     except Exception as e:
         db.session.rollback()
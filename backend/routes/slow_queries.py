@@ -0,0 +1,23 @@
+"""Slow-query report route (admin only)"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from middleware.rbac import require_admin
+from middleware.tenant_middleware import get_current_tenant
+from utils.slow_queries import slow_query_log
+
+slow_queries_bp = Blueprint('slow_queries', __name__, url_prefix='/api/slow-queries')
+
+
+@slow_queries_bp.route('', methods=['GET'])
+@jwt_required()
+@require_admin
+def list_slow_queries():
+    """Get this workspace's slow statements grouped by fingerprint, with captured plans"""
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    entries = slow_query_log.report(get_current_tenant().schema_name)
+    
+    return jsonify({
+        'threshold_ms': slow_query_log.threshold_ms,
+        'slow_queries': entries[:limit],
+        'total': len(entries)
+    }), 200
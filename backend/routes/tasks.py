@@ -1,21 +1,48 @@
 """Task management routes"""
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from models import db
 from models.task import Task, Comment
 from models.list import List
+from models.project import Project
+from models.user import User
+from sqlalchemy.orm import joinedload, load_only
+from middleware.query_guard import max_queries
 from middleware.rbac import get_current_user, check_permission
+from utils.activity import record_activity
+from utils.events import publish_change
+from utils.fieldsets import request_fieldsets
 
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/api/tasks')
 
 
+def load_task_for_view(task_id, columns=None):
+    """
+    Load a task with the list, project and members the permission check
+    walks through, in one query
+    
+    Args:
+        task_id: Task to load
+        columns: Task column names to load (default: all)
+    """
+    options = [joinedload(Task.list).joinedload(List.project).joinedload(Project.members)]
+    if columns:
+        options.append(load_only(*(getattr(Task, name) for name in set(columns) | {'id', 'list_id'})))
+    return Task.query.options(*options).get(task_id)
+
+
 @tasks_bp.route('/<int:task_id>', methods=['GET'])
 @jwt_required()
+@max_queries(5)
 def get_task(task_id):
-    """Get task details with comments"""
+    """Get task details with the newest page of comments"""
     current_user = get_current_user()
-    task = Task.query.get(task_id)
+    fieldsets = request_fieldsets('tasks')
+    fields = fieldsets.get('tasks')
+    
+    # Load only the requested columns
+    task = load_task_for_view(task_id, [column.name for column in Task.columns_for(fields)])
     
     if not task:
         return jsonify({'error': 'Task not found'}), 404
@@ -23,7 +50,43 @@ def get_task(task_id):
     if not check_permission(current_user, task, 'view'):
         return jsonify({'error': 'Access denied'}), 403
     
-    return jsonify(task.to_dict(include_comments=True)), 200
+    assignee = None
+    if (not fields or 'assignee' in fields) and task.assignee_id:
+        assignee = task.assignee.to_dict(include_email=False)
+    data = Task.row_to_dict(task, assignee, fields)
+    
+    if fieldsets.includes('tasks', 'comments'):
+        comments, next_before = comment_page(task_id, None, current_app.config['ITEMS_PER_PAGE'])
+        data['comments'] = [fieldsets.filter('comments', comment) for comment in comments]
+        data['comments_next_before'] = next_before
+    
+    return jsonify(data), 200
+
+
+def comment_page(task_id, before, limit):
+    """
+    Load a page of a task's comments, newest first, with their authors
+    
+    Keyset pagination: pass the previous page's next_before as `before`.
+    
+    Returns:
+        tuple: (serialized comments, next_before or None on the last page)
+    """
+    query = Comment.query.filter_by(task_id=task_id)
+    if before is not None:
+        query = query.filter(Comment.id < before)
+    comments = query.order_by(Comment.id.desc()).limit(limit + 1).all()
+    
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+    
+    # Load all authors in one query
+    author_ids = {comment.user_id for comment in comments}
+    authors = {user.id: user.to_dict(include_email=False)
+               for user in User.query.filter(User.id.in_(author_ids))} if author_ids else {}
+    
+    items = [comment.to_dict(authors.get(comment.user_id)) for comment in comments]
+    return items, comments[-1].id if has_more else None
 
 
 @tasks_bp.route('/<int:task_id>', methods=['PUT'])
@@ -61,7 +124,14 @@ def update_task(task_id):
             task.completed_at = None
     
     try:
+        db.session.flush()
+        project_id = task.list.project_id
+        publish_change(project_id, 'task', 'updated', task.id, task.to_dict())
         db.session.commit()
+        record_activity(current_user, 'task.updated', project_id, task_id, {
+            'fields': [field for field in ('title', 'description', 'assignee_id', 'priority',
+                                           'labels', 'due_date', 'completed') if field in data]
+        })
         return jsonify({
             'message': 'Task updated successfully',
             'task': task.to_dict()
@@ -85,8 +155,11 @@ def delete_task(task_id):
         return jsonify({'error': 'Access denied'}), 403
     
     try:
+        project_id, title = task.list.project_id, task.title
+        publish_change(project_id, 'task', 'deleted', task.id)
         db.session.delete(task)
         db.session.commit()
+        record_activity(current_user, 'task.deleted', project_id, task_id, {'title': title})
         return jsonify({'message': 'Task deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -117,11 +190,23 @@ def move_task(task_id):
     if not new_list:
         return jsonify({'error': 'List not found'}), 404
     
+    old_project_id, old_list_id = task.list.project_id, task.list_id
     task.list_id = new_list_id
     task.position = new_position
     
     try:
+        db.session.flush()
+        if old_project_id != new_list.project_id:
+            publish_change(old_project_id, 'task', 'deleted', task.id)
+            publish_change(new_list.project_id, 'task', 'created', task.id, task.to_dict())
+        else:
+            publish_change(new_list.project_id, 'task', 'updated', task.id, task.to_dict())
         db.session.commit()
+        record_activity(current_user, 'task.moved', new_list.project_id, task_id, {
+            'from_list_id': old_list_id,
+            'to_list_id': new_list_id,
+            'position': new_position
+        })
         return jsonify({
             'message': 'Task moved successfully',
             'task': task.to_dict()
@@ -168,7 +253,10 @@ def create_task(list_id):
     
     try:
         db.session.add(task)
+        db.session.flush()
+        publish_change(lst.project_id, 'task', 'created', task.id, task.to_dict())
         db.session.commit()
+        record_activity(current_user, 'task.created', lst.project_id, task.id, {'title': data['title']})
         
         return jsonify({
             'message': 'Task created successfully',
@@ -201,6 +289,33 @@ def get_list_tasks(list_id):
 
 
 # Comment routes
+@tasks_bp.route('/<int:task_id>/comments', methods=['GET'])
+@jwt_required()
+@max_queries(4)
+def get_comments(task_id):
+    """Get a task's comments, newest first"""
+    current_user = get_current_user()
+    task = load_task_for_view(task_id, ['comment_count'])
+    
+    if not task:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    if not check_permission(current_user, task, 'view'):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    per_page = min(request.args.get('limit', current_app.config['ITEMS_PER_PAGE'], type=int), 100)
+    before = request.args.get('before', type=int)
+    
+    # Keyset pagination: ?before=<id of the last comment on the previous page>
+    comments, next_before = comment_page(task_id, before, max(per_page, 1))
+    
+    return jsonify({
+        'comments': comments,
+        'total': task.comment_count,
+        'next_before': next_before
+    }), 200
+
+
 @tasks_bp.route('/<int:task_id>/comments', methods=['POST'])
 @jwt_required()
 def add_comment(task_id):
@@ -227,7 +342,11 @@ def add_comment(task_id):
     
     try:
         db.session.add(comment)
+        db.session.flush()
+        project_id = task.list.project_id
+        publish_change(project_id, 'comment', 'created', comment.id, comment.to_dict())
         db.session.commit()
+        record_activity(current_user, 'comment.added', project_id, comment.id, {'task_id': task_id})
         
         return jsonify({
             'message': 'Comment added successfully',
@@ -236,3 +355,30 @@ def add_comment(task_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to add comment: {str(e)}'}), 500
+
+
+@tasks_bp.route('/<int:task_id>/comments/<int:comment_id>', methods=['DELETE'])
+@jwt_required()
+def delete_comment(task_id, comment_id):
+    """Delete a comment (its author, or anyone who may edit the task)"""
+    current_user = get_current_user()
+    task = load_task_for_view(task_id)
+    comment = Comment.query.filter_by(id=comment_id, task_id=task_id).first() if task else None
+    
+    if not comment:
+        return jsonify({'error': 'Comment not found'}), 404
+    
+    if not check_permission(current_user, task, 'view') or (
+            comment.user_id != current_user.id and not check_permission(current_user, task, 'edit')):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        project_id = task.list.project_id
+        publish_change(project_id, 'comment', 'deleted', comment_id)
+        db.session.delete(comment)
+        db.session.commit()
+        record_activity(current_user, 'comment.deleted', project_id, comment_id, {'task_id': task_id})
+        return jsonify({'message': 'Comment deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to delete comment: {str(e)}'}), 500
@@ -3,8 +3,11 @@ from flask import Blueprint, request, jsonify
 from models import db
 from models.tenant import Tenant
 from models.user import User
-from utils.database import create_tenant_schema, delete_tenant_schema, get_tenant_stats
-from sqlalchemy import text
+from middleware.query_budget import query_budget
+from middleware.tenant_middleware import invalidate_tenant_cache
+from utils.circuit_breaker import tenant_breakers
+from utils.database import create_tenant_schema, delete_tenant_schema, get_tenant_stats, use_schema
+from utils.shards import choose_shard, forget_shard, remember_shard
 
 tenants_bp = Blueprint('tenants', __name__, url_prefix='/api/tenants')
 
@@ -29,24 +32,32 @@ def create_tenant():
     schema_name = Tenant.generate_schema_name(data['subdomain'])
     
     try:
+        # Place the tenant on the least loaded shard
+        shard = choose_shard()
+        
         # Create tenant in master database
         tenant = Tenant(
             name=data['name'],
             subdomain=data['subdomain'],
             schema_name=schema_name,
             contact_email=data.get('admin_email'),
-            max_users=data.get('max_users', 10)
+            max_users=data.get('max_users', 10),
+            rate_limit_per_second=data.get('rate_limit_per_second'),
+            rate_limit_burst=data.get('rate_limit_burst'),
+            max_concurrent_requests=data.get('max_concurrent_requests'),
+            statement_timeout_ms=data.get('statement_timeout_ms'),
+            shard=shard
         )
         
         db.session.add(tenant)
         db.session.commit()
+        remember_shard(schema_name, shard)
         
         # Create tenant schema
         create_tenant_schema(schema_name)
         
-        # Set search_path to new tenant schema
-        db.session.execute(text(f"SET search_path TO {schema_name}, public"))
-        db.session.commit()
+        # Point the session at the new tenant schema
+        use_schema(schema_name)
         
         # Create admin user in tenant schema
         admin_user = User(
@@ -60,9 +71,7 @@ def create_tenant():
         db.session.add(admin_user)
         db.session.commit()
         
-        # Reset search_path
-        db.session.execute(text("SET search_path TO public"))
-        db.session.commit()
+        use_schema(None)
         
         return jsonify({
             'message': 'Tenant created successfully',
@@ -71,6 +80,7 @@ def create_tenant():
         
     except Exception as e:
         db.session.rollback()
+        use_schema(None)
         # Try to cleanup if tenant was created
         try:
             if tenant.id:
@@ -102,11 +112,18 @@ def get_tenant(tenant_id):
     if not tenant:
         return jsonify({'error': 'Tenant not found'}), 404
     
+    # Stats queries run against the tenant's schema under its query budget
+    unavailable = query_budget.use_tenant(tenant)
+    if unavailable:
+        return unavailable
+    
     # Get tenant statistics
     stats = get_tenant_stats(tenant.schema_name)
     
     tenant_data = tenant.to_dict()
     tenant_data['stats'] = stats
+    breaker = tenant_breakers.peek(tenant.subdomain)
+    tenant_data['circuit_breaker'] = breaker.to_dict() if breaker else None
     
     return jsonify(tenant_data), 200
 
@@ -130,9 +147,14 @@ def update_tenant(tenant_id):
         tenant.contact_email = data['contact_email']
     if 'max_users' in data:
         tenant.max_users = data['max_users']
+    for field in ('rate_limit_per_second', 'rate_limit_burst', 'max_concurrent_requests',
+                  'statement_timeout_ms'):
+        if field in data:
+            setattr(tenant, field, data[field])
     
     try:
         db.session.commit()
+        invalidate_tenant_cache(tenant.subdomain)
         return jsonify({
             'message': 'Tenant updated successfully',
             'tenant': tenant.to_dict()
@@ -151,6 +173,7 @@ def delete_tenant(tenant_id):
         return jsonify({'error': 'Tenant not found'}), 404
     
     schema_name = tenant.schema_name
+    subdomain = tenant.subdomain
     
     try:
         # Delete tenant schema and all data
@@ -159,6 +182,8 @@ def delete_tenant(tenant_id):
         # Delete tenant record
         db.session.delete(tenant)
         db.session.commit()
+        invalidate_tenant_cache(subdomain)
+        forget_shard(schema_name)
         
         return jsonify({'message': 'Tenant deleted successfully'}), 200
     except Exception as e:
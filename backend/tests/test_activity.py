@@ -0,0 +1,116 @@
+"""Tests for batched activity recording"""
+import contextlib
+from datetime import datetime
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from utils.activity import ActivityRecorder, month_bounds, partition_name, shift_months
+
+
+def test_month_partition_bounds():
+    """Partitions cover whole calendar months, including year rollover"""
+    assert month_bounds(datetime(2026, 12, 31, 23, 59)) == (datetime(2026, 12, 1), datetime(2027, 1, 1))
+    assert shift_months(datetime(2026, 2, 15), -14) == datetime(2024, 12, 1)
+    assert partition_name(datetime(2026, 3, 9)) == 'activity_log_2026_03'
+
+
+def test_failed_flush_keeps_events_in_order():
+    """A failed write puts the batch back ahead of newer events"""
+    recorder = ActivityRecorder()
+    recorder._buffer['tenant_acme'].extend([{'action': 'a'}, {'action': 'b'}])
+    recorder._size = 2
+
+    batch = recorder._drain()
+    recorder._buffer['tenant_acme'].append({'action': 'c'})
+    recorder._size = 1
+    recorder._restore(batch)
+
+    assert [row['action'] for row in recorder._buffer['tenant_acme']] == ['a', 'b', 'c']
+    assert recorder._size == 3
+
+
+class FakeConnection:
+    """Connection whose statements fail for one schema"""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.inserted = []
+
+    def begin_nested(self):
+        return contextlib.nullcontext()
+
+    def execution_options(self, schema_translate_map):
+        self.schema = schema_translate_map[None]
+        return self
+
+    def execute(self, statement, rows=None):
+        if self.broken and self.broken in str(statement):
+            raise OperationalError(str(statement), {}, Exception('schema is broken'))
+        if rows is not None:
+            self.inserted += [(self.schema, row['action']) for row in rows]
+
+
+class FakeEngine:
+    """Engine handing out one FakeConnection; commit fails if asked to"""
+
+    def __init__(self, broken=None, commit_fails=False):
+        self.conn = FakeConnection(broken)
+        self.commit_fails = commit_fails
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self.conn
+        if self.commit_fails:
+            raise OperationalError('COMMIT', {}, Exception('connection lost'))
+
+
+def events(*actions):
+    return [{'created_at': datetime(2026, 3, 9), 'action': action} for action in actions]
+
+
+def make_recorder(monkeypatch, shards):
+    """Recorder writing each schema to the fake engine mapped to it"""
+    def group_by_engine(schemas):
+        groups = {}
+        for schema in schemas:
+            groups.setdefault(shards[schema], []).append(schema)
+        return groups
+
+    monkeypatch.setattr('utils.activity.group_by_engine', group_by_engine)
+    recorder = ActivityRecorder()
+    recorder.app = Flask(__name__)
+    return recorder
+
+
+def buffer_events(recorder, schema, *actions):
+    recorder._buffer[schema].extend(events(*actions))
+    recorder._size += len(actions)
+
+
+def test_failing_schema_is_retried_then_dropped(monkeypatch):
+    """Other schemas are written; the broken one is re-queued up to max_attempts"""
+    engine = FakeEngine(broken='tenant_broken')
+    recorder = make_recorder(monkeypatch, {'tenant_ok': engine, 'tenant_broken': engine})
+    recorder.max_attempts = 2
+    buffer_events(recorder, 'tenant_ok', 'a', 'b')
+    buffer_events(recorder, 'tenant_broken', 'c')
+
+    assert recorder.flush() == 2
+    assert engine.conn.inserted == [('tenant_ok', 'a'), ('tenant_ok', 'b')]
+    assert recorder._partitions == {('tenant_ok', datetime(2026, 3, 1))}
+    assert [row['action'] for row in recorder._buffer['tenant_broken']] == ['c']
+
+    assert recorder.flush() == 0
+    assert recorder._size == 0 and not recorder._attempts
+
+
+def test_failed_shard_does_not_requeue_committed_shards(monkeypatch):
+    """Only schemas of a shard whose commit failed are restored, once"""
+    good, lost = FakeEngine(), FakeEngine(commit_fails=True)
+    recorder = make_recorder(monkeypatch, {'tenant_a': good, 'tenant_b': lost})
+    buffer_events(recorder, 'tenant_a', 'a')
+    buffer_events(recorder, 'tenant_b', 'b')
+
+    assert recorder.flush() == 1
+    assert dict(recorder._buffer) == {'tenant_b': events('b')} and recorder._size == 1
+    # A partition created in a transaction that failed to commit is created again
+    assert recorder._partitions == {('tenant_a', datetime(2026, 3, 1))}
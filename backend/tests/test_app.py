@@ -1,6 +1,7 @@
 """Basic tests for the application"""
 import pytest
 from app import create_app
+from middleware.query_guard import query_guard
 from models import db
 
 
@@ -14,6 +15,8 @@ def app():
         yield app
         db.session.remove()
         db.drop_all()
+    # Requests over their @max_queries budget or with an N+1 fail the test
+    query_guard.assert_clean()
 
 
 @pytest.fixture
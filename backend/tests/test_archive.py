@@ -0,0 +1,119 @@
+"""Tests for the task archive"""
+import json
+import re
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from models.archive import ArchivedComment, ArchivedTask
+from models.change import ChangeLog
+from models.list import List
+from models.project import Project
+from models.task import Comment, Task
+from models.user import User
+from utils.archive import archive_completed_tasks
+
+TENANT_TABLES = ('users', 'projects', 'project_members', 'lists', 'tasks', 'comments',
+                 'archived_tasks', 'archived_comments')
+
+
+def test_archive_tables_hold_every_live_column():
+    """archive_completed_tasks() copies tasks and comments column for column"""
+    for live, archive in ((Task, ArchivedTask), (Comment, ArchivedComment)):
+        missing = set(live.__table__.c.keys()) - set(archive.__table__.c.keys())
+        assert not missing, f'{archive.__tablename__} lacks {missing}'
+    assert not ArchivedTask.__table__.foreign_keys and not ArchivedComment.__table__.foreign_keys
+
+
+def test_archived_task_serializes_like_a_task():
+    """Archived tasks carry the task fields plus where and when they were archived"""
+    now = datetime(2026, 1, 2, 3, 4, 5)
+    task = ArchivedTask(id=7, title='Done', list_id=3, project_id=1, position=0, labels=None,
+                        completed=True, completed_at=now, comment_count=2, created_at=now,
+                        updated_at=now, archived_at=now)
+    data = task.to_dict({'id': 5})
+    assert list(data)[:-2] == list(Task.row_to_dict(task))
+    assert data['assignee'] == {'id': 5} and data['labels'] == [] and data['comment_count'] == 2
+    assert data['project_id'] == 1 and data['archived_at'] == now.isoformat()
+
+
+@pytest.fixture
+def app():
+    """An app with the tenant tables in an in-memory sqlite database"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', BOARD_EVENTS_CHANNEL='board_events')
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in TENANT_TABLES])
+        with db.engine.begin() as conn:
+            # INTEGER PRIMARY KEY, because sqlite only autoincrements that
+            conn.execute(text('CREATE TABLE change_log (id INTEGER PRIMARY KEY, project_id INTEGER NOT NULL, '
+                              'entity VARCHAR(20) NOT NULL, entity_id INTEGER NOT NULL, '
+                              'op VARCHAR(10) NOT NULL, created_at DATETIME NOT NULL)'))
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def notifications(monkeypatch):
+    """
+    Run archive_completed_tasks()' PostgreSQL statements on sqlite
+
+    ANY(:ids) becomes a json_each() lookup, row locks are dropped, and the
+    writable CTE is split into its INSERT ... RETURNING plus the NOTIFYs it
+    would send, which are collected in the returned list.
+    """
+    sent = []
+    execute = db.session.execute
+
+    def adapted(statement, params=None):
+        sql = statement.text.replace('FOR UPDATE SKIP LOCKED', '')
+        sql = sql.replace('= ANY(:ids)', 'IN (SELECT value FROM json_each(:ids))')
+        if params and 'ids' in params:
+            params = dict(params, ids=json.dumps(params['ids']))
+        cte = re.search(r'WITH change AS \((.*)\)\s*SELECT', sql, re.DOTALL)
+        if cte is None:
+            return execute(text(sql), params)
+        result = execute(text(cte.group(1)), params)
+        for row in result.mappings().all():
+            sent.append((params['channel'], {'s': params['schema'], 'p': row['project_id'], 'e': 'task',
+                                             'o': 'deleted', 'id': row['entity_id'], 'c': row['id']}))
+        return result
+
+    monkeypatch.setattr(db.session, 'execute', adapted)
+    return sent
+
+
+def test_archive_completed_tasks(app, notifications):
+    """Old completed tasks move to the archive and are logged as deleted"""
+    long_ago = datetime.utcnow() - timedelta(days=60)
+    owner = User(email='ada@example.com', first_name='Ada', last_name='L', password_hash='-')
+    todo = List(name='Todo', project=Project(name='Board', owner=owner))
+    old = [Task(title=f'Old {i}', list=todo, completed=True, completed_at=long_ago) for i in range(3)]
+    recent = Task(title='Recent', list=todo, completed=True, completed_at=datetime.utcnow())
+    open_task = Task(title='Open', list=todo)
+    db.session.add_all(old + [recent, open_task])
+    db.session.flush()
+    db.session.add_all([Comment(content='Done', task=old[0], user=owner),
+                        Comment(content='Kept', task=recent, user=owner)])
+    db.session.commit()
+    project_id, old_ids = todo.project_id, [task.id for task in old]
+
+    assert archive_completed_tasks('tenant_acme', days=30, batch_size=2) == (3, 1)
+
+    assert {task.title for task in Task.query} == {'Recent', 'Open'}
+    assert [comment.content for comment in Comment.query] == ['Kept']
+    archived = ArchivedTask.query.order_by(ArchivedTask.id).all()
+    assert [task.id for task in archived] == old_ids
+    assert all(task.project_id == project_id and task.archived_at for task in archived)
+    assert [comment.task_id for comment in ArchivedComment.query] == [old_ids[0]]
+
+    tombstones = ChangeLog.query.order_by(ChangeLog.id).all()
+    assert [(change.entity, change.entity_id, change.op) for change in tombstones] == [
+        ('task', task_id, 'deleted') for task_id in old_ids
+    ]
+    assert [payload['id'] for _, payload in notifications] == old_ids
+    assert {(channel, payload['s'], payload['c']) for channel, payload in notifications} == {
+        ('board_events', 'tenant_acme', change.id) for change in tombstones
+    }
@@ -0,0 +1,120 @@
+"""Tests for the batch API's operation dispatch"""
+from types import SimpleNamespace
+import pytest
+from flask import Blueprint, Flask, abort, g, jsonify, request
+from flask_jwt_extended import JWTManager, create_access_token
+from models import db
+from models.project import Project
+from models.user import User
+from routes.batch import resolve_references, run_operation
+from routes.projects import projects_bp
+from utils.activity import (activity, discard_deferred_activity, publish_deferred_activity,
+                            record_activity)
+from utils.events import board_events
+
+
+def test_resolve_references():
+    """Whole-string references keep their type; embedded ones are formatted"""
+    results = [{'status': 201, 'body': {'list': {'id': 7}}}]
+    assert resolve_references('$0.list.id', results) == 7
+    assert resolve_references('/tasks/lists/$0.list.id/tasks', results) == '/tasks/lists/7/tasks'
+    assert resolve_references({'ids': ['$0.list.id'], 'price': '$5'}, results) == {
+        'ids': [7], 'price': '$5'
+    }
+    with pytest.raises(LookupError):
+        resolve_references('$1.id', results)
+    with pytest.raises(LookupError):
+        resolve_references('$0.list.name', results)
+
+
+def make_app():
+    app = Flask(__name__)
+    tasks = Blueprint('tasks', __name__, url_prefix='/api/tasks')
+
+    @tasks.route('/<int:task_id>', methods=['PUT'])
+    def update_task(task_id):
+        return jsonify({'id': task_id, 'title': request.get_json()['title']}), 200
+
+    @tasks.route('/missing', methods=['GET'])
+    def missing():
+        abort(404)
+
+    auth = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+    @auth.route('/login', methods=['POST'])
+    def login():
+        return jsonify({}), 200
+
+    app.register_blueprint(tasks)
+    app.register_blueprint(auth)
+    return app
+
+
+def test_run_operation():
+    """Operations dispatch to tenant API views only"""
+    app = make_app()
+    with app.test_request_context('/api/batch', method='POST'):
+        assert run_operation({'method': 'PUT', 'path': '/tasks/3', 'body': {'title': 'x'}}, []) == \
+            (200, {'id': 3, 'title': 'x'})
+        assert run_operation({'method': 'GET', 'path': '/tasks/missing'}, [])[0] == 404
+        assert run_operation({'method': 'DELETE', 'path': '/tasks/3'}, [])[0] == 405
+        assert run_operation({'method': 'POST', 'path': '/auth/login'}, [])[0] == 400
+        assert run_operation({'method': 'GET', 'path': '/tasks/$0.id'}, [])[0] == 400
+
+
+def test_atomic_batch_activity_waits_for_commit(monkeypatch):
+    """Activity recorded in an atomic batch is queued on commit, dropped on rollback"""
+    recorded = []
+    monkeypatch.setattr(activity, 'record', lambda *event: recorded.append(event))
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    with app.test_request_context('/api/batch', method='POST'):
+        db.session.info['defer_commit'] = True
+        record_activity(None, 'task.created', 1, 7)
+        record_activity(None, 'task.moved', 1, 7)
+        db.session.info.pop('defer_commit')
+        assert recorded == []
+        publish_deferred_activity()
+        assert [event[1] for event in recorded] == ['task.created', 'task.moved']
+
+        db.session.info['defer_commit'] = True
+        record_activity(None, 'task.deleted', 1, 7)
+        db.session.info.pop('defer_commit')
+        discard_deferred_activity()
+        publish_deferred_activity()
+        assert len(recorded) == 2
+
+
+@pytest.mark.parametrize('denylisted', [True, False])
+def test_event_streams_cannot_run_in_a_batch(monkeypatch, denylisted):
+    """Batching /events is rejected and leaves no board subscription behind"""
+    monkeypatch.setattr(board_events, '_ensure_running', lambda: None)
+    if not denylisted:
+        # The generic non-JSON check catches streams the denylist misses
+        monkeypatch.setattr('routes.batch.STREAMING_ENDPOINTS', set())
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', JWT_SECRET_KEY='x' * 32,
+                      BOARD_EVENTS_HEARTBEAT_SECONDS=15, BOARD_EVENTS_STREAM_SECONDS=300,
+                      BOARD_EVENTS_MAX_STREAMS=4, BOARD_EVENTS_BUSY_RETRY_SECONDS=30)
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(projects_bp)
+
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in
+                                                  ('users', 'projects', 'project_members')])
+        project = Project(name='Board', owner=User(email='ada@example.com', first_name='Ada',
+                                                   last_name='L', password_hash='-'))
+        db.session.add(project)
+        db.session.commit()
+        token = create_access_token(identity=str(project.owner_id))
+
+        with app.test_request_context('/api/batch', method='POST',
+                                      headers={'Authorization': f'Bearer {token}'}):
+            g.tenant = SimpleNamespace(schema_name='tenant_acme', subdomain='acme')
+            status, _ = run_operation({'method': 'GET', 'path': f'/projects/{project.id}/events'}, [])
+        assert status == 400
+        assert board_events.subscriber_count() == 0
+        db.session.remove()
@@ -0,0 +1,96 @@
+"""Tests for streamed board encoding and response compression"""
+import gzip
+import json
+from flask import Flask, Response, jsonify
+from middleware.compression import Compression
+from models import db
+from models.list import List
+from models.project import Project
+from models.task import Task
+from models.user import User
+from utils.board_stream import buffered, iter_board_json, iter_lists_json, load_lists
+
+
+def test_streamed_board_is_valid_json():
+    """Head fields and encoded lists join into one JSON document"""
+    lists = ['{"id":1,"tasks":[]}', '{"id":2,"tasks":[{"id":7}]}']
+    document = ''.join(buffered(iter_board_json({'id': 3, 'cursor': 9}, iter(lists)), size=8))
+    assert json.loads(document) == {
+        'id': 3, 'cursor': 9,
+        'lists': [{'id': 1, 'tasks': []}, {'id': 2, 'tasks': [{'id': 7}]}]
+    }
+    assert json.loads(''.join(iter_board_json({}, iter([])))) == {'lists': []}
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.update(COMPRESSION_ENABLED=True, COMPRESSION_MIN_SIZE=100,
+                      COMPRESSION_GZIP_LEVEL=6, COMPRESSION_BROTLI_QUALITY=5)
+    Compression(app)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/large')
+    def large():
+        return jsonify({'items': list(range(200))})
+
+    @app.route('/stream')
+    def stream():
+        return Response(iter(['{"items":[', '1,' * 100 + '1', ']}']), mimetype='application/json')
+
+    return app
+
+
+def test_compression_negotiation():
+    """Large and streamed JSON is gzipped for gzip clients only"""
+    client = make_app().test_client()
+    gzip_only = {'Accept-Encoding': 'gzip'}
+
+    response = client.get('/small', headers=gzip_only)
+    assert 'Content-Encoding' not in response.headers
+
+    response = client.get('/large', headers=gzip_only)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data))['items'][-1] == 199
+
+    response = client.get('/stream', headers=gzip_only)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.data))['items']) == 101
+
+    response = client.get('/large', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_lists_and_tasks_read_by_separate_statements_stay_in_step():
+    """Lists reordered or added after load_lists() do not drop later lists' tasks"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', BOARD_STREAM_BATCH_SIZE=2)
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in
+                                                  ('users', 'projects', 'project_members', 'lists', 'tasks')])
+        project = Project(name='Board', owner=User(email='a@example.com', first_name='A', last_name='B',
+                                                   password_hash='-'))
+        lists = [List(name=f'List {i}', position=i, project=project) for i in range(3)]
+        db.session.add_all([Task(title=f'{lst.name} task {t}', position=t, list=lst)
+                            for lst in lists for t in range(2)])
+        db.session.commit()
+        loaded = load_lists(project.id)
+
+        # Another request reorders the lists and moves a task to a new list
+        lists[0].position, lists[2].position = 2, 0
+        newer = List(name='New', position=-1, project=project)
+        db.session.add(newer)
+        db.session.flush()
+        Task.query.filter_by(title='List 1 task 0').one().list_id = newer.id
+        db.session.commit()
+
+        board = [json.loads(encoded) for encoded in iter_lists_json(project.id, loaded)]
+        assert [lst['name'] for lst in board] == ['List 0', 'List 1', 'List 2']
+        assert [[task['title'] for task in lst['tasks']] for lst in board] == [
+            ['List 0 task 0', 'List 0 task 1'], ['List 1 task 1'], ['List 2 task 0', 'List 2 task 1']
+        ]
+        db.session.remove()
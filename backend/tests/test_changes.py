@@ -0,0 +1,124 @@
+"""Tests for delta sync over the change log"""
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from models import db
+from models.change import ChangeLog
+from models.list import List
+from models.project import Project
+from models.task import Task
+from models.user import User
+from routes.projects import projects_bp
+from utils.changes import collect_changes, cursor_expired
+
+TENANT_TABLES = ('users', 'projects', 'project_members', 'lists', 'tasks', 'comments', 'change_log')
+
+
+@pytest.fixture
+def app():
+    """An app serving the projects API from an in-memory sqlite database"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', JWT_SECRET_KEY='x' * 32,
+                      CHANGES_PAGE_SIZE=500, CHANGES_OVERLAP_SECONDS=60)
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(projects_bp)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in TENANT_TABLES])
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def board(app):
+    """A project with one list of three tasks"""
+    owner = User(email='ada@example.com', first_name='Ada', last_name='L', password_hash='-')
+    todo = List(name='Todo', project=Project(name='Board', owner=owner))
+    db.session.add_all([Task(title=f'Task {i}', list=todo, position=i) for i in range(3)])
+    db.session.commit()
+    return todo.project
+
+
+def log(change_id, project, entity, entity_id, op, at=None):
+    db.session.add(ChangeLog(id=change_id, project_id=project.id, entity=entity,
+                             entity_id=entity_id, op=op, created_at=at or datetime.utcnow()))
+    db.session.commit()
+
+
+def task_ids(project):
+    return [task.id for task in Task.query.join(List).filter(List.project_id == project.id).order_by(Task.id)]
+
+
+def test_changes_collapse_per_entity(board):
+    """Each entity is sent once, in its current state or as a tombstone"""
+    first, second, third = task_ids(board)
+    log(1, board, 'task', first, 'created')
+    log(2, board, 'task', first, 'updated')
+    log(3, board, 'task', second, 'updated')
+    log(4, board, 'task', third, 'updated')
+    log(5, board, 'task', third, 'deleted')
+    log(6, board, 'task', 999, 'created')
+
+    changes = collect_changes(board.id, 0, 10)
+    assert [task['id'] for task in changes['tasks']['created']] == [first]
+    assert [task['id'] for task in changes['tasks']['updated']] == [second]
+    # Logged as created but gone by now
+    assert sorted(changes['tasks']['deleted']) == sorted([third, 999])
+    assert changes['cursor'] == 6 and not changes['has_more']
+
+    page = collect_changes(board.id, 0, 2)
+    assert page['cursor'] == 3 and page['has_more']
+    assert collect_changes(board.id, 6, 10)['cursor'] == 6
+
+
+def test_late_commit_below_cursor_is_sent_again(board):
+    """A change whose lower id commits after the client read past it is not lost"""
+    first, second, _ = task_ids(board)
+    now = datetime.utcnow()
+    log(2, board, 'task', second, 'updated', now)
+    cursor = collect_changes(board.id, 0, 10, overlap_seconds=60)['cursor']
+    assert cursor == 2
+
+    # Id 1 was handed out first but its transaction committed later
+    log(1, board, 'task', first, 'updated', now - timedelta(seconds=1))
+    changes = collect_changes(board.id, cursor, 10, overlap_seconds=60)
+    assert {task['id'] for task in changes['tasks']['updated']} == {first, second}
+    assert changes['cursor'] == cursor
+
+    assert collect_changes(board.id, cursor, 10)['tasks']['updated'] == []
+    log(3, board, 'task', first, 'updated', now + timedelta(minutes=5))
+    assert collect_changes(board.id, 3, 10, overlap_seconds=60)['tasks']['updated'] == [
+        Task.query.get(first).to_dict()
+    ]
+
+
+def test_cursor_expired(board):
+    """Cursors older than the oldest retained change need a full reload"""
+    assert not cursor_expired(0)
+    assert not cursor_expired(5)
+    log(10, board, 'task', 1, 'updated')
+    log(11, board, 'task', 1, 'updated')
+    assert not cursor_expired(9)
+    assert cursor_expired(8)
+    assert not cursor_expired(0)
+
+
+def test_get_changes_route(app, board):
+    """GET /changes validates the cursor and answers expired ones with 410"""
+    first = task_ids(board)[0]
+    log(5, board, 'task', first, 'updated')
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(board.owner_id))}'}
+    url = f'/api/projects/{board.id}/changes'
+
+    assert client.get(url, headers=headers).status_code == 400
+    assert client.get(f'{url}?since=-1', headers=headers).status_code == 400
+    expired = client.get(f'{url}?since=1', headers=headers)
+    assert expired.status_code == 410 and expired.json['resync']
+    assert client.get(f'/api/projects/{board.id + 1}/changes?since=4', headers=headers).status_code == 404
+
+    response = client.get(f'{url}?since=4', headers=headers)
+    assert response.status_code == 200
+    assert [task['id'] for task in response.json['tasks']['updated']] == [first]
+    assert response.json['cursor'] == 5 and not response.json['has_more']
@@ -0,0 +1,70 @@
+"""Tests for tenant circuit breakers and query budgets"""
+from types import SimpleNamespace
+from middleware.query_budget import QueryBudget, is_timeout_error
+from utils.circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_trips_and_recovers():
+    """Repeated failures open the breaker; a successful probe closes it"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, window_seconds=10, open_seconds=5, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    clock.now = 5.0
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe while half-open
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.to_dict()['trips'] == 1
+    assert breaker.to_dict()['recoveries'] == 1
+    assert breaker.to_dict()['rejections'] == 2
+
+
+def test_breaker_forgets_old_failures():
+    """Failures outside the window do not count towards tripping"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, window_seconds=10, open_seconds=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 11.0
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_failed_probe_reopens():
+    """A timeout during the half-open probe reopens the breaker"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, window_seconds=10, open_seconds=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.retry_after() == 5.0
+
+
+def test_tightest_budget_wins():
+    """Tenant and endpoint statement timeouts combine to the smaller one"""
+    budget = QueryBudget()
+    budget.endpoint_timeouts = {'projects.get_project': 10000}
+    tenant = SimpleNamespace(statement_timeout_ms=2000)
+    assert budget.budget_for('projects.get_project', tenant) == 2000
+    assert budget.budget_for('projects.get_project') == 10000
+    assert budget.budget_for('tasks.get_task') == budget.statement_timeout_ms
+
+
+def test_timeout_errors_detected():
+    """Only statement/lock timeout SQLSTATEs count as timeouts"""
+    assert is_timeout_error(SimpleNamespace(orig=SimpleNamespace(pgcode='57014')))
+    assert is_timeout_error(SimpleNamespace(orig=SimpleNamespace(pgcode='55P03')))
+    assert not is_timeout_error(SimpleNamespace(orig=SimpleNamespace(pgcode='23505')))
@@ -0,0 +1,57 @@
+"""Tests for comment pagination and the denormalized comment count"""
+import pytest
+from flask import Flask
+from models import db
+from models.list import List
+from models.project import Project
+from models.task import Comment, Task
+from models.user import User
+from routes.tasks import comment_page
+
+TENANT_TABLES = ('users', 'projects', 'project_members', 'lists', 'tasks', 'comments')
+
+
+@pytest.fixture
+def task():
+    """A task in an in-memory sqlite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in TENANT_TABLES])
+        user = User(email='ada@example.com', first_name='Ada', last_name='L', password_hash='-')
+        task = Task(title='Ship it', list=List(name='Doing', project=Project(name='Board', owner=user)))
+        db.session.add(task)
+        db.session.commit()
+        yield task
+        db.session.remove()
+
+
+def test_comment_count_follows_inserts_and_deletes(task):
+    """comment_count is kept in step with comments, without touching updated_at"""
+    updated_at = task.updated_at
+    db.session.add_all([Comment(content=str(i), task_id=task.id, user_id=task.list.project.owner_id)
+                        for i in range(3)])
+    db.session.commit()
+    assert task.comment_count == 3
+
+    db.session.delete(Comment.query.first())
+    db.session.commit()
+    assert task.comment_count == 2
+    assert task.updated_at == updated_at
+
+
+def test_comment_pages_newest_first(task):
+    """Keyset pages walk back from the newest comment with authors attached"""
+    author_id = task.list.project.owner_id
+    db.session.add_all([Comment(content=str(i), task_id=task.id, user_id=author_id) for i in range(5)])
+    db.session.commit()
+
+    first, next_before = comment_page(task.id, None, 2)
+    assert [comment['content'] for comment in first] == ['4', '3']
+    assert first[0]['user']['first_name'] == 'Ada'
+
+    second, next_before = comment_page(task.id, next_before, 2)
+    last, end = comment_page(task.id, next_before, 2)
+    assert [comment['content'] for comment in second + last] == ['2', '1', '0']
+    assert end is None
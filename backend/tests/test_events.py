@@ -0,0 +1,50 @@
+"""Tests for live board event fan-out"""
+import json
+from utils.events import BoardEventListener, Subscription, format_sse
+
+
+def test_format_sse_frame():
+    """Events are encoded as single-line SSE data frames"""
+    frame = format_sse({'entity': 'task', 'op': 'updated', 'id': 7}, event_id=42)
+    lines = frame.split('\n')
+    assert lines[0] == 'id: 42'
+    assert lines[1] == 'event: change'
+    assert json.loads(lines[2][len('data: '):])['id'] == 7
+    assert frame.endswith('\n\n')
+
+
+def test_subscription_overflow_requests_resync():
+    """A slow subscriber gets a resync event instead of a partial stream"""
+    subscription = Subscription(('tenant_acme', 1), maxsize=1)
+    subscription.put({'id': 1})
+    subscription.put({'id': 2})
+    assert subscription.get(timeout=0)['op'] == 'resync'
+    assert subscription.queue.empty()
+
+
+def test_dispatch_routes_by_tenant_and_project():
+    """Notifications only reach subscribers of the same tenant board"""
+    listener = BoardEventListener()
+    ours = Subscription(('tenant_acme', 1), maxsize=10)
+    other = Subscription(('tenant_other', 1), maxsize=10)
+    listener._subscribers[ours.key].add(ours)
+    listener._subscribers[other.key].add(other)
+
+    listener._dispatch(json.dumps({'s': 'tenant_acme', 'p': 1, 'e': 'list', 'o': 'deleted', 'id': 3, 'c': 9}))
+
+    assert ours.get(timeout=0) == {'cursor': 9, 'entity': 'list', 'op': 'deleted', 'id': 3, 'data': None}
+    assert other.queue.empty()
+
+
+def test_subscriptions_are_capped_per_worker():
+    """Past the cap subscribe() refuses, until a stream ends"""
+    listener = BoardEventListener()
+    listener._ensure_running = lambda: None
+    first = listener.subscribe('tenant_acme', 1, limit=2)
+    assert listener.subscribe('tenant_acme', 2, limit=2) is not None
+    assert listener.subscribe('tenant_acme', 1, limit=2) is None
+    assert listener.subscriber_count() == 2
+
+    listener.unsubscribe(first)
+    assert listener.subscribe('tenant_acme', 1, limit=2) is not None
+    assert listener.subscribe('tenant_acme', 3) is not None
@@ -0,0 +1,48 @@
+"""Tests for ?fields= sparse fieldsets"""
+import pytest
+from types import SimpleNamespace
+from models.task import Task
+from utils.fieldsets import RESOURCE_FIELDS, FieldsetError, parse_fields
+
+
+def test_parse_nested_fields():
+    """Bare names go to the primary type, type(...) to nested types"""
+    fieldsets = parse_fields('id, name, lists(id,tasks(id,title))', 'projects')
+    assert fieldsets.get('projects') == ['id', 'name']
+    assert fieldsets.get('lists') == ['id']
+    assert fieldsets.get('tasks') == ['id', 'title']
+    assert fieldsets.includes('projects', 'lists')
+    assert not fieldsets.includes('projects', 'members')
+    assert fieldsets.filter('projects', {'id': 1, 'name': 'a', 'color': 'red'}) == {'id': 1, 'name': 'a'}
+
+    everything = parse_fields('', 'projects')
+    assert everything.get('projects') is None
+    assert everything.includes('projects', 'members')
+
+    # A nested selection alone keeps all fields of the parent
+    assert parse_fields('tasks(id)', 'lists').get('lists') is None
+
+
+@pytest.mark.parametrize('value', ['id,(name)', 'id)', 'tasks(id', 'id;name'])
+def test_malformed_fields(value):
+    """Malformed values raise FieldsetError"""
+    with pytest.raises(FieldsetError):
+        parse_fields(value, 'tasks')
+
+
+def test_unknown_fields_rejected():
+    """Fields are validated against the known fields of each type"""
+    with pytest.raises(FieldsetError):
+        parse_fields('id,password_hash', 'tasks').validate(RESOURCE_FIELDS)
+    with pytest.raises(FieldsetError):
+        parse_fields('secrets(id)', 'tasks').validate(RESOURCE_FIELDS)
+
+
+def test_task_projection():
+    """Only the requested task fields are serialized and selected"""
+    row = SimpleNamespace(id=5, title='Ship', list_id=2, assignee_id=3)
+    assert Task.row_to_dict(row, {'id': 3}, ['id', 'title', 'assignee']) == {
+        'id': 5, 'title': 'Ship', 'assignee': {'id': 3}
+    }
+    columns = [column.name for column in Task.columns_for(['title', 'assignee'])]
+    assert sorted(columns) == ['assignee_id', 'title']
@@ -0,0 +1,72 @@
+"""Tests for request metrics and their Prometheus exposition"""
+import os
+from app import create_app
+from utils.metrics import (MetricsRegistry, merge_snapshots, read_snapshots, render_prometheus,
+                           retire_snapshot, write_snapshot)
+
+
+def test_tenant_labels_are_bounded():
+    """Only the busiest tenants keep their own label after merging"""
+    worker_a, worker_b = MetricsRegistry(max_tenants=2), MetricsRegistry(max_tenants=2)
+    for tenant, count in (('acme', 5), ('globex', 1)):
+        worker_a.inc('http_requests_total', (('tenant', worker_a.tenant_label(tenant)),), count)
+    for tenant, count in (('initech', 3), ('acme', 1)):
+        worker_b.inc('http_requests_total', (('tenant', worker_b.tenant_label(tenant)),), count)
+    assert worker_a.tenant_label('umbrella') == 'other'
+
+    counters, _ = merge_snapshots([worker_a.snapshot(), worker_b.snapshot()], max_tenants=2)
+    assert counters == {
+        ('http_requests_total', (('tenant', 'acme'),)): 6,
+        ('http_requests_total', (('tenant', 'initech'),)): 3,
+        ('http_requests_total', (('tenant', 'other'),)): 1,
+    }
+
+
+def test_histogram_exposition():
+    """Histograms render cumulative buckets, sum and count"""
+    registry = MetricsRegistry()
+    labels = (('endpoint', 'tasks.get_task'),)
+    for duration in (0.003, 0.2, 20.0):
+        registry.observe('http_request_duration_seconds', labels, duration)
+    text = render_prometheus(*merge_snapshots([registry.snapshot()], 20))
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="tasks.get_task",le="0.005"} 1' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="tasks.get_task",le="0.25"} 2' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="tasks.get_task",le="+Inf"} 3' in text
+    assert 'http_request_duration_seconds_count{endpoint="tasks.get_task"} 3' in text
+
+
+def test_metrics_route_counts_requests():
+    """Requests are counted by endpoint at /metrics"""
+    client = create_app('testing').test_client()
+    client.get('/')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="index",tenant="-",method="GET",status="2xx"} 1' in text
+
+
+def test_exited_worker_counters_are_kept(tmp_path, monkeypatch):
+    """Retiring a worker's snapshot moves its counts to the dead-workers aggregate"""
+    directory = str(tmp_path)
+    labels = (('endpoint', 'index'), ('tenant', '-'))
+    for pid, count in ((101, 2), (102, 3)):
+        registry = MetricsRegistry()
+        registry.inc('http_requests_total', labels, count)
+        registry.observe('http_request_duration_seconds', labels[:1], 0.2)
+        monkeypatch.setattr('os.getpid', lambda pid=pid: pid)
+        write_snapshot(directory, registry.snapshot())
+    before = merge_snapshots(read_snapshots(directory), 20)
+
+    retire_snapshot(directory, 101)
+    retire_snapshot(directory, 102)
+    retire_snapshot(directory, 103)
+    assert sorted(os.listdir(directory)) == ['metrics-dead.json']
+    assert merge_snapshots(read_snapshots(directory), 20) == before
+
+
+def test_metrics_without_token_are_local_only():
+    """Outside development and tests, /metrics needs a token for remote scrapers"""
+    app = create_app('testing')
+    app.testing = False
+    client = app.test_client()
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.8'}).status_code == 403
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 200
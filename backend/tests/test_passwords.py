@@ -0,0 +1,37 @@
+"""Tests for the password hashing service"""
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher():
+    """Inline hasher with a cheap pbkdf2 cost"""
+    hasher = PasswordHasher()
+    hasher.method = 'pbkdf2:sha256:1000'
+    hasher.max_concurrent = 1
+    hasher.wait_seconds = 0.01
+    hasher._semaphore = threading.BoundedSemaphore(1)
+    return hasher
+
+
+def test_hash_and_verify(hasher):
+    """Hashes use the configured method and verify correctly"""
+    pwhash = hasher.hash('s3cret')
+    assert pwhash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(pwhash, 's3cret')
+    assert not hasher.verify(pwhash, 'wrong')
+    assert not hasher.needs_rehash(pwhash)
+
+
+def test_legacy_hash_needs_rehash(hasher):
+    """Hashes made with another method or cost are flagged for upgrade"""
+    assert hasher.needs_rehash(generate_password_hash('s3cret', 'pbkdf2:sha256:2000'))
+
+
+def test_busy_when_concurrency_cap_reached(hasher):
+    """Callers over the concurrency cap fail fast instead of queueing"""
+    hasher._semaphore.acquire()
+    with pytest.raises(PasswordHasherBusy):
+        hasher.verify('pbkdf2:sha256:1000$x$y', 's3cret')
@@ -0,0 +1,57 @@
+"""Tests for the on-demand request profiler"""
+import time
+from types import SimpleNamespace
+from flask import Flask, g, jsonify
+from middleware.profiler import RequestProfiler
+
+
+class Item:
+    def to_dict(self):
+        # Busy long enough to be sampled as serialization
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return {'ok': True}
+
+
+def make_app(directory):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', PROFILER_ENABLED=True, PROFILER_DIR=str(directory),
+                      PROFILER_INTERVAL_MS=1, PROFILER_TOKEN_SECONDS=60, PROFILER_MAX_FILES=10)
+
+    @app.before_request
+    def set_tenant():
+        g.tenant = SimpleNamespace(subdomain='acme')
+
+    profiler = RequestProfiler(app)
+
+    @app.route('/board')
+    def board():
+        return jsonify(Item().to_dict())
+
+    return app, profiler
+
+
+def test_profiles_only_signed_requests(tmp_path):
+    """Requests with a valid token are sampled and stored by id"""
+    app, profiler = make_app(tmp_path)
+    client = app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/board').headers
+    assert 'X-Profile-Id' not in client.get('/board', headers={'X-Profile-Token': 'forged'}).headers
+
+    with app.app_context():
+        token = profiler.issue_token(SimpleNamespace(subdomain='acme'), SimpleNamespace(id=1))
+    response = client.get('/board', headers={'X-Profile-Token': token})
+    profile = profiler.load(response.headers['X-Profile-Id'])
+    assert profile['tenant'] == 'acme' and profile['requested_by'] == 1
+    assert profile['breakdown_ms']['serialization'] > 0
+    assert any(line.startswith('serialization;') and 'to_dict' in line for line in profile['folded'])
+
+
+def test_token_bound_to_tenant(tmp_path):
+    """A token issued for another tenant does not profile"""
+    app, profiler = make_app(tmp_path)
+    token = profiler.issue_token(SimpleNamespace(subdomain='globex'), SimpleNamespace(id=1))
+    response = app.test_client().get(f'/board?_profile={token}')
+    assert 'X-Profile-Id' not in response.headers
@@ -0,0 +1,85 @@
+"""Tests for the N+1 query guard"""
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import ForeignKey, create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship, selectinload
+from middleware.query_guard import (QueryBudgetExceeded, QueryGuard, max_queries, normalize_statement,
+                                    track_queries)
+from models import db
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Author(Base):
+    __tablename__ = 'authors'
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+
+class Note(Base):
+    __tablename__ = 'notes'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey('authors.id'))
+    author: Mapped[Author] = relationship()
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Note(id=i, author=Author(id=i)) for i in range(1, 6)])
+        session.commit()
+        session.expunge_all()
+        yield session
+
+
+def test_normalize_statement():
+    """Statements differing only in parameters normalize to one shape"""
+    assert normalize_statement('SELECT * FROM t\n WHERE id = :id_1 AND x IN (__[POSTCOMPILE_x_1])') == \
+        normalize_statement("SELECT * FROM t WHERE id = 42 AND x IN (__[POSTCOMPILE_x_2])")
+
+
+def test_lazy_loads_flagged_as_repeated(session):
+    """A lazy load per row is reported with the repeated statement"""
+    with pytest.raises(QueryBudgetExceeded, match='same query 5 times'):
+        with track_queries(repeat_threshold=3, route='notes'):
+            [note.author.id for note in session.query(Note)]
+
+
+def test_budget_enforced(session):
+    """Eager loading stays within the budget the lazy version breaks"""
+    with track_queries(limit=2, repeat_threshold=3) as report:
+        [note.author.id for note in session.query(Note).options(selectinload(Note.author))]
+    assert report.count == 2
+
+    session.expunge_all()
+    with pytest.raises(QueryBudgetExceeded, match=r'ran 6 queries \(budget 2\)'):
+        with track_queries(limit=2):
+            [note.author.id for note in session.query(Note)]
+
+
+def test_request_violations_are_recorded_not_raised():
+    """Teardown only records violations, so later teardown handlers still run"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', QUERY_GUARD_SAMPLE_RATE=1.0,
+                      QUERY_GUARD_REPEAT_THRESHOLD=5, QUERY_GUARD_MODE='record')
+    db.init_app(app)
+    torn_down = []
+    # Registered first, so it runs after the guard's teardown
+    app.teardown_request(lambda exception: torn_down.append(exception))
+    guard = QueryGuard(app)
+
+    @app.route('/notes')
+    @max_queries(1)
+    def notes():
+        db.session.execute(select(1))
+        db.session.execute(select(2))
+        return jsonify([])
+
+    assert app.test_client().get('/notes').status_code == 200
+    assert torn_down == [None]
+    with pytest.raises(QueryBudgetExceeded, match=r'notes ran 2 queries \(budget 1\)'):
+        guard.assert_clean()
+    guard.assert_clean()
@@ -0,0 +1,96 @@
+"""Tests for per-tenant rate limiting"""
+import contextlib
+import sqlite3
+from types import SimpleNamespace
+import pytest
+from flask import Flask, g
+from middleware.rate_limit import MemoryLimitStore, SqliteLimitStore, TenantRateLimiter
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    """Each limit store implementation"""
+    if request.param == 'memory':
+        return MemoryLimitStore()
+    return SqliteLimitStore(str(tmp_path / 'limits.sqlite3'))
+
+
+def test_token_bucket_refills(store):
+    """Bursts are capped and tokens refill at the configured rate"""
+    assert store.acquire('acme', 1.0, 2, 100, now=0.0)[0]
+    assert store.acquire('acme', 1.0, 2, 100, now=0.0)[0]
+    allowed, retry_after = store.acquire('acme', 1.0, 2, 100, now=0.0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert store.acquire('acme', 1.0, 2, 100, now=1.0)[0]
+
+
+def test_concurrency_cap_is_per_tenant(store):
+    """In-flight requests are capped per tenant and freed on release"""
+    assert store.acquire('acme', 100.0, 100, 1, now=0.0)[0]
+    assert not store.acquire('acme', 100.0, 100, 1, now=0.0)[0]
+    assert store.acquire('other', 100.0, 100, 1, now=0.0)[0]
+    store.release('acme')
+    assert store.acquire('acme', 100.0, 100, 1, now=0.0)[0]
+
+
+@pytest.fixture
+def locked(tmp_path):
+    """A limit store file plus a function holding its write lock"""
+    path = str(tmp_path / 'limits.sqlite3')
+
+    @contextlib.contextmanager
+    def hold_lock():
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        finally:
+            conn.execute('ROLLBACK')
+            conn.close()
+
+    return path, hold_lock
+
+
+def test_release_is_applied_once_the_lock_frees(locked):
+    """A release that hits a locked file is not lost"""
+    path, hold_lock = locked
+    store = SqliteLimitStore(path, timeout=0.01)
+    assert store.acquire('acme', 100.0, 100, 1, now=0.0)[0]
+
+    with hold_lock():
+        with pytest.raises(sqlite3.OperationalError):
+            store.release('acme')
+
+    assert store.acquire('acme', 100.0, 100, 1, now=0.0)[0]
+
+
+def test_admit_fails_open_when_the_store_is_locked(locked):
+    """A locked store admits the request and takes no slot"""
+    path, hold_lock = locked
+    limiter = TenantRateLimiter()
+    limiter.enabled = True
+    limiter.store = SqliteLimitStore(path, timeout=0.01)
+    tenant = SimpleNamespace(subdomain='acme', rate_limit_per_second=None, rate_limit_burst=None,
+                             max_concurrent_requests=None)
+
+    with Flask(__name__).test_request_context():
+        limiter.store.acquire('warm', 1.0, 1, 1, now=0.0)
+        with hold_lock():
+            assert limiter.admit(tenant) is None
+            assert 'rate_limit_key' not in g
+
+
+@pytest.mark.parametrize('quota', ['rate_limit_per_second', 'rate_limit_burst', 'max_concurrent_requests'])
+def test_zero_quota_is_not_the_default(quota):
+    """An explicit 0 quota rejects requests instead of falling back to the default"""
+    limiter = TenantRateLimiter()
+    limiter.enabled = True
+    limiter.store = MemoryLimitStore()
+    quotas = dict(rate_limit_per_second=None, rate_limit_burst=None, max_concurrent_requests=None)
+    quotas[quota] = 0
+    tenant = SimpleNamespace(subdomain='acme', **quotas)
+
+    with Flask(__name__).test_request_context():
+        body, status, headers = limiter.admit(tenant)
+        assert status == 429 and 'Retry-After' not in headers
+        assert 'rate_limit_key' not in g
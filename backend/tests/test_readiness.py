@@ -0,0 +1,46 @@
+"""Tests for the readiness checks"""
+from sqlalchemy import create_engine
+from utils.readiness import DEGRADED, READY, UNREADY, DatabaseProbe, evaluate
+
+THRESHOLDS = {'db_slow_ms': 100, 'pool_degraded': 0.8, 'pool_unready': 1.0}
+POOL = {'class': 'QueuePool', 'size': 10, 'capacity': 15, 'checked_in': 8, 'checked_out': 2,
+        'overflow': 0, 'warmed': 2}
+DATABASE = {'ok': True, 'latency_ms': 1.5, 'error': None, 'age_seconds': 0.3}
+
+
+def test_ready_when_all_checks_pass():
+    """A fast database, a free pool and warm caches are ready"""
+    assert evaluate(DATABASE, POOL, {'token revocations': True}, THRESHOLDS) == (READY, [])
+
+
+def test_degraded_reasons():
+    """Slow round trips, a nearly full pool and cold caches degrade"""
+    status, reasons = evaluate(dict(DATABASE, latency_ms=250.0), dict(POOL, checked_out=12),
+                               {'tenant cache': False}, THRESHOLDS, open_breakers=2)
+    assert status == DEGRADED
+    assert reasons == ['connection pool 80% checked out', 'database round trip 250.0 ms',
+                       'tenant cache not warm', '2 tenant circuit breakers open']
+
+
+def test_unready_when_database_fails_or_pool_saturated():
+    """A failed probe or a fully checked-out pool is unready"""
+    status, reasons = evaluate(dict(DATABASE, ok=False, error='connection refused'), POOL, {},
+                               THRESHOLDS, replica_healthy=False)
+    assert status == UNREADY
+    assert reasons == ['database unreachable: connection refused', 'read replica unhealthy']
+
+    status, reasons = evaluate(DATABASE, dict(POOL, checked_out=15), {}, THRESHOLDS)
+    assert (status, reasons) == (UNREADY, ['connection pool saturated (15/15 checked out)'])
+
+
+def test_probe_is_cached():
+    """The round trip runs once per ttl and failures are reported"""
+    engine = create_engine('sqlite://')
+    probe = DatabaseProbe(ttl=60)
+    first = probe.check(engine)
+    assert first['ok'] and first['error'] is None
+    probe._probe = lambda engine: {'ok': False, 'latency_ms': 0.0, 'error': 'boom'}
+    assert probe.check(engine)['ok']
+
+    probe.ttl = 0
+    assert probe.check(engine)['error'] == 'boom'
@@ -0,0 +1,68 @@
+"""Tests for read-replica routing"""
+import sqlite3
+from flask import Flask, g
+from sqlalchemy import select, update
+from middleware.replica import ReplicaRouter, SqliteStickyStore, primary_only
+from models import db
+from models.user import User
+
+
+def make_router(lag):
+    router = ReplicaRouter()
+    router.enabled = True
+    router._probe_lag = lambda: lag
+    return router
+
+
+def test_safe_reads_use_fresh_replica():
+    """GETs go to a fresh replica; writes and @primary_only views do not"""
+    router = make_router(lag=0.5)
+    assert router.should_use_replica('GET', None, 'acme:1')
+    assert not router.should_use_replica('POST', None, 'acme:1')
+    assert not router.should_use_replica('GET', primary_only(lambda: None), 'acme:1')
+
+
+def test_lagging_replica_falls_back_to_primary():
+    """Lag over the limit, or an unmeasurable lag, means primary reads"""
+    assert not make_router(lag=10.0).should_use_replica('GET', None, None)
+    assert not make_router(lag=None).should_use_replica('GET', None, None)
+
+
+def test_writers_are_sticky_to_primary(tmp_path):
+    """A user's reads stay on the primary for the window after a write"""
+    router = make_router(lag=0.0)
+    router.store = SqliteStickyStore(str(tmp_path / 'sticky.sqlite3'))
+    router.store.mark('acme:1', until=105.0)
+    assert not router.should_use_replica('GET', None, 'acme:1', now=100.0)
+    assert router.should_use_replica('GET', None, 'acme:2', now=100.0)
+    assert router.should_use_replica('GET', None, 'acme:1', now=106.0)
+
+
+def test_failed_sticky_mark_keeps_the_response():
+    """A write whose sticky mark cannot be stored still returns its response"""
+    class BrokenStore:
+        def mark(self, key, until):
+            raise sqlite3.OperationalError('database is locked')
+
+    router = make_router(lag=0.0)
+    router.store = BrokenStore()
+    app = Flask(__name__)
+    with app.test_request_context('/api/tasks/1', method='PUT'):
+        g.replica_key = 'acme:1'
+        response = router.after_request(app.response_class(status=200))
+    assert response.status_code == 200
+
+
+def test_session_routes_plain_selects_to_replica():
+    """Only plain SELECTs outside flushes are sent to the replica bind"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite://'}
+    db.init_app(app)
+    with app.app_context():
+        session = db.session()
+        assert session.get_bind(clause=select(User)) is db.engines[None]
+        session.info['read_replica'] = True
+        assert session.get_bind(clause=select(User)) is db.engines['replica']
+        assert session.get_bind(clause=select(User).with_for_update()) is db.engines[None]
+        assert session.get_bind(clause=update(User).values(is_active=False)) is db.engines[None]
@@ -0,0 +1,140 @@
+"""Tests for the token revocation store"""
+import time
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, decode_token
+from sqlalchemy import text
+from models import db
+from models.revoked_token import RevokedToken
+from routes.auth import auth_bp
+from utils.revocation import RevocationStore, revocation_store
+
+
+@pytest.fixture
+def app():
+    """An app whose revoked_tokens table lives in an in-memory sqlite database"""
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', JWT_SECRET_KEY='x' * 32,
+                      TOKEN_REVOCATION_SYNC_SECONDS=60,
+                      # sqlite has no public schema
+                      SQLALCHEMY_ENGINE_OPTIONS={'execution_options': {'schema_translate_map': {'public': None}}})
+    db.init_app(app)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            # INTEGER PRIMARY KEY, because sqlite only autoincrements that
+            conn.execute(text('CREATE TABLE revoked_tokens (id INTEGER PRIMARY KEY, '
+                              'jti VARCHAR(36) NOT NULL UNIQUE, expires_at DATETIME NOT NULL, '
+                              'revoked_at DATETIME NOT NULL)'))
+        yield app
+
+
+def add_revocation(row_id, jti, expires_in=timedelta(hours=1), revoked_ago=timedelta(0)):
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        conn.execute(RevokedToken.__table__.insert().values(
+            id=row_id, jti=jti, expires_at=now + expires_in, revoked_at=now - revoked_ago))
+
+
+def test_revoked_check_is_local_between_syncs():
+    """Checks inside the sync interval never touch the database"""
+    store = RevocationStore()
+    store.sync_interval = 60
+    store._last_sync = store._last_attempt = time.monotonic()
+    store._revoked['abc'] = datetime.utcnow() + timedelta(hours=1)
+
+    assert store.is_revoked('abc')
+    assert not store.is_revoked('def')
+    assert store.is_warm()
+
+
+def test_failed_sync_backs_off(monkeypatch):
+    """An unreachable database is retried once per interval, not per check"""
+    store = RevocationStore()
+    store.sync_interval = 60
+    calls = []
+
+    def failing_sync():
+        calls.append(1)
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(store, 'sync', failing_sync)
+    assert not store.is_revoked('abc')
+    assert not store.is_revoked('abc')
+    assert len(calls) == 1
+    assert not store.is_warm()
+
+
+def test_sync_follows_watermark(app):
+    """Syncs read past the watermark plus a window of recent revocations"""
+    store = RevocationStore()
+    store.sync_interval = 1
+    add_revocation(1, 'old', revoked_ago=timedelta(hours=1))
+    add_revocation(2, 'expired', expires_in=timedelta(seconds=-1))
+    add_revocation(3, 'new')
+    store.sync()
+    assert set(store._revoked) == {'old', 'new'}
+    assert store._watermark == 3 and store.is_warm()
+
+    # A lower id that committed late is still inside the re-read window...
+    add_revocation(0, 'late')
+    # ...while old ones below the watermark are not read again
+    store._revoked.pop('old')
+    add_revocation(4, 'newer')
+    store.sync()
+    assert set(store._revoked) == {'new', 'late', 'newer'}
+    assert store._watermark == 4
+
+
+def test_sync_drops_expired_entries(app):
+    """Entries are forgotten once the token would have expired anyway"""
+    store = RevocationStore()
+    store._revoked['gone'] = datetime.utcnow() - timedelta(seconds=1)
+    store._revoked['kept'] = datetime.utcnow() + timedelta(hours=1)
+    store.sync()
+    assert set(store._revoked) == {'kept'}
+
+
+def test_revoke_is_idempotent(app):
+    """Revoking the same token twice keeps a single row"""
+    store = RevocationStore()
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    store.revoke('abc', expires_at)
+    store.revoke('abc', expires_at)
+    assert store.is_revoked('abc')
+    with db.engine.connect() as conn:
+        assert conn.execute(text('SELECT count(*) FROM revoked_tokens')).scalar() == 1
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    """A test client whose JWT checks go through the revocation store"""
+    monkeypatch.setattr(revocation_store, '_revoked', {})
+    monkeypatch.setattr(revocation_store, '_watermark', 0)
+    monkeypatch.setattr(revocation_store, '_last_attempt', None)
+    revocation_store.init_app(app, JWTManager(app))
+    app.register_blueprint(auth_bp)
+    return app.test_client()
+
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    """Logged out tokens are rejected by the blocklist loader"""
+    access, refresh = create_access_token(identity='1'), create_refresh_token(identity='1')
+    headers = {'Authorization': f'Bearer {access}'}
+    response = client.post('/api/auth/logout', headers=headers, json={'refresh_token': refresh})
+    assert response.status_code == 200
+
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+    assert client.post('/api/auth/refresh',
+                       headers={'Authorization': f'Bearer {refresh}'}).status_code == 401
+    assert revocation_store.is_revoked(decode_token(refresh)['jti'])
+
+
+def test_logout_with_bad_refresh_token_revokes_nothing(client):
+    """A refresh token that fails validation leaves the access token usable"""
+    access = create_access_token(identity='1')
+    headers = {'Authorization': f'Bearer {access}'}
+    for refresh in ('not-a-token', create_refresh_token(identity='2')):
+        response = client.post('/api/auth/logout', headers=headers, json={'refresh_token': refresh})
+        assert response.status_code == 400
+    assert not revocation_store.is_revoked(decode_token(access)['jti'])
@@ -0,0 +1,49 @@
+"""Tests for tenant sharding"""
+from flask import Flask
+from sqlalchemy import select, text
+from config import parse_shard_urls
+from models import db
+from models.tenant import Tenant
+from models.user import User
+from utils.shards import engine_for_schema, remember_shard
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_BINDS'] = {'shard:eu1': 'sqlite://', 'replica': 'sqlite://'}
+    app.config['SHARD_DATABASE_URLS'] = {'eu1': 'sqlite://'}
+    db.init_app(app)
+    return app
+
+
+def test_parse_shard_urls():
+    """Shard URLs are read from 'name=url' pairs"""
+    assert parse_shard_urls('eu1=postgresql://a/db, us1=postgresql://b/db') == {
+        'eu1': 'postgresql://a/db', 'us1': 'postgresql://b/db'
+    }
+    assert parse_shard_urls(None) == {}
+
+
+def test_session_routes_tenant_tables_to_shard():
+    """Tenant tables and raw SQL go to the shard; master tables never do"""
+    with make_app().app_context():
+        session = db.session()
+        session.info['shard_bind'] = 'shard:eu1'
+        session.info['read_replica'] = True
+        shard = db.engines['shard:eu1']
+        assert session.get_bind(mapper=User) is shard
+        assert session.get_bind(clause=select(User)) is shard
+        assert session.get_bind(clause=text('SELECT 1')) is shard
+        # Master tables stay on the master (and may use its replica)
+        assert session.get_bind(clause=select(Tenant)) is db.engines['replica']
+        assert session.get_bind(mapper=Tenant) is db.engines[None]
+
+
+def test_engine_for_remembered_schema():
+    """Known schema placements resolve without a master query"""
+    with make_app().app_context():
+        remember_shard('tenant_acme', 'eu1')
+        remember_shard('tenant_other', None)
+        assert engine_for_schema('tenant_acme') is db.engines['shard:eu1']
+        assert engine_for_schema('tenant_other') is db.engines[None]
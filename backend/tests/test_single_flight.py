@@ -0,0 +1,63 @@
+"""Tests for single-flight coalescing"""
+import threading
+import pytest
+from utils.single_flight import SingleFlight
+
+
+def run_waiter(flights, key, fn, results, timeout=5):
+    thread = threading.Thread(target=lambda: results.append(flights.do(key, fn, timeout)))
+    thread.start()
+    return thread
+
+
+def test_concurrent_calls_share_one_computation():
+    """Waiters get the leader's result; later calls compute again"""
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'board'
+
+    results = []
+    leader = run_waiter(flights, 'board-1', compute, results)
+    started.wait(5)
+    waiters = [run_waiter(flights, 'board-1', compute, results) for _ in range(3)]
+    other_key = flights.do('board-2', lambda: b'other')
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [(b'board', False)] + [(b'board', True)] * 3
+    assert other_key == (b'other', False)
+    assert flights.do('board-1', lambda: b'fresh') == (b'fresh', False)
+
+
+def test_waiters_compute_themselves_after_failure_or_timeout():
+    """A failed or slow leader does not fail or block its waiters"""
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('statement timeout')
+
+    errors = []
+    leader = threading.Thread(target=lambda: errors.append(
+        pytest.raises(RuntimeError, flights.do, 'board', failing)))
+    leader.start()
+    started.wait(5)
+    assert flights.do('board', lambda: b'own', timeout=0.01) == (b'own', False)
+
+    results = []
+    waiter = run_waiter(flights, 'board', lambda: b'fallback', results)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert results == [(b'fallback', False)]
+    assert errors
@@ -0,0 +1,53 @@
+"""Tests for the slow-query log"""
+from utils.slow_queries import SlowQueryLog, fingerprint, redact, safe_to_analyze
+
+
+def test_fingerprint_ignores_parameters():
+    """Statements differing only in parameters share a fingerprint"""
+    assert fingerprint('SELECT * FROM tasks WHERE id = %(id_1)s') == \
+        fingerprint('SELECT *  FROM tasks\nWHERE id = 42')
+    assert fingerprint('SELECT * FROM tasks') != fingerprint('SELECT * FROM lists')
+
+
+def test_redact_keeps_only_types():
+    """Parameter values are replaced by their types"""
+    assert redact({'title': 'secret plan', 'id': 3, 'due': None}) == \
+        {'title': '<str:11>', 'id': '<int>', 'due': None}
+    assert redact(('x',)) == ['<str:1>']
+
+
+def test_only_plain_selects_are_analyzed():
+    """ANALYZE runs the statement, so locking and writing statements get plain EXPLAIN"""
+    assert safe_to_analyze('SELECT * FROM tasks WHERE id = %(id_1)s')
+    assert safe_to_analyze("WITH t AS (SELECT id FROM tasks) SELECT * FROM t WHERE title = 'update'")
+    assert not safe_to_analyze('SELECT id FROM tasks WHERE completed FOR UPDATE SKIP LOCKED')
+    assert not safe_to_analyze('SELECT * FROM tasks FOR NO KEY UPDATE')
+    assert not safe_to_analyze('select * from lists for share')
+    assert not safe_to_analyze('WITH change AS (INSERT INTO change_log VALUES (1) RETURNING id) '
+                               'SELECT pg_notify(%(channel)s, id::text) FROM change')
+    assert not safe_to_analyze('SELECT * INTO backup FROM tasks')
+    assert not safe_to_analyze('UPDATE tasks SET title = %(title)s')
+
+
+def test_entries_aggregate_and_explain_repeat_offenders():
+    """Repeat offenders are explained once; entries are bounded"""
+    log = SlowQueryLog()
+    log.explain_after = 2
+    log.max_entries = 2
+    explained = []
+    log._explain = lambda engine, key, schema, statement, parameters: explained.append(key)
+    log._executor = type('Inline', (), {'submit': lambda self, fn, *args: fn(*args)})()
+
+    for elapsed in (600, 900, 700):
+        log.record(None, 'tenant_acme', 'projects.get_project',
+                   'SELECT * FROM tasks WHERE list_id = %(list_id_1)s', {'list_id_1': 1}, elapsed)
+    assert len(explained) == 1
+
+    entry, = log.report('tenant_acme')
+    assert entry['count'] == 3 and entry['max_ms'] == 900 and entry['mean_ms'] == 733.3
+    assert entry['routes'] == {'projects.get_project': 3}
+    assert log.report('tenant_globex') == []
+
+    log.record(None, 'tenant_acme', None, 'SELECT 1', None, 600)
+    log.record(None, 'tenant_acme', None, 'SELECT 2 FROM lists', None, 600)
+    assert len(log.entries) == 2
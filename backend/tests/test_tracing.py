@@ -0,0 +1,85 @@
+"""Tests for request tracing"""
+import json
+from flask import Flask, jsonify
+from middleware.tracing import RequestTracer
+from utils.tracing import JsonLinesExporter, format_traceparent, parse_traceparent, span, traced
+
+
+def test_traceparent_round_trip():
+    """Valid traceparents parse; malformed or all-zero ids are rejected"""
+    value = format_traceparent('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7')
+    assert parse_traceparent(value) == ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', True)
+    assert parse_traceparent('00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00')[2] is False
+    assert parse_traceparent('00-' + '0' * 32 + '-00f067aa0ba902b7-01') is None
+    assert parse_traceparent('garbage') is None
+
+
+@traced('serialize')
+def serialize(depth):
+    return [serialize(depth - 1)] if depth else []
+
+
+def make_app(path, rate, upstream_rate=100.0):
+    app = Flask(__name__)
+    app.config.update(TRACE_SAMPLE_RATE=rate, TRACE_EXPORTER='jsonl', TRACE_FILE=str(path),
+                      TRACE_FILE_MAX_BYTES=1024 * 1024, TRACE_MAX_SPANS=100,
+                      TRACE_UPSTREAM_PER_SECOND=upstream_rate)
+    RequestTracer(app)
+
+    @app.route('/board')
+    def board():
+        with span('tenant.resolve'):
+            pass
+        return jsonify(serialize(3))
+
+    return app
+
+
+def test_sampled_request_exports_spans(tmp_path):
+    """A sampled request exports a root span with its stage spans"""
+    path = tmp_path / 'spans.jsonl'
+    client = make_app(path, 1.0).test_client()
+    parent = format_traceparent('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7')
+    response = client.get('/board', headers={'traceparent': parent})
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    root = next(s for s in spans if s['parent_span_id'] == '00f067aa0ba902b7')
+    assert {s['trace_id'] for s in spans} == {'4bf92f3577b34da6a3ce929d0e0e4736'}
+    assert root['attributes']['http.status_code'] == 200
+    # Nested serialize calls fold into one span
+    assert sorted(s['name'] for s in spans if s is not root) == ['serialize', 'tenant.resolve']
+    assert parse_traceparent(response.headers['traceparent'])[1] == root['span_id']
+
+
+def test_unsampled_request_exports_nothing(tmp_path):
+    """Without sampling no spans are recorded"""
+    path = tmp_path / 'spans.jsonl'
+    client = make_app(path, 0.0).test_client()
+    response = client.get('/board')
+    assert response.status_code == 200 and 'traceparent' not in response.headers
+    assert not path.exists()
+
+
+def test_upstream_sampled_requests_are_capped(tmp_path):
+    """A caller marking every traceparent sampled gets only the per-worker rate"""
+    app = make_app(tmp_path / 'spans.jsonl', 0.0, upstream_rate=2.0)
+    tracer = app.extensions['tracer']
+    assert [tracer.allow_upstream_sampled(now=0.0) for _ in range(3)] == [True, True, False]
+    assert tracer.allow_upstream_sampled(now=0.5)
+    assert not tracer.allow_upstream_sampled(now=0.5)
+
+    parent = format_traceparent('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7')
+    client = app.test_client()
+    traced_responses = [client.get('/board', headers={'traceparent': parent}) for _ in range(10)]
+    assert sum('traceparent' in response.headers for response in traced_responses) <= 2
+
+
+def test_jsonl_exporter_rotates(tmp_path):
+    """The span file is rotated once it would pass max_bytes"""
+    path = tmp_path / 'spans.jsonl'
+    exporter = JsonLinesExporter(str(path), max_bytes=200)
+    for i in range(10):
+        exporter.export([{'name': 'x' * 40, 'i': i}])
+    assert path.stat().st_size <= 200
+    assert (tmp_path / 'spans.jsonl.1').stat().st_size <= 200
+    assert json.loads(path.read_text().splitlines()[-1])['i'] == 9
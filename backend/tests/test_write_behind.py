@@ -0,0 +1,125 @@
+"""Tests for the write-behind buffer"""
+import contextlib
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from models import db
+from models.user import User  # noqa: F401
+from utils.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    """A buffer touching rows of the acme tenant without a flusher thread"""
+    tenant = SimpleNamespace(schema_name='tenant_acme')
+    monkeypatch.setattr('utils.write_behind.get_current_tenant', lambda: tenant)
+    buffer = WriteBehindBuffer()
+    monkeypatch.setattr(buffer, '_ensure_running', lambda: None)
+    return buffer
+
+
+def test_rejects_columns_not_allowed():
+    """Only whitelisted monotonic columns can be written behind"""
+    buffer = WriteBehindBuffer()
+    with pytest.raises(ValueError):
+        buffer.touch('users', 1, role='admin')
+
+
+def test_touch_keeps_greatest_value(buffer, monkeypatch):
+    """Touches of a row between flushes collapse into its newest value"""
+    flushes = []
+    monkeypatch.setattr(buffer, 'request_flush', lambda: flushes.append(1))
+    buffer.max_pending = 2
+
+    buffer.touch('users', 1, last_login=datetime(2026, 1, 2))
+    buffer.touch('users', 1, last_login=datetime(2026, 1, 1))
+    buffer.touch('users', 1, last_login=None)
+    assert buffer.pending('tenant_acme', 'users', 1) == {'last_login': datetime(2026, 1, 2)}
+    buffer.touch('users', 1, last_login=datetime(2026, 1, 3))
+    assert buffer.pending('tenant_acme', 'users', 1) == {'last_login': datetime(2026, 1, 3)}
+    assert not flushes
+
+    # A full buffer asks for an early flush
+    buffer.touch('users', 2, last_login=datetime(2026, 1, 1))
+    assert flushes == [1]
+
+
+def test_touch_outside_a_tenant_is_dropped(monkeypatch):
+    """Without a tenant there is no schema to write to"""
+    monkeypatch.setattr('utils.write_behind.get_current_tenant', lambda: None)
+    buffer = WriteBehindBuffer()
+    buffer.touch('users', 1, last_login=datetime(2026, 1, 1))
+    assert buffer._pending == {}
+
+
+def test_restore_keeps_latest_value():
+    """Re-queued values never overwrite newer pending ones"""
+    buffer = WriteBehindBuffer()
+    newer = datetime(2026, 1, 2)
+    buffer._pending[('tenant_acme', 'users', 1)] = {'last_login': newer}
+
+    buffer._restore({('tenant_acme', 'users', 1): {'last_login': datetime(2026, 1, 1)},
+                     ('tenant_acme', 'users', 2): {'last_login': newer}})
+
+    assert buffer.pending('tenant_acme', 'users', 1) == {'last_login': newer}
+    assert buffer.pending('tenant_acme', 'users', 2) == {'last_login': newer}
+
+
+@pytest.fixture
+def postgres_app():
+    """An app whose engine compiles for PostgreSQL (it never connects)"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://localhost/unused'
+    db.init_app(app)
+    with app.app_context():
+        yield app
+
+
+def test_update_statement(postgres_app):
+    """Rows are updated from typed VALUES and never moved backwards"""
+    first, second = datetime(2026, 1, 1), datetime(2026, 1, 2)
+    statement, params = WriteBehindBuffer()._update_statement(
+        'tenant_acme', 'users', ('last_login',),
+        [(1, {'last_login': first}), (2, {'last_login': second})]
+    )
+    assert str(statement) == (
+        'UPDATE tenant_acme.users AS t SET last_login = GREATEST(t.last_login, v.last_login) '
+        'FROM (VALUES (:id_0, CAST(:last_login_0 AS TIMESTAMP WITHOUT TIME ZONE)), '
+        '(:id_1, CAST(:last_login_1 AS TIMESTAMP WITHOUT TIME ZONE))) AS v(id, last_login) '
+        'WHERE t.id = v.id'
+    )
+    assert params == {'id_0': 1, 'last_login_0': first, 'id_1': 2, 'last_login_1': second}
+
+
+class FakeConnection:
+    """Connection recording how many rows each UPDATE carries"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def execute(self, statement, params):
+        self.chunks.append(sum(name.startswith('id_') for name in params))
+
+
+class FakeEngine:
+    """Engine handing out one FakeConnection"""
+
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self.conn
+
+
+def test_write_chunks_by_batch_size(postgres_app, monkeypatch):
+    """Each UPDATE carries at most batch_size rows"""
+    engine = FakeEngine()
+    monkeypatch.setattr('utils.write_behind.group_by_engine', lambda schemas: {engine: schemas})
+    buffer = WriteBehindBuffer()
+    buffer.batch_size = 2
+    batch = {('tenant_acme', 'users', row_id): {'last_login': datetime(2026, 1, 1)} for row_id in range(5)}
+
+    assert buffer._write(batch) == (5, {})
+    assert engine.conn.chunks == [2, 2, 1]
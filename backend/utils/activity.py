@@ -0,0 +1,266 @@
+"""Activity tracking with batched, month-partitioned writes"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from flask import g, has_app_context
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+from models.activity import Activity
+from middleware.tenant_middleware import get_current_tenant
+from utils.flusher import PeriodicFlusher
+from utils.shards import group_by_engine
+
+logger = logging.getLogger(__name__)
+
+
+def shift_months(moment, months):
+    """Get the first instant of the month `months` away from a datetime"""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(moment):
+    """Get the first instant of a datetime's month and of the next month"""
+    return shift_months(moment, 0), shift_months(moment, 1)
+
+
+def partition_name(moment):
+    """Get the activity partition table name for a datetime's month"""
+    return f'{Activity.__tablename__}_{moment:%Y_%m}'
+
+
+class ActivityRecorder(PeriodicFlusher):
+    """
+    Buffers activity events in-process and writes them in batches
+
+    Routes call record() after their own commit; nothing is written inside
+    the request. Events are grouped by tenant schema and inserted with one
+    multi-row INSERT per schema, creating monthly partitions on demand.
+    Each schema is written under its own savepoint, so one broken tenant
+    schema does not hold back the others; its events are retried on the
+    next flushes and dropped after `max_attempts` failed writes.
+    """
+
+    name = 'activity'
+
+    def __init__(self):
+        super().__init__()
+        self.max_batch = 500
+        self.max_buffer = 50000
+        self.max_attempts = 5
+        self._buffer = defaultdict(list)
+        self._size = 0
+        self._partitions = set()
+        # Schema -> consecutive failed writes
+        self._attempts = {}
+
+    def init_app(self, app):
+        """Initialize recorder with Flask app"""
+        super().init_app(app, app.config['ACTIVITY_FLUSH_INTERVAL_SECONDS'])
+        self.max_batch = app.config['ACTIVITY_FLUSH_BATCH_SIZE']
+        self.max_buffer = app.config['ACTIVITY_MAX_BUFFER']
+        self.max_attempts = app.config['ACTIVITY_MAX_WRITE_ATTEMPTS']
+
+    def record(self, actor, action, project_id, entity_id=None, details=None):
+        """
+        Queue an activity event for the current tenant
+
+        Args:
+            actor: User performing the action (or None for system actions)
+            action: Dotted action name, e.g. 'task.moved'
+            project_id: Project (board) the action belongs to
+            entity_id: Primary key of the affected entity
+            details: Optional JSON-serializable context
+        """
+        tenant = get_current_tenant()
+        if tenant is None:
+            return
+
+        row = {
+            'created_at': datetime.utcnow(),
+            'project_id': project_id,
+            # Read the identity key: attributes are expired after commit
+            'actor_id': inspect(actor).identity[0] if actor is not None else None,
+            'action': action,
+            'entity_id': entity_id,
+            'details': details,
+        }
+        with self._lock:
+            self._ensure_running()
+            if self._size >= self.max_buffer:
+                # Database unreachable for a long time: shed the oldest events
+                oldest = next(iter(self._buffer))
+                dropped = self._buffer[oldest].pop(0)
+                if not self._buffer[oldest]:
+                    del self._buffer[oldest]
+                self._size -= 1
+                logger.warning('Activity buffer full, dropping %s', dropped['action'])
+            self._buffer[tenant.schema_name].append(row)
+            self._size += 1
+            if self._size >= self.max_batch:
+                self.request_flush()
+
+    def _drain(self):
+        batch = {schema: rows for schema, rows in self._buffer.items() if rows}
+        self._buffer = defaultdict(list)
+        self._size = 0
+        return batch
+
+    def _restore(self, batch):
+        for schema, rows in batch.items():
+            self._buffer[schema][:0] = rows
+            self._size += len(rows)
+
+    def _reset(self):
+        self._buffer = defaultdict(list)
+        self._size = 0
+        self._attempts = {}
+
+    def _write(self, batch):
+        written = 0
+        failed = {}
+        # One transaction per shard, one savepoint per tenant schema
+        for engine, schemas in group_by_engine(batch).items():
+            shard_failed, created, shard_written = {}, set(), 0
+            try:
+                with engine.begin() as conn:
+                    for schema in schemas:
+                        rows = batch[schema]
+                        try:
+                            with conn.begin_nested():
+                                partitions = self._ensure_partitions(conn, schema, rows)
+                                tenant_conn = conn.execution_options(schema_translate_map={None: schema})
+                                # executemany is rendered as multi-row INSERT ... VALUES batches
+                                tenant_conn.execute(Activity.__table__.insert(), rows)
+                        except SQLAlchemyError as e:
+                            logger.warning('Activity write for %s failed: %s', schema, e)
+                            shard_failed[schema] = rows
+                            continue
+                        created |= partitions
+                        shard_written += len(rows)
+            except SQLAlchemyError as e:
+                # Nothing of this shard committed; other shards may have
+                logger.warning('Activity write to shard failed: %s', e)
+                failed.update((schema, batch[schema]) for schema in schemas)
+                continue
+            failed.update(shard_failed)
+            written += shard_written
+            # Only remember partitions once their CREATE has committed
+            self._partitions |= created
+
+        with self._lock:
+            retry = self._retryable(batch, failed)
+        return written, retry
+
+    def _retryable(self, batch, failed):
+        """
+        Count failed writes per schema and pick the rows to retry
+
+        Args:
+            batch: Drained batch, schema -> rows
+            failed: Schemas of the batch whose write failed -> rows
+
+        Returns:
+            dict: Failed rows of schemas still under max_attempts
+        """
+        retry = {}
+        for schema in batch:
+            if schema not in failed:
+                self._attempts.pop(schema, None)
+                continue
+            attempts = self._attempts.get(schema, 0) + 1
+            if attempts >= self.max_attempts:
+                self._attempts.pop(schema, None)
+                logger.error('Dropping %d activity events for %s after %d failed writes',
+                             len(failed[schema]), schema, attempts)
+            else:
+                self._attempts[schema] = attempts
+                retry[schema] = failed[schema]
+        return retry
+
+    def _ensure_partitions(self, conn, schema, rows):
+        """Create missing monthly partitions for rows; returns the keys created"""
+        created = set()
+        for moment in {month_bounds(row['created_at'])[0] for row in rows}:
+            key = (schema, moment)
+            if key in self._partitions:
+                continue
+            start, end = month_bounds(moment)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {schema}.{partition_name(start)} "
+                f"PARTITION OF {schema}.{Activity.__tablename__} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            ))
+            created.add(key)
+        return created
+
+
+activity = ActivityRecorder()
+
+
+def record_activity(actor, action, project_id, entity_id=None, details=None):
+    """
+    Queue an activity event for batched writing (see ActivityRecorder.record)
+
+    Inside an atomic batch (session info 'defer_commit') the view's commit
+    has not happened yet, so the event is held in `g` until the batch
+    calls publish_deferred_activity() or discard_deferred_activity().
+    """
+    if has_app_context() and db.session.info.get('defer_commit'):
+        g.setdefault('deferred_activity', []).append((actor, action, project_id, entity_id, details))
+        return
+    activity.record(actor, action, project_id, entity_id, details)
+
+
+def publish_deferred_activity():
+    """Queue the activity events held back by an atomic batch that committed"""
+    for event in g.pop('deferred_activity', []):
+        activity.record(*event)
+
+
+def discard_deferred_activity():
+    """Drop the activity events held back by an atomic batch that rolled back"""
+    g.pop('deferred_activity', None)
+
+
+def drop_activity_partitions(schema_name, keep_months):
+    """
+    Drop monthly activity partitions older than the retention window
+
+    Detaching and dropping a partition is a catalog operation, so old
+    history is removed without a bulk DELETE or vacuum.
+
+    Args:
+        schema_name: Tenant schema to clean up
+        keep_months: Number of most recent months to keep (including current)
+
+    Returns:
+        list: Names of the dropped partitions
+    """
+    oldest_kept = partition_name(shift_months(datetime.utcnow(), 1 - keep_months))
+
+    partitions = db.session.execute(
+        text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+            WHERE parent.relname = :table AND ns.nspname = :schema
+        """),
+        {'table': Activity.__tablename__, 'schema': schema_name}
+    ).scalars().all()
+
+    dropped = []
+    for name in sorted(partitions):
+        if name < oldest_kept:
+            db.session.execute(text(
+                f"ALTER TABLE {schema_name}.{Activity.__tablename__} "
+                f"DETACH PARTITION {schema_name}.{name}"
+            ))
+            db.session.execute(text(f"DROP TABLE {schema_name}.{name}"))
+            dropped.append(name)
+    db.session.commit()
+    return dropped
+
@@ -0,0 +1,96 @@
+"""Hot/cold split: move old completed tasks out of the live tasks table"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from models import db
+from models.archive import ArchivedComment, ArchivedTask
+from models.task import Comment, Task
+
+
+def _column_list(table, prefix=''):
+    return ', '.join(f'{prefix}{column.name}' for column in table.columns)
+
+
+def archive_completed_tasks(schema_name, days, batch_size=500):
+    """
+    Move tasks completed more than `days` ago, with their comments, into
+    archived_tasks and archived_comments of the current tenant schema
+
+    Each batch of tasks is copied, logged as deleted in the change log and
+    on the board events channel (so delta sync and live clients drop them)
+    and removed in its own transaction. Rows locked by concurrent requests
+    are skipped until the next run.
+
+    Args:
+        schema_name: Tenant schema the session's search_path points at
+        days: Archive tasks completed longer ago than this
+        batch_size: Tasks moved per transaction
+
+    Returns:
+        tuple: (tasks archived, comments archived)
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    task_columns = _column_list(Task.__table__)
+    comment_columns = _column_list(Comment.__table__)
+    tasks_archived = comments_archived = 0
+
+    while True:
+        ids = db.session.execute(
+            text("""
+                SELECT id FROM tasks
+                WHERE completed AND completed_at < :cutoff
+                ORDER BY completed_at, id
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED
+            """),
+            {'cutoff': cutoff, 'batch_size': batch_size}
+        ).scalars().all()
+        if not ids:
+            db.session.rollback()
+            break
+
+        params = {'ids': ids, 'now': datetime.utcnow(), 'schema': schema_name,
+                  'channel': current_app.config['BOARD_EVENTS_CHANNEL']}
+        comments_archived += db.session.execute(
+            text(f"""
+                INSERT INTO {ArchivedComment.__tablename__} ({comment_columns})
+                SELECT {comment_columns} FROM comments WHERE task_id = ANY(:ids)
+            """),
+            params
+        ).rowcount
+        db.session.execute(
+            text(f"""
+                INSERT INTO {ArchivedTask.__tablename__} ({task_columns}, project_id, archived_at)
+                SELECT {_column_list(Task.__table__, 't.')}, l.project_id, :now
+                FROM tasks t JOIN lists l ON l.id = t.list_id
+                WHERE t.id = ANY(:ids)
+            """),
+            params
+        )
+        # Same change log rows and NOTIFY payloads as publish_change(),
+        # delivered when the batch commits
+        db.session.execute(
+            text("""
+                WITH change AS (
+                    INSERT INTO change_log (project_id, entity, entity_id, op, created_at)
+                    SELECT l.project_id, 'task', t.id, 'deleted', :now
+                    FROM tasks t JOIN lists l ON l.id = t.list_id
+                    WHERE t.id = ANY(:ids)
+                    RETURNING id, project_id, entity_id
+                )
+                SELECT count(pg_notify(:channel, CAST(json_build_object(
+                    's', CAST(:schema AS text), 'p', project_id, 'e', 'task', 'o', 'deleted',
+                    'id', entity_id, 'c', id
+                ) AS text)))
+                FROM change
+            """),
+            params
+        )
+        db.session.execute(text('DELETE FROM comments WHERE task_id = ANY(:ids)'), params)
+        tasks_archived += db.session.execute(text('DELETE FROM tasks WHERE id = ANY(:ids)'), params).rowcount
+        db.session.commit()
+
+        if len(ids) < batch_size:
+            break
+
+    return tasks_archived, comments_archived
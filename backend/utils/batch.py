@@ -0,0 +1,30 @@
+"""Marks requests dispatched as operations of a batch request"""
+from contextlib import contextmanager
+from flask import g
+
+
+@contextmanager
+def batch_operation():
+    """
+    Flag the operations run inside this block as part of a batch
+
+    Operations share `g` with the batch request, so per-request middleware
+    state (traces, metrics, budgets, profiles) belongs to the batch.
+    """
+    g.batch_operation = True
+    try:
+        yield
+    finally:
+        g.pop('batch_operation', None)
+
+
+def in_batch_operation():
+    """
+    Check whether the current request is an operation of a batch
+
+    Request teardown hooks skip these; the batch request settles them.
+
+    Returns:
+        bool: True inside a batch operation
+    """
+    return g.get('batch_operation', False)
@@ -0,0 +1,165 @@
+"""Incremental JSON encoding of boards, streamed list by list"""
+import json
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import case, select
+from models import db
+from models.list import List
+from models.task import Task
+from models.user import User
+from utils.fieldsets import Fieldsets
+from utils.tracing import span
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def _open_object(data, key):
+    """Encode a dict without its closing brace, opening an array under key"""
+    return _dumps(data)[:-1] + (',' if data else '') + _dumps(key) + ':['
+
+
+def load_lists(project_id):
+    """Load a project's lists in board order (without their tasks)"""
+    return List.query.filter_by(project_id=project_id).order_by(List.position, List.id).all()
+
+
+def load_assignees(task_condition, fields=None):
+    """
+    Load the users assigned to the tasks matching a condition, once
+
+    Returns:
+        dict: {user_id: serialized user}, empty if 'assignee' is not requested
+    """
+    if fields and 'assignee' not in fields:
+        return {}
+    assignee_ids = (
+        select(Task.assignee_id).join(List, Task.list_id == List.id)
+        .where(task_condition, Task.assignee_id.isnot(None))
+        .distinct()
+    )
+    return {user.id: user.to_dict(include_email=False)
+            for user in User.query.filter(User.id.in_(assignee_ids))}
+
+
+def task_rows(task_condition, fields=None, list_ids=None):
+    """
+    Select only the task columns the requested fields need, in board order
+
+    Rows come from a server-side cursor in BOARD_STREAM_BATCH_SIZE batches.
+    list_id is always selected so rows can be grouped by list.
+
+    Args:
+        task_condition: Filter on the tasks (and their lists)
+        fields: Task field names to serialize (default: all)
+        list_ids: Order rows by this list order instead of the lists'
+            current positions, e.g. that of lists loaded by an earlier
+            statement, which may no longer match under READ COMMITTED
+    """
+    columns = Task.columns_for(fields)
+    if Task.list_id not in columns:
+        columns.append(Task.list_id)
+    if list_ids is not None:
+        list_order = [case({list_id: rank for rank, list_id in enumerate(list_ids)},
+                           value=Task.list_id, else_=len(list_ids))]
+    else:
+        list_order = [List.position, List.id]
+    return db.session.execute(
+        select(*columns)
+        .join(List, Task.list_id == List.id)
+        .where(task_condition)
+        .order_by(*list_order, Task.position, Task.id)
+        .execution_options(yield_per=current_app.config['BOARD_STREAM_BATCH_SIZE'])
+    )
+
+
+def iter_lists_json(project_id, lists, fieldsets=None):
+    """
+    Yield the JSON of each list of a project with its tasks
+
+    Tasks come from a server-side cursor ordered by `lists` itself, not by
+    the lists' current positions, so a list reordered, added or given a
+    task after `lists` was loaded cannot put the two out of step. Only one
+    batch of task rows is held in memory at a time. Assignees are loaded
+    once per board.
+
+    Args:
+        project_id: Project whose lists to encode
+        lists: The project's lists from load_lists()
+        fieldsets: Optional Fieldsets for 'lists' and 'tasks'
+
+    Yields:
+        str: One encoded list per item
+    """
+    fieldsets = fieldsets or Fieldsets('lists')
+    if not fieldsets.includes('lists', 'tasks'):
+        for lst in lists:
+            yield _dumps(fieldsets.filter('lists', lst.to_dict()))
+        return
+    if not lists:
+        return
+
+    fields = fieldsets.get('tasks')
+    list_ids = [lst.id for lst in lists]
+    # Tasks of lists added since `lists` was loaded are left out with them
+    condition = Task.list_id.in_(list_ids)
+    assignees = load_assignees(condition, fields)
+    rows = task_rows(condition, fields, list_ids)
+    row = next(rows, None)
+    for lst in lists:
+        with span('serialize.list', list_id=lst.id) as list_span:
+            parts = [_open_object(fieldsets.filter('lists', lst.to_dict()), 'tasks')]
+            count = 0
+            while row is not None and row.list_id == lst.id:
+                if count:
+                    parts.append(',')
+                parts.append(_dumps(Task.row_to_dict(row, assignees.get(row.assignee_id)
+                                                     if assignees else None, fields)))
+                count += 1
+                row = next(rows, None)
+            parts.append(']}')
+            if list_span is not None:
+                list_span['attributes']['tasks'] = count
+        yield ''.join(parts)
+
+
+def iter_board_json(head, lists):
+    """
+    Yield a JSON object with `head`'s keys and a streamed "lists" array
+
+    Args:
+        head: Dict of the non-list fields
+        lists: Iterable of already encoded list objects
+    """
+    yield _open_object(head, 'lists')
+    first = True
+    for encoded in lists:
+        yield encoded if first else ',' + encoded
+        first = False
+    yield ']}'
+
+
+def buffered(chunks, size=16384):
+    """Coalesce small chunks so the socket sees few, larger writes"""
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_json(chunks, status=200):
+    """
+    Build a streamed JSON response
+
+    The request context stays open until the last chunk is sent, so the
+    session and its server-side cursor outlive the view function.
+    """
+    return Response(stream_with_context(buffered(chunks)), status=status,
+                    mimetype='application/json')
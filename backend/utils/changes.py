@@ -0,0 +1,210 @@
+"""Delta sync over the per-tenant change log"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from models import db
+from models.change import ChangeLog
+from models.list import List
+from models.project import Project, project_members
+from models.task import Task, Comment
+from models.user import User
+
+
+def current_cursor():
+    """
+    Get the newest change log cursor in the current tenant schema
+
+    Returns:
+        int: Cursor to hand to clients alongside a full board load
+    """
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def cursor_expired(since):
+    """
+    Check whether changes after a cursor may already have been pruned
+
+    Args:
+        since: Cursor the client last saw
+
+    Returns:
+        bool: True if the client must reload the full board
+    """
+    if since == 0:
+        return False
+    oldest = db.session.query(func.min(ChangeLog.id)).scalar()
+    return oldest is not None and since < oldest - 1
+
+
+def _grouped_changes(project_id, condition, limit=None, newest_first=False):
+    """
+    Collapse the project's change log rows matching a condition per entity
+
+    Returns:
+        list: Dicts with entity, entity_id, cursor (last id), first_op and
+        last_op, ordered by cursor
+    """
+    last_id = func.max(ChangeLog.id)
+    query = db.session.query(
+        ChangeLog.entity, ChangeLog.entity_id, func.min(ChangeLog.id).label('first_id'),
+        last_id.label('last_id')
+    ).filter(ChangeLog.project_id == project_id, condition).group_by(
+        ChangeLog.entity, ChangeLog.entity_id
+    ).order_by(last_id.desc() if newest_first else last_id)
+    if limit is not None:
+        query = query.limit(limit)
+    groups = query.all()
+    if not groups:
+        return []
+
+    op_ids = {group.first_id for group in groups} | {group.last_id for group in groups}
+    ops = dict(db.session.query(ChangeLog.id, ChangeLog.op).filter(ChangeLog.id.in_(op_ids)).all())
+    rows = [{
+        'entity': group.entity,
+        'entity_id': group.entity_id,
+        'cursor': group.last_id,
+        'first_op': ops[group.first_id],
+        'last_op': ops[group.last_id],
+    } for group in groups]
+    return rows[::-1] if newest_first else rows
+
+
+def overlap_changes(project_id, since, window_seconds, limit):
+    """
+    Re-read the changes logged shortly before a cursor
+
+    Change log ids are handed out when a row is inserted, not when its
+    transaction commits, so a transaction holding a lower id can commit
+    after a client has already read past it. Re-reading the entities
+    logged within `window_seconds` of the cursor row catches them; clients
+    apply deltas by id, so repeats are harmless.
+
+    Args:
+        project_id: Project (board) to sync
+        since: Cursor the client last saw
+        window_seconds: How far back from the cursor row to re-read
+        limit: Maximum number of entities to re-read (the newest win)
+
+    Returns:
+        list: Collapsed rows as returned for the changes after the cursor
+    """
+    if since == 0 or window_seconds <= 0:
+        return []
+    cursor_time = db.session.query(ChangeLog.created_at).filter(
+        ChangeLog.id <= since
+    ).order_by(ChangeLog.id.desc()).limit(1).scalar()
+    if cursor_time is None:
+        return []
+    return _grouped_changes(
+        project_id,
+        (ChangeLog.id <= since) & (ChangeLog.created_at >= cursor_time - timedelta(seconds=window_seconds)),
+        limit, newest_first=True
+    )
+
+
+def collect_changes(project_id, since, limit, overlap_seconds=0):
+    """
+    Collect the net changes to a board after a cursor
+
+    Repeated changes to one entity are collapsed, so the result holds the
+    current state of every created or updated row and a tombstone for every
+    deleted one, no matter how many times it changed. Entities changed
+    within `overlap_seconds` before the cursor are sent again (see
+    overlap_changes()); the returned cursor never moves backwards.
+
+    Args:
+        project_id: Project (board) to sync
+        since: Cursor the client last saw
+        limit: Maximum number of changed entities to return
+        overlap_seconds: Window of changes before the cursor to re-read
+
+    Returns:
+        dict: Changes grouped by entity type, the next cursor and has_more
+    """
+    rows = _grouped_changes(project_id, ChangeLog.id > since, limit + 1)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    result = {
+        'cursor': rows[-1]['cursor'] if rows else since,
+        'has_more': has_more,
+        'project': None,
+        'project_deleted': False,
+    }
+    changed = {entity: {'created': [], 'updated': [], 'deleted': []}
+               for entity in ('lists', 'tasks', 'comments', 'members')}
+    upserts = {entity: {} for entity in ('project', 'list', 'task', 'comment', 'member')}
+
+    # Entities changed again after the cursor are collapsed with their
+    # overlap rows, keeping the newest op
+    seen = {(row['entity'], row['entity_id']) for row in rows}
+    overlap = [row for row in overlap_changes(project_id, since, overlap_seconds, limit)
+               if (row['entity'], row['entity_id']) not in seen]
+
+    for row in overlap + rows:
+        if row['last_op'] == 'deleted':
+            if row['entity'] == 'project':
+                result['project_deleted'] = True
+            else:
+                changed[row['entity'] + 's']['deleted'].append(row['entity_id'])
+        else:
+            kind = 'created' if row['first_op'] == 'created' else 'updated'
+            upserts[row['entity']][row['entity_id']] = kind
+
+    if upserts['project']:
+        project = Project.query.get(project_id)
+        if project:
+            result['project'] = project.to_dict()
+        else:
+            result['project_deleted'] = True
+
+    loaders = {
+        'list': lambda ids: List.query.filter(List.id.in_(ids), List.project_id == project_id),
+        'task': lambda ids: Task.query.join(List).filter(Task.id.in_(ids), List.project_id == project_id),
+        'comment': lambda ids: Comment.query.join(Task).join(List).filter(
+            Comment.id.in_(ids), List.project_id == project_id),
+        'member': lambda ids: User.query.join(
+            project_members, project_members.c.user_id == User.id
+        ).filter(User.id.in_(ids), project_members.c.project_id == project_id),
+    }
+
+    for entity, load in loaders.items():
+        kinds = upserts[entity]
+        if not kinds:
+            continue
+        bucket = changed[entity + 's']
+        found = set()
+        for obj in load(list(kinds)).all():
+            found.add(obj.id)
+            data = obj.to_dict(include_email=False) if entity == 'member' else obj.to_dict()
+            bucket[kinds[obj.id]].append(data)
+        # Rows removed without their own log entry (cascades, moves) are gone
+        bucket['deleted'].extend(entity_id for entity_id in kinds if entity_id not in found)
+
+    result.update(changed)
+    return result
+
+
+def prune_change_log(retention_days):
+    """
+    Delete change log rows older than the retention window
+
+    The newest row is always kept so cursor_expired() can tell a fully
+    pruned log from one that never had changes.
+
+    Args:
+        retention_days: Number of days of changes to keep
+
+    Returns:
+        int: Number of rows deleted
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = db.session.execute(
+        text("""
+            DELETE FROM change_log
+            WHERE created_at < :cutoff
+              AND id < (SELECT max(id) FROM change_log)
+        """),
+        {'cutoff': cutoff}
+    )
+    db.session.commit()
+    return result.rowcount
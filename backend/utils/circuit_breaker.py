@@ -0,0 +1,133 @@
+"""Circuit breakers that fast-fail tenants whose queries keep timing out"""
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker
+
+    `failure_threshold` failures within `window_seconds` open the breaker
+    for `open_seconds`. After that one probe request is let through
+    (half-open); its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, window_seconds=60.0, open_seconds=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.trips = 0
+        self.recoveries = 0
+        self.rejections = 0
+        self._failures = deque()
+        self._opened_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Check whether a request may run; counts rejections"""
+        with self._lock:
+            if self.state == OPEN and self.clock() >= self._opened_until:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejections += 1
+            return False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through"""
+        return max(0.0, self._opened_until - self.clock())
+
+    def record_failure(self):
+        """Record a timed-out or cancelled query"""
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._trip(now)
+                return
+            self._failures.append(now)
+            while self._failures and self._failures[0] < now - self.window_seconds:
+                self._failures.popleft()
+            if self.state == CLOSED and len(self._failures) >= self.failure_threshold:
+                self._trip(now)
+
+    def record_success(self):
+        """Record a request that finished without query timeouts"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.recoveries += 1
+                self._failures.clear()
+                self._probe_in_flight = False
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.trips += 1
+        self._opened_until = now + self.open_seconds
+        self._probe_in_flight = False
+        self._failures.clear()
+
+    def to_dict(self):
+        """Convert breaker state and counters to dictionary"""
+        return {
+            'state': self.state,
+            'trips': self.trips,
+            'recoveries': self.recoveries,
+            'rejections': self.rejections,
+            'retry_after': round(self.retry_after(), 1) if self.state == OPEN else 0
+        }
+
+
+class BreakerRegistry:
+    """One lazily created breaker per key (tenant subdomain)"""
+
+    def __init__(self):
+        self.failure_threshold = 5
+        self.window_seconds = 60.0
+        self.open_seconds = 30.0
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def configure(self, failure_threshold, window_seconds, open_seconds):
+        """Set parameters used for breakers created from now on"""
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+
+    def get(self, key):
+        """Get (or create) the breaker for a key"""
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker(
+                    self.failure_threshold, self.window_seconds, self.open_seconds
+                ))
+        return breaker
+
+    def peek(self, key):
+        """Get the breaker for a key without creating one"""
+        return self._breakers.get(key)
+
+    def stats(self):
+        """Aggregate counters across all breakers in this worker"""
+        breakers = list(self._breakers.values())
+        return {
+            'open': sum(1 for b in breakers if b.state != CLOSED),
+            'trips': sum(b.trips for b in breakers),
+            'recoveries': sum(b.recoveries for b in breakers),
+            'rejections': sum(b.rejections for b in breakers)
+        }
+
+
+tenant_breakers = BreakerRegistry()
@@ -1,6 +1,40 @@
 """Database utilities for multi-tenant operations"""
-from sqlalchemy import text
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
 from models import db
+from utils.shards import engine_for_schema, shard_bind_key, shard_for_schema
+
+# Tables that live only in the master (public) schema
+MASTER_TABLES = {'tenants', 'public.revoked_tokens'}
+
+# Statements filling a column right after it is added to an existing table
+COLUMN_BACKFILLS = {
+    ('tasks', 'comment_count'): """
+        UPDATE {schema}.tasks SET comment_count = counts.total
+        FROM (SELECT task_id, count(*) AS total FROM {schema}.comments GROUP BY task_id) AS counts
+        WHERE counts.task_id = tasks.id
+    """,
+}
+
+
+def use_schema(schema_name):
+    """
+    Point the session's transactions at a tenant schema
+    
+    Applied with SET LOCAL at the start of each transaction, so it holds for
+    whichever pooled connection (primary or replica) the session uses.
+    Tenant tables are routed to the shard hosting the schema.
+    
+    Args:
+        schema_name: Tenant schema, or None for the public schema only
+    """
+    session = db.session()
+    session.info['search_path'] = schema_name
+    session.info['shard_bind'] = shard_bind_key(shard_for_schema(schema_name)) if schema_name else None
+    if session.in_transaction():
+        # The open transaction already ran its SET LOCAL; update it too
+        path = f'{schema_name}, public' if schema_name else 'public'
+        session.connection().exec_driver_sql(f'SET LOCAL search_path TO {path}')
 
 
 def create_tenant_schema(schema_name):
@@ -11,34 +45,91 @@ def create_tenant_schema(schema_name):
         schema_name: Name of the schema to create
     """
     try:
-        # Create schema
-        db.session.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
-        db.session.commit()
-        
-        # Set search_path to new schema
-        db.session.execute(text(f"SET search_path TO {schema_name}, public"))
-        db.session.commit()
+        # Create schema on the tenant's shard
+        with engine_for_schema(schema_name).begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
         
         # Create tables in the new schema
-        # Import models here to avoid circular imports
-        from models.user import User
-        from models.project import Project, project_members
-        from models.list import List
-        from models.task import Task, Comment
-        
-        # Create all tables
-        db.create_all()
-        
-        # Reset search_path
-        db.session.execute(text("SET search_path TO public"))
-        db.session.commit()
+        ensure_tenant_tables(schema_name)
         
         return True
     except Exception as e:
-        db.session.rollback()
         raise Exception(f'Failed to create tenant schema: {str(e)}')
 
 
+def ensure_tenant_tables(schema_name):
+    """
+    Create any tables missing from a tenant schema
+    
+    Uses an explicit connection with a schema translate map rather than the
+    session search_path, so tables of the same name in the public schema
+    cannot make create_all() skip them.
+    
+    Args:
+        schema_name: Name of the tenant schema to upgrade
+    """
+    # Import models here to avoid circular imports
+    from models.user import User
+    from models.project import Project, project_members
+    from models.list import List
+    from models.task import Task, Comment
+    from models.change import ChangeLog
+    from models.activity import Activity
+    from models.archive import ArchivedTask, ArchivedComment
+    
+    tables = [table for name, table in db.metadata.tables.items()
+              if name not in MASTER_TABLES]
+    
+    try:
+        with engine_for_schema(schema_name).begin() as conn:
+            conn = conn.execution_options(schema_translate_map={None: schema_name})
+            db.metadata.create_all(bind=conn, tables=tables)
+            for table in tables:
+                add_missing_columns(conn, table, schema_name)
+                # create_all() only indexes the tables it creates
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+        return True
+    except Exception as e:
+        raise Exception(f'Failed to upgrade tenant schema: {str(e)}')
+
+
+def ensure_master_tables():
+    """Create any master (public schema) tables that are missing"""
+    # Import models here to avoid circular imports
+    from models.tenant import Tenant
+    from models.revoked_token import RevokedToken
+    
+    tables = [db.metadata.tables[name] for name in MASTER_TABLES]
+    with db.engine.begin() as conn:
+        conn = conn.execution_options(schema_translate_map={None: 'public'})
+        db.metadata.create_all(bind=conn, tables=tables)
+        for table in tables:
+            add_missing_columns(conn, table, table.schema or 'public')
+
+
+def add_missing_columns(conn, table, schema_name):
+    """
+    Add columns defined on a model but missing from an existing table
+    
+    New columns must be nullable or carry a server_default so existing
+    rows stay valid; COLUMN_BACKFILLS can then fill in real values.
+    
+    Args:
+        conn: Connection to run the DDL on
+        table: SQLAlchemy Table to compare against the database
+        schema_name: Schema holding the existing table
+    """
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name, schema=schema_name)}
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {schema_name}.{table.name} ADD COLUMN IF NOT EXISTS {ddl}"))
+            backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+            if backfill:
+                conn.execute(text(backfill.format(schema=schema_name)))
+
+
 def delete_tenant_schema(schema_name):
     """
     Delete a tenant schema and all its data
@@ -48,11 +139,10 @@ def delete_tenant_schema(schema_name):
     """
     try:
         # Drop schema and all objects in it
-        db.session.execute(text(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE"))
-        db.session.commit()
+        with engine_for_schema(schema_name).begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE"))
         return True
     except Exception as e:
-        db.session.rollback()
         raise Exception(f'Failed to delete tenant schema: {str(e)}')
 
 
@@ -66,11 +156,12 @@ def schema_exists(schema_name):
     Returns:
         bool: True if schema exists
     """
-    result = db.session.execute(
-        text("SELECT schema_name FROM information_schema.schemata WHERE schema_name = :schema"),
-        {'schema': schema_name}
-    )
-    return result.fetchone() is not None
+    with engine_for_schema(schema_name).connect() as conn:
+        result = conn.execute(
+            text("SELECT schema_name FROM information_schema.schemata WHERE schema_name = :schema"),
+            {'schema': schema_name}
+        )
+        return result.fetchone() is not None
 
 
 def get_tenant_stats(schema_name):
@@ -84,9 +175,8 @@ def get_tenant_stats(schema_name):
         dict: Statistics including user count, project count, task count
     """
     try:
-        # Set search_path to tenant schema
-        db.session.execute(text(f"SET search_path TO {schema_name}, public"))
-        db.session.commit()
+        # Point queries at the tenant schema
+        use_schema(schema_name)
         
         # Import models
         from models.user import User
@@ -101,11 +191,9 @@ def get_tenant_stats(schema_name):
             'active_tasks': Task.query.filter_by(completed=False).count()
         }
         
-        # Reset search_path
-        db.session.execute(text("SET search_path TO public"))
-        db.session.commit()
-        
         return stats
     except Exception as e:
         db.session.rollback()
         return {'error': str(e)}
+    finally:
+        use_schema(None)
@@ -0,0 +1,237 @@
+"""Live board change events over PostgreSQL LISTEN/NOTIFY"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+from models import db
+from middleware.tenant_middleware import get_current_tenant
+from utils.shards import shard_engine, shard_names
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+def publish_change(project_id, entity, op, entity_id, data=None):
+    """
+    Record a board change in the change log and notify live listeners
+
+    The change log row and the NOTIFY are issued in a single statement on
+    the current transaction, so both only become visible once the
+    surrounding db.session.commit() succeeds. Call this before committing.
+
+    Args:
+        project_id: Project (board) the change belongs to
+        entity: Entity type ('project', 'list', 'task', 'comment', 'member')
+        op: Operation ('created', 'updated', 'deleted')
+        entity_id: Primary key of the changed entity
+        data: Optional serialized entity; dropped if it would not fit in NOTIFY
+
+    Returns:
+        int: Change log cursor of the recorded change, or None outside a tenant
+    """
+    tenant = get_current_tenant()
+    if tenant is None:
+        return None
+
+    event = {
+        's': tenant.schema_name,
+        'p': project_id,
+        'e': entity,
+        'o': op,
+        'id': entity_id,
+    }
+    payload = json.dumps(dict(event, d=data), separators=(',', ':'), default=str)
+    if data is None or len(payload.encode('utf-8')) > MAX_NOTIFY_PAYLOAD:
+        # Clients refetch the entity when no data is attached
+        payload = json.dumps(event, separators=(',', ':'))
+
+    return db.session.execute(
+        text("""
+            WITH change AS (
+                INSERT INTO change_log (project_id, entity, entity_id, op, created_at)
+                VALUES (:project_id, :entity, :entity_id, :op, :created_at)
+                RETURNING id
+            )
+            SELECT change.id, pg_notify(
+                :channel,
+                CAST(jsonb_set(CAST(:payload AS jsonb), '{c}', to_jsonb(change.id)) AS text)
+            )
+            FROM change
+        """),
+        {
+            'project_id': project_id,
+            'entity': entity,
+            'entity_id': entity_id,
+            'op': op,
+            'created_at': datetime.utcnow(),
+            'channel': current_app.config['BOARD_EVENTS_CHANNEL'],
+            'payload': payload,
+        }
+    ).scalar()
+
+
+class Subscription:
+    """A single SSE client waiting for events on one board"""
+
+    def __init__(self, key, maxsize):
+        self.key = key
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop events and ask it to resync from the server
+            self.overflowed = True
+
+    def get(self, timeout):
+        if self.overflowed:
+            self.overflowed = False
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            return {'entity': 'board', 'op': 'resync', 'id': self.key[1]}
+        return self.queue.get(timeout=timeout)
+
+
+class BoardEventListener:
+    """
+    Per-worker LISTEN connection fanning board events out to SSE subscribers
+
+    One dedicated database connection per shard in each worker process
+    listens on the events channel; subscribers only hold an in-memory queue,
+    never a pooled connection.
+    """
+
+    def __init__(self, app=None):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self.channel = None
+        self.queue_size = 100
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize listener with Flask app"""
+        self.channel = app.config['BOARD_EVENTS_CHANNEL']
+        self.queue_size = app.config['BOARD_EVENTS_QUEUE_SIZE']
+        app.extensions['board_events'] = self
+
+    def subscribe(self, schema_name, project_id, limit=None):
+        """
+        Register a subscriber for a board and make sure the listener runs
+
+        Args:
+            schema_name: Tenant schema of the board
+            project_id: Board to follow
+            limit: Most subscribers this worker may hold, if any
+
+        Returns:
+            Subscription, or None if `limit` subscribers are connected
+        """
+        subscription = Subscription((schema_name, project_id), self.queue_size)
+        with self._lock:
+            if limit is not None and sum(len(subs) for subs in self._subscribers.values()) >= limit:
+                return None
+            self._subscribers[subscription.key].add(subscription)
+            self._ensure_running()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscriber"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def subscriber_count(self):
+        """Number of connected SSE clients in this worker"""
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def _ensure_running(self):
+        # Threads do not survive fork, so start them lazily in each worker
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        self._pid = os.getpid()
+        # Notifications are delivered by the shard that committed the change
+        self._threads = [
+            threading.Thread(target=self._run, args=(shard_engine(shard),),
+                             name=f'board-events-{shard}', daemon=True)
+            for shard in shard_names()
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self, engine):
+        while True:
+            try:
+                self._listen(engine)
+            except Exception as e:
+                logger.warning('Board event listener failed, reconnecting: %s', e)
+                threading.Event().wait(1.0)
+
+    def _listen(self, engine):
+        # Detach the connection so it never goes back into the pool
+        raw = engine.raw_connection()
+        raw.detach()
+        conn = raw.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+
+            while True:
+                readable, _, _ = select.select([conn], [], [], 5.0)
+                if not readable:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._dispatch(conn.notifies.pop(0).payload)
+        finally:
+            raw.close()
+
+    def _dispatch(self, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+
+        key = (event.get('s'), event.get('p'))
+        message = {
+            'cursor': event.get('c'),
+            'entity': event.get('e'),
+            'op': event.get('o'),
+            'id': event.get('id'),
+            'data': event.get('d'),
+        }
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+
+board_events = BoardEventListener()
+
+
+def format_sse(event, event_id=None):
+    """Encode an event as a text/event-stream frame"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('event: change')
+    lines.append('data: ' + json.dumps(event, separators=(',', ':'), default=str))
+    return '\n'.join(lines) + '\n\n'
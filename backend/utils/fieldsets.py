@@ -0,0 +1,127 @@
+"""Sparse fieldsets: ?fields=id,name,lists(id,name),tasks(id,title,position)"""
+from flask import request
+from models.task import TASK_FIELDS
+
+USER_FIELDS = ['id', 'first_name', 'last_name', 'full_name', 'role', 'is_active',
+               'created_at', 'last_login']
+
+# Selectable fields of each resource type on the board read endpoints
+RESOURCE_FIELDS = {
+    'projects': ['id', 'name', 'description', 'owner_id', 'owner', 'is_archived', 'color',
+                 'created_at', 'updated_at', 'members', 'lists'],
+    'lists': ['id', 'name', 'project_id', 'position', 'created_at', 'updated_at', 'tasks'],
+    'tasks': TASK_FIELDS + ['comments'],
+    'members': USER_FIELDS,
+    'comments': ['id', 'content', 'task_id', 'user_id', 'user', 'created_at', 'updated_at'],
+}
+
+
+class FieldsetError(ValueError):
+    """Raised for a malformed ?fields= value or an unknown field"""
+
+
+class Fieldsets:
+    """
+    Requested fields per resource type
+
+    Bare names apply to the endpoint's primary type; `type(a,b)` selects
+    fields of a nested type and may itself nest, e.g.
+    `lists(id,tasks(id,title))`. Types without bare fields keep all their
+    fields. A nested collection is included when its parent keeps all
+    fields, names it as a bare field, or has a `type(...)` selection.
+    """
+
+    def __init__(self, primary, selected=None):
+        self.primary = primary
+        self.selected = selected or {}
+
+    def get(self, resource_type):
+        """Get the requested field names of a type in request order, or None for all"""
+        return self.selected.get(resource_type) or None
+
+    def includes(self, resource_type, collection):
+        """Check whether a nested collection should be serialized"""
+        fields = self.get(resource_type)
+        return fields is None or collection in fields or collection in self.selected
+
+    def validate(self, allowed):
+        """
+        Check requested fields against the known fields of each type
+
+        Args:
+            allowed: {type: iterable of field names}
+
+        Raises:
+            FieldsetError: If a type or field is unknown
+        """
+        for resource_type, fields in self.selected.items():
+            if resource_type not in allowed:
+                raise FieldsetError(f'Unknown resource in fields: {resource_type}')
+            unknown = [field for field in fields if field not in allowed[resource_type]]
+            if unknown:
+                raise FieldsetError(f'Unknown fields for {resource_type}: {", ".join(unknown)}')
+        return self
+
+    def filter(self, resource_type, data):
+        """Keep only the requested keys of an already serialized dict"""
+        fields = self.get(resource_type)
+        if fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in fields or key in self.selected}
+
+
+def parse_fields(value, primary):
+    """
+    Parse a ?fields= value
+
+    Args:
+        value: Raw parameter, e.g. 'id,name,tasks(id,title)'
+        primary: Resource type bare names belong to
+
+    Returns:
+        Fieldsets: Parsed selection (selects everything if value is empty)
+
+    Raises:
+        FieldsetError: If parentheses are unbalanced or a name is empty
+    """
+    selected = {}
+    stack = [primary]
+    name = ''
+    for char in (value or '') + ',':
+        if char == '(':
+            if not name.strip():
+                raise FieldsetError('Missing resource name before "("')
+            stack.append(name.strip())
+            selected.setdefault(name.strip(), [])
+            name = ''
+        elif char in ',)':
+            if name.strip():
+                _add(selected, stack[-1], name.strip())
+            name = ''
+            if char == ')':
+                if len(stack) == 1:
+                    raise FieldsetError('Unbalanced ")" in fields')
+                stack.pop()
+        elif char.isalnum() or char == '_' or char.isspace():
+            name += char
+        else:
+            raise FieldsetError(f'Invalid character in fields: {char!r}')
+    if len(stack) != 1:
+        raise FieldsetError('Unbalanced "(" in fields')
+    return Fieldsets(primary, selected)
+
+
+def _add(selected, resource_type, field):
+    fields = selected.setdefault(resource_type, [])
+    if field not in fields:
+        fields.append(field)
+
+
+def request_fieldsets(primary):
+    """
+    Parse and validate ?fields= for the current request
+
+    Raises:
+        FieldsetError: Rendered as 400 by the app's error handler
+    """
+    return parse_fields(request.args.get('fields'), primary).validate(RESOURCE_FIELDS)
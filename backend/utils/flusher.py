@@ -0,0 +1,102 @@
+"""Background batching for writes that don't need to happen inside a request"""
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """
+    Base class for in-process buffers drained by a background thread
+
+    Subclasses keep their own buffer and implement _drain() and _write().
+    The thread flushes every `interval` seconds, sooner when request_flush()
+    is called, and once more at interpreter shutdown. It is started lazily
+    in each worker process, so it is safe with forking servers.
+    """
+
+    name = 'flusher'
+
+    def __init__(self):
+        self.app = None
+        self.interval = 1.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app, interval):
+        """Initialize flusher with Flask app"""
+        self.app = app
+        self.interval = interval
+        app.extensions[self.name] = self
+
+    def request_flush(self):
+        """Wake the background thread to flush now"""
+        self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far; safe to call from any thread"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._drain()
+            if not batch:
+                return 0
+            try:
+                with self.app.app_context():
+                    written, failed = self._write(batch)
+            except Exception as e:
+                logger.warning('%s flush failed: %s', self.name, e)
+                with self._lock:
+                    self._restore(batch)
+                return 0
+            if failed:
+                with self._lock:
+                    self._restore(failed)
+            return written
+
+    def _ensure_running(self):
+        """Start the flush thread in this process; call with self._lock held"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            # Forked child: the parent owns whatever it had buffered
+            self._reset()
+        else:
+            atexit.register(self.flush)
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _drain(self):
+        """Remove and return the buffered batch; called with self._lock held"""
+        raise NotImplementedError
+
+    def _write(self, batch):
+        """
+        Persist a drained batch; called inside an app context
+
+        Writes spread over several transactions (one per shard) must not
+        raise once one of them has committed; they return the part of the
+        batch that did not commit instead, and only that part is restored.
+        Raising restores the whole batch.
+
+        Returns:
+            tuple: (items written, sub-batch to restore or None)
+        """
+        raise NotImplementedError
+
+    def _restore(self, batch):
+        """Put a batch back after a failed write; called with self._lock held"""
+
+    def _reset(self):
+        """Discard state inherited from a parent process"""
@@ -0,0 +1,236 @@
+"""In-process metric registry with Prometheus text exposition"""
+import json
+import math
+import os
+import threading
+
+OTHER_TENANT = 'other'
+
+# Upper bounds of the histogram buckets, per histogram
+HISTOGRAM_BUCKETS = {
+    'http_request_duration_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'http_response_size_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+}
+
+METRIC_HELP = {
+    'http_requests_total': ('counter', 'Requests served'),
+    'http_request_duration_seconds': ('histogram', 'Request latency including streamed bodies'),
+    'http_response_size_bytes': ('histogram', 'Response body size as sent'),
+    'db_statements_total': ('counter', 'SQL statements executed by requests'),
+    'db_statement_seconds_total': ('counter', 'Time spent in SQL statements by requests'),
+    'db_query_guard_violations_total': ('counter', 'Sampled requests over their query budget or repeating a query'),
+    'board_reads_total': ('counter', 'Full board loads, computed or coalesced onto a concurrent identical load'),
+}
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed by metric name and label values
+
+    At most `max_tenants` distinct tenants get their own label in this
+    process; later ones are counted as 'other'.
+    """
+
+    def __init__(self, max_tenants=20):
+        self.max_tenants = max_tenants
+        self.counters = {}
+        self.histograms = {}
+        self._tenants = set()
+        self._lock = threading.Lock()
+
+    def tenant_label(self, tenant):
+        """Get the label for a tenant, keeping the number of tenant labels bounded"""
+        if tenant in self._tenants:
+            return tenant
+        with self._lock:
+            if len(self._tenants) < self.max_tenants:
+                self._tenants.add(tenant)
+                return tenant
+        return OTHER_TENANT
+
+    def inc(self, name, labels, value=1):
+        """Add to a counter"""
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """Record a value in a histogram (buckets from HISTOGRAM_BUCKETS)"""
+        buckets = HISTOGRAM_BUCKETS[name]
+        key = (name, labels)
+        with self._lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        """Get a JSON-serializable copy of all series"""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value]
+                             for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(series)]
+                               for (name, labels), series in self.histograms.items()]
+            }
+
+
+def merge_snapshots(snapshots, max_tenants):
+    """
+    Sum snapshots (e.g. of several workers) and bound tenant labels
+
+    Only the `max_tenants` tenants with the most requests keep their own
+    label; the rest are folded into 'other'.
+
+    Returns:
+        tuple: (counters, histograms) keyed by (name, labels)
+    """
+    totals = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            if name == 'http_requests_total':
+                tenant = dict(map(tuple, labels)).get('tenant')
+                totals[tenant] = totals.get(tenant, 0) + value
+    ranked = sorted((t for t in totals if t != OTHER_TENANT), key=lambda t: (-totals[t], t))
+    kept = set(ranked[:max_tenants])
+
+    def relabel(labels):
+        return tuple((key, value if key != 'tenant' or value in kept else OTHER_TENANT)
+                     for key, value in labels)
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, relabel(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot['histograms']:
+            key = (name, relabel(labels))
+            merged = histograms.get(key)
+            histograms[key] = list(series) if merged is None else \
+                [a + b for a, b in zip(merged, series)]
+    return counters, histograms
+
+
+def render_prometheus(counters, histograms):
+    """Render merged series in the Prometheus text format (version 0.0.4)"""
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+    for name in names:
+        kind, help_text = METRIC_HELP.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(HISTOGRAM_BUCKETS[name], series):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {series[-1]}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(series[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {series[-1]}')
+        else:
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, float) and (math.isinf(value) or value != int(value)):
+        return repr(value)
+    return str(int(value))
+
+
+def snapshot_path(directory, pid):
+    """Get the snapshot file of a worker process"""
+    return os.path.join(directory, f'metrics-{pid}.json')
+
+
+def write_snapshot(directory, snapshot, path=None):
+    """Atomically write this process's snapshot so other workers can serve it"""
+    path = path or snapshot_path(directory, os.getpid())
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def read_snapshots(directory, exclude_pid=None):
+    """Read the snapshots of all workers (except one), skipping unreadable files"""
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        if exclude_pid is not None and filename == f'metrics-{exclude_pid}.json':
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def retire_snapshot(directory, pid):
+    """
+    Fold an exited worker's snapshot into the dead-workers aggregate
+
+    Counters must never go down, so an exited worker's series are added
+    to metrics-dead.json (served like any other snapshot) before its own
+    file is removed. Call from the gunicorn master only.
+    """
+    path = snapshot_path(directory, pid)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError):
+        snapshot = None
+
+    if snapshot is not None:
+        dead_path = snapshot_path(directory, 'dead')
+        try:
+            with open(dead_path) as f:
+                dead = json.load(f)
+        except (OSError, ValueError):
+            dead = {'counters': [], 'histograms': []}
+        write_snapshot(directory, add_snapshots(dead, snapshot), dead_path)
+    os.remove(path)
+
+
+def add_snapshots(a, b):
+    """Sum two snapshots series by series, keeping every label as is"""
+    counters, histograms = {}, {}
+    for snapshot in (a, b):
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            histograms[key] = list(series) if merged is None else [x + y for x, y in zip(merged, series)]
+    return {
+        'counters': [[name, [list(label) for label in labels], value]
+                     for (name, labels), value in counters.items()],
+        'histograms': [[name, [list(label) for label in labels], series]
+                       for (name, labels), series in histograms.items()]
+    }
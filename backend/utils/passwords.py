@@ -0,0 +1,106 @@
+"""Password hashing service with bounded, off-request-thread CPU use"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash operations are already in flight"""
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with tunable cost and bounded concurrency
+
+    Hashing runs in a small process pool so it does not hold the GIL of the
+    worker serving other requests, and a semaphore caps how many request
+    threads may wait on it at once. Requests over the cap fail fast with
+    PasswordHasherBusy (503) instead of queueing behind a login burst.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.salt_length = 16
+        self.pool_size = 0
+        self.max_concurrent = 4
+        self.wait_seconds = 2.0
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize hasher with Flask app"""
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_HASH_SALT_LENGTH']
+        self.pool_size = app.config['PASSWORD_HASH_POOL_SIZE']
+        self.max_concurrent = app.config['PASSWORD_HASH_MAX_CONCURRENT']
+        self.wait_seconds = app.config['PASSWORD_HASH_WAIT_SECONDS']
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+        self._method_prefix = None
+        app.extensions['password_hasher'] = self
+        app.register_error_handler(PasswordHasherBusy, self._busy_response)
+
+    def hash(self, password):
+        """Hash a password with the configured method and cost"""
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Check whether a stored hash uses a different method or cost"""
+        return pwhash.split('$', 1)[0] != self.method_prefix()
+
+    def method_prefix(self):
+        """Get the method string Werkzeug stores for the configured method"""
+        if self._method_prefix is None:
+            # 'scrypt' is stored as 'scrypt:32768:8:1', so normalize once
+            sample = generate_password_hash('', self.method, self.salt_length)
+            self._method_prefix = sample.split('$', 1)[0]
+        return self._method_prefix
+
+    def _run(self, fn, *args):
+        if not self._semaphore.acquire(timeout=self.wait_seconds):
+            raise PasswordHasherBusy()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return fn(*args)
+            try:
+                return executor.submit(fn, *args).result(timeout=self.wait_seconds + 30)
+            except FutureTimeoutError:
+                raise PasswordHasherBusy()
+        finally:
+            self._semaphore.release()
+
+    def _get_executor(self):
+        if self.pool_size <= 0:
+            return None
+        with self._lock:
+            # Pools do not survive fork; create one per worker process
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    # Forking a threaded worker is unsafe, so start clean processes
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _busy_response(self, error):
+        response = jsonify({'error': 'Too many concurrent logins, please retry'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,60 @@
+"""Connection pool warmup and statistics"""
+import logging
+from models import db
+
+logger = logging.getLogger(__name__)
+
+_warmed = {'connections': 0}
+
+
+def warm_pool(count):
+    """
+    Open pool connections ahead of the first requests
+
+    Connections are checked out together so the pool really holds `count`
+    of them afterwards, then returned.
+
+    Args:
+        count: Number of connections to open (capped at the pool size)
+
+    Returns:
+        int: Number of connections opened
+    """
+    pool = db.engine.pool
+    if hasattr(pool, 'size'):
+        count = min(count, pool.size())
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(db.engine.connect())
+    except Exception as e:
+        logger.warning('Connection pool warmup stopped early: %s', e)
+    finally:
+        for conn in connections:
+            conn.close()
+    _warmed['connections'] = len(connections)
+    return len(connections)
+
+
+def pool_status():
+    """
+    Get checkout counts for this worker's connection pool
+
+    Returns:
+        dict: Pool size and capacity, checked-in, checked-out and overflow counts
+    """
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return {'class': type(pool).__name__}
+    # A negative max_overflow means the pool can grow without limit
+    max_overflow = getattr(pool, '_max_overflow', -1)
+    return {
+        'class': type(pool).__name__,
+        'size': pool.size(),
+        'capacity': pool.size() + max_overflow if max_overflow >= 0 else None,
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        # QueuePool counts overflow from -size upwards
+        'overflow': max(0, pool.overflow()),
+        'warmed': _warmed['connections']
+    }
@@ -0,0 +1,202 @@
+"""Deep readiness checks for load balancer health probes"""
+import logging
+import threading
+import time
+from sqlalchemy import text
+from models import db
+from middleware.replica import replica_router
+from middleware.tenant_middleware import tenant_cache_size
+from utils.circuit_breaker import tenant_breakers
+from utils.pool import pool_status
+from utils.revocation import revocation_store
+
+logger = logging.getLogger(__name__)
+
+READY = 'ready'
+DEGRADED = 'degraded'
+UNREADY = 'unready'
+
+
+class DatabaseProbe:
+    """
+    Times a SELECT 1 round trip, cached for `ttl` seconds
+
+    Only one thread probes at a time; the others answer with the last
+    result, so a load balancer polling every worker thread never queues
+    more than one connection checkout.
+    """
+
+    def __init__(self, ttl=2.0, timeout_ms=1000):
+        self.ttl = ttl
+        self.timeout_ms = timeout_ms
+        self.result = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def check(self, engine):
+        """
+        Get the cached probe result, probing again once it is stale
+
+        Returns:
+            dict: ok, latency_ms, error and age_seconds, or None before
+            the first probe finishes
+        """
+        now = time.monotonic()
+        stale = self._checked is None or now - self._checked >= self.ttl
+        if stale and self._lock.acquire(blocking=False):
+            try:
+                self.result = self._probe(engine)
+                self._checked = time.monotonic()
+            finally:
+                self._lock.release()
+        return self.last()
+
+    def last(self):
+        """Get the last probe result without probing"""
+        if self.result is None:
+            return None
+        return dict(self.result, age_seconds=round(time.monotonic() - self._checked, 2))
+
+    def _probe(self, engine):
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                with conn.begin():
+                    if engine.dialect.name == 'postgresql':
+                        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(self.timeout_ms)}')
+                    conn.execute(text('SELECT 1'))
+            error = None
+        except Exception as e:
+            logger.warning('Readiness database probe failed: %s', e)
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        return {
+            'ok': error is None,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            'error': error
+        }
+
+
+def pool_saturation(pool):
+    """
+    Get the share of the pool's capacity checked out
+
+    Args:
+        pool: pool_status() dict
+
+    Returns:
+        float: 0.0-1.0, or None for pools without a fixed capacity
+    """
+    capacity = pool.get('capacity')
+    if not capacity:
+        return None
+    return min(1.0, pool['checked_out'] / capacity)
+
+
+def evaluate(database, pool, warmth, thresholds, open_breakers=0, replica_healthy=True):
+    """
+    Decide readiness from the individual checks
+
+    Args:
+        database: DatabaseProbe.check() result (None if not probed)
+        pool: pool_status() dict
+        warmth: Dict of component name -> bool (loaded at least once)
+        thresholds: Dict with db_slow_ms, pool_degraded and pool_unready
+        open_breakers: Number of open tenant circuit breakers
+        replica_healthy: False if a configured read replica lags or is down
+
+    Returns:
+        tuple: (status, reasons)
+    """
+    unready, degraded = [], []
+
+    saturation = pool_saturation(pool)
+    if saturation is not None and saturation >= thresholds['pool_unready']:
+        unready.append(f"connection pool saturated ({pool['checked_out']}/{pool['capacity']} checked out)")
+    elif saturation is not None and saturation >= thresholds['pool_degraded']:
+        degraded.append(f"connection pool {saturation:.0%} checked out")
+
+    if database is None:
+        unready.append('database not probed yet')
+    elif not database['ok']:
+        unready.append(f"database unreachable: {database['error']}")
+    elif database['latency_ms'] >= thresholds['db_slow_ms']:
+        degraded.append(f"database round trip {database['latency_ms']} ms")
+
+    degraded += [f'{name} not warm' for name, warm in warmth.items() if not warm]
+    if open_breakers:
+        degraded.append(f'{open_breakers} tenant circuit breakers open')
+    if not replica_healthy:
+        degraded.append('read replica unhealthy')
+
+    if unready:
+        return UNREADY, unready + degraded
+    return (DEGRADED if degraded else READY), degraded
+
+
+class ReadinessCheck:
+    """
+    Combines database, pool and warm-cache checks into one verdict
+
+    `unready` (503) means the load balancer should stop sending this
+    worker traffic: the primary is unreachable or every pooled connection
+    is checked out, so new requests would wait for pool_timeout.
+    `degraded` (200) flags slow round trips, a nearly full pool, open
+    tenant circuit breakers, an unhealthy replica or caches that have not
+    been loaded yet.
+    """
+
+    def __init__(self, app=None):
+        self.probe = DatabaseProbe()
+        self.thresholds = {'db_slow_ms': 100, 'pool_degraded': 0.8, 'pool_unready': 1.0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize readiness checks with Flask app"""
+        self.probe = DatabaseProbe(app.config['READINESS_PROBE_SECONDS'],
+                                   app.config['READINESS_DB_TIMEOUT_MS'])
+        self.thresholds = {
+            'db_slow_ms': app.config['READINESS_DB_SLOW_MS'],
+            'pool_degraded': app.config['READINESS_POOL_DEGRADED'],
+            'pool_unready': app.config['READINESS_POOL_UNREADY'],
+        }
+        app.extensions['readiness'] = self
+
+    def check(self):
+        """
+        Run the checks for this worker
+
+        Returns:
+            dict: status, reasons and the details behind them
+        """
+        pool = pool_status()
+        saturation = pool_saturation(pool)
+        if saturation is not None and saturation >= self.thresholds['pool_unready']:
+            # Probing would queue for a connection too
+            database = self.probe.last()
+        else:
+            database = self.probe.check(db.engine)
+
+        warmth = {
+            'token revocations': revocation_store.is_warm(),
+            'tenant cache': tenant_cache_size() > 0,
+        }
+        if 'checked_in' in pool:
+            warmth['connection pool'] = pool['warmed'] > 0 or pool['checked_in'] > 0
+        breakers = tenant_breakers.stats()
+        replica = replica_router.stats()
+        status, reasons = evaluate(database, pool, warmth, self.thresholds, breakers['open'],
+                                   replica['healthy'] or not replica['enabled'])
+
+        return {
+            'status': status,
+            'reasons': reasons,
+            'database': database,
+            'pool': dict(pool, saturation=round(saturation, 2) if saturation is not None else None),
+            'warm': warmth,
+            'circuit_breakers': breakers,
+            'replica': replica
+        }
+
+
+readiness = ReadinessCheck()
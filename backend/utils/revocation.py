@@ -0,0 +1,129 @@
+"""Token revocation with an in-memory set synced through the master database"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from models import db
+from models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationStore:
+    """
+    Answers "is this token revoked?" from memory
+
+    Revocations are written to the shared revoked_tokens table and kept in
+    a per-worker dict of jti -> expiry. Each worker pulls rows newer than
+    its id watermark at most every `sync_interval` seconds, so the check on
+    every @jwt_required() call is a dict lookup, not a query. Entries are
+    dropped once the token would have expired anyway.
+    """
+
+    def __init__(self, app=None, jwt=None):
+        self.sync_interval = 2.0
+        self._revoked = {}
+        self._watermark = 0
+        self._last_sync = None
+        self._last_sync_at = None
+        self._last_attempt = None
+        self._sync_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, jwt)
+
+    def init_app(self, app, jwt):
+        """Initialize store with Flask app and hook the JWT blocklist check"""
+        self.sync_interval = app.config['TOKEN_REVOCATION_SYNC_SECONDS']
+        app.extensions['token_revocation'] = self
+        jwt.token_in_blocklist_loader(self._check_token)
+
+    def _check_token(self, jwt_header, jwt_payload):
+        return self.is_revoked(jwt_payload['jti'])
+
+    def is_revoked(self, jti):
+        """Check a token id against the local revocation set"""
+        self._maybe_sync()
+        return jti in self._revoked
+
+    def revoke(self, jti, expires_at):
+        """
+        Revoke a token for every worker
+
+        Args:
+            jti: Token id claim
+            expires_at: Token expiry as a UTC datetime
+        """
+        with db.engine.begin() as conn:
+            # Logging out twice (or from two tabs) revokes the same jti again
+            conn.execute(
+                insert(RevokedToken.__table__)
+                .values(jti=jti, expires_at=expires_at, revoked_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=['jti'])
+            )
+        self._revoked[jti] = expires_at
+
+    def is_warm(self):
+        """Check whether this worker has loaded revocations at least once"""
+        return self._last_sync is not None
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if self._last_attempt is not None and now - self._last_attempt < self.sync_interval:
+            return
+        # Only one thread syncs; the others keep answering from memory
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            # Failed syncs wait out the interval too, so an unreachable
+            # database is not queried on every request
+            self._last_attempt = now
+            self.sync()
+        except Exception as e:
+            logger.warning('Token revocation sync failed: %s', e)
+        finally:
+            self._sync_lock.release()
+
+    def sync(self):
+        """Pull revocations newer than the watermark and drop expired ones"""
+        started_at = datetime.utcnow()
+        table = RevokedToken.__table__
+        query = select(table.c.id, table.c.jti, table.c.expires_at).where(
+            table.c.expires_at > started_at
+        )
+        if self._last_sync_at is not None:
+            # Sequence values can commit out of order, so also re-read a
+            # short window of recent revocations below the watermark
+            query = query.where(or_(
+                table.c.id > self._watermark,
+                table.c.revoked_at > self._last_sync_at - timedelta(seconds=self.sync_interval * 5)
+            ))
+
+        with db.engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+
+        revoked = {jti: exp for jti, exp in self._revoked.items() if exp > started_at}
+        for row in rows:
+            revoked[row.jti] = row.expires_at
+            self._watermark = max(self._watermark, row.id)
+        self._revoked = revoked
+        self._last_sync = time.monotonic()
+        self._last_sync_at = started_at
+
+
+revocation_store = RevocationStore()
+
+
+def prune_revoked_tokens():
+    """
+    Delete revocations for tokens that have expired anyway
+
+    Returns:
+        int: Number of rows deleted
+    """
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            delete(RevokedToken.__table__).where(RevokedToken.expires_at <= datetime.utcnow())
+        )
+    return result.rowcount
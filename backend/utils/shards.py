@@ -0,0 +1,157 @@
+"""Tenant shard map: which database cluster hosts each tenant schema"""
+import threading
+from flask import current_app
+from sqlalchemy import func, select, text
+from models import db
+
+# Shard living in the master database (SQLALCHEMY_DATABASE_URI)
+DEFAULT_SHARD = 'default'
+
+# Schema name -> shard, filled from tenant lookups; shards rarely change
+_schema_shards = {}
+_schema_shards_lock = threading.Lock()
+
+
+def shard_bind_key(shard):
+    """Get the Flask-SQLAlchemy bind key of a shard (None for the master)"""
+    return None if not shard or shard == DEFAULT_SHARD else f'shard:{shard}'
+
+
+def shard_names():
+    """Get all configured shard names, the master database first"""
+    return [DEFAULT_SHARD] + sorted(current_app.config['SHARD_DATABASE_URLS'])
+
+
+def shard_engine(shard):
+    """
+    Get the engine of a shard
+
+    Raises:
+        ValueError: If the shard is not configured
+    """
+    try:
+        return db.engines[shard_bind_key(shard)]
+    except KeyError:
+        raise ValueError(f'Unknown shard: {shard}')
+
+
+def remember_shard(schema_name, shard):
+    """Record where a tenant schema lives so later lookups need no query"""
+    shard = shard or DEFAULT_SHARD
+    if _schema_shards.get(schema_name) != shard:
+        with _schema_shards_lock:
+            _schema_shards[schema_name] = shard
+
+
+def forget_shard(schema_name):
+    """Drop a cached schema placement (tenant deleted)"""
+    with _schema_shards_lock:
+        _schema_shards.pop(schema_name, None)
+
+
+def shard_for_schema(schema_name):
+    """
+    Get the shard hosting a tenant schema
+
+    Args:
+        schema_name: Tenant schema name
+
+    Returns:
+        str: Shard name (DEFAULT_SHARD if the tenant is unknown)
+    """
+    shard = _schema_shards.get(schema_name)
+    if shard is None:
+        from models.tenant import Tenant
+
+        with db.engines[None].connect() as conn:
+            shard = conn.execute(
+                select(Tenant.shard).where(Tenant.schema_name == schema_name)
+            ).scalar()
+        remember_shard(schema_name, shard)
+        shard = shard or DEFAULT_SHARD
+    return shard
+
+
+def engine_for_schema(schema_name):
+    """Get the engine of the shard hosting a tenant schema"""
+    return shard_engine(shard_for_schema(schema_name))
+
+
+def group_by_engine(schema_names):
+    """
+    Group tenant schemas by the engine hosting them
+
+    Returns:
+        dict: {engine: [schema_name, ...]}
+    """
+    groups = {}
+    for schema_name in schema_names:
+        groups.setdefault(engine_for_schema(schema_name), []).append(schema_name)
+    return groups
+
+
+def shard_tenant_counts():
+    """Count active tenants per configured shard"""
+    from models.tenant import Tenant
+
+    counts = dict.fromkeys(shard_names(), 0)
+    rows = db.session.execute(
+        select(Tenant.shard, func.count(Tenant.id))
+        .where(Tenant.is_active.is_(True))
+        .group_by(Tenant.shard)
+    ).all()
+    for shard, count in rows:
+        counts[shard or DEFAULT_SHARD] = count
+    return counts
+
+
+def choose_shard():
+    """
+    Pick the shard for a new tenant
+
+    Places tenants on the shard with the fewest active tenants among those
+    in SHARDS_ACCEPTING_TENANTS (all shards if unset).
+
+    Returns:
+        str: Shard name
+    """
+    counts = shard_tenant_counts()
+    accepting = current_app.config['SHARDS_ACCEPTING_TENANTS'] or list(counts)
+    candidates = [shard for shard in counts if shard in accepting] or list(counts)
+    return min(candidates, key=lambda shard: (counts[shard], shard))
+
+
+def shard_stats():
+    """
+    Get tenant counts and on-disk sizes per shard
+
+    Returns:
+        list: One dict per shard with tenant count, tenant schema bytes and
+        total database bytes (None if the shard is unreachable)
+    """
+    from models.tenant import Tenant
+
+    tenants = db.session.execute(select(Tenant.shard, Tenant.schema_name)).all()
+    schemas = {}
+    for shard, schema_name in tenants:
+        schemas.setdefault(shard or DEFAULT_SHARD, []).append(schema_name)
+
+    stats = []
+    for shard in shard_names():
+        entry = {'shard': shard, 'tenants': len(schemas.get(shard, [])),
+                 'schema_bytes': None, 'database_bytes': None}
+        try:
+            with shard_engine(shard).connect() as conn:
+                entry['database_bytes'] = conn.execute(
+                    text('SELECT pg_database_size(current_database())')
+                ).scalar()
+                entry['schema_bytes'] = conn.execute(text("""
+                    SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0)
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = ANY(:schemas) AND c.relkind IN ('r', 'p')
+                """), {'schemas': schemas.get(shard, [])}).scalar()
+        except Exception as e:
+            entry['error'] = str(e)
+        stats.append(entry)
+    return stats
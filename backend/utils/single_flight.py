@@ -0,0 +1,64 @@
+"""In-process single-flight coalescing of identical concurrent computations"""
+import threading
+
+
+class _Flight:
+    """One in-flight computation"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time and shares its result
+
+    Callers arriving while a computation for their key is running wait
+    for it instead of starting their own. Nothing is cached: once the
+    computation finishes, the next caller computes again. Keys must
+    capture everything the result depends on.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """
+        Get fn()'s result, sharing an in-flight computation of the same key
+
+        A waiter whose leader fails, or does not finish within `timeout`
+        seconds, computes the result itself.
+
+        Args:
+            key: Hashable key of the computation
+            fn: Function computing the result
+            timeout: Seconds to wait for an in-flight computation
+
+        Returns:
+            tuple: (result, shared), shared being True for waiters served
+            by another caller's computation
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if leader:
+            try:
+                flight.value = fn()
+            except BaseException:
+                flight.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.value, False
+
+        if flight.done.wait(timeout) and not flight.failed:
+            return flight.value, True
+        return fn(), False
@@ -0,0 +1,224 @@
+"""Slow-query log with background EXPLAIN capture for repeat offenders"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from middleware.query_guard import normalize_statement
+
+logger = logging.getLogger(__name__)
+
+# Execution option that keeps the EXPLAIN connection out of the log
+SKIP_OPTION = 'skip_slow_query_log'
+
+# Anything that writes, locks rows or has side effects when executed.
+# Matched against the normalized statement, so bound values never match.
+_UNSAFE_TO_ANALYZE = re.compile(
+    r'\b(INSERT|UPDATE|DELETE|MERGE|INTO|FOR\s+(NO\s+KEY\s+)?UPDATE|FOR\s+(KEY\s+)?SHARE'
+    r'|NEXTVAL|SETVAL|PG_NOTIFY|PG_ADVISORY\w*|LO_\w+|DBLINK\w*)\b',
+    re.IGNORECASE
+)
+
+
+def fingerprint(statement):
+    """Get a short stable id for a statement's normalized shape"""
+    return hashlib.sha1(normalize_statement(statement).encode('utf-8')).hexdigest()[:16]
+
+
+def safe_to_analyze(statement):
+    """
+    Check whether EXPLAIN ANALYZE may run a statement
+
+    ANALYZE executes the statement. The transaction is rolled back
+    afterwards, but row locks are still taken while it runs, sequences
+    still advance and NOTIFYs and other side effects are not undone. So
+    only plain SELECTs qualify: no FOR UPDATE/SHARE, no data-modifying
+    CTE and none of a few side-effecting functions.
+    """
+    shape = normalize_statement(statement)
+    return shape.upper().startswith(('SELECT', 'WITH')) and not _UNSAFE_TO_ANALYZE.search(shape)
+
+
+def redact(parameters):
+    """
+    Replace parameter values with their types so no tenant data is stored
+
+    Returns:
+        Redacted copy of a DBAPI parameter dict or sequence
+    """
+    def placeholder(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f'<{type(value).__name__}:{len(value)}>'
+        return f'<{type(value).__name__}>'
+
+    if isinstance(parameters, dict):
+        return {key: placeholder(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [placeholder(value) for value in parameters]
+    return None
+
+
+class SlowQueryLog:
+    """
+    Records statements slower than SLOW_QUERY_MS, grouped by fingerprint
+
+    Each entry keeps counts and timings per tenant schema and statement
+    shape, the routes that ran it and one redacted parameter sample. Once
+    a shape has been slow SLOW_QUERY_EXPLAIN_AFTER times, its plan is
+    captured with EXPLAIN on a separate connection by a background
+    thread, with ANALYZE and BUFFERS for plain SELECTs (see
+    safe_to_analyze()). Entries live in this
+    worker only; the least frequent are dropped past
+    SLOW_QUERY_MAX_FINGERPRINTS.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold_ms = 500
+        self.explain_after = 3
+        self.explain_timeout_ms = 10000
+        self.max_entries = 500
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize slow-query log with Flask app"""
+        self.enabled = app.config['SLOW_QUERY_ENABLED']
+        self.threshold_ms = app.config['SLOW_QUERY_MS']
+        self.explain_after = app.config['SLOW_QUERY_EXPLAIN_AFTER']
+        self.explain_timeout_ms = app.config['SLOW_QUERY_EXPLAIN_TIMEOUT_MS']
+        self.max_entries = app.config['SLOW_QUERY_MAX_FINGERPRINTS']
+        app.extensions['slow_query_log'] = self
+        if not self.enabled:
+            return
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['slow_query_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('slow_query_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < self.threshold_ms or conn.get_execution_options().get(SKIP_OPTION):
+            return
+
+        tenant = g.get('tenant') if has_app_context() else None
+        schema = tenant.schema_name if tenant is not None else None
+        route = request.endpoint if has_request_context() else None
+        self.record(conn.engine, schema, route, statement, parameters, elapsed_ms,
+                    explainable=not executemany)
+
+    def record(self, engine, schema, route, statement, parameters, elapsed_ms, explainable=True):
+        """
+        Add one slow execution and schedule an EXPLAIN for repeat offenders
+
+        Args:
+            engine: Engine the statement ran on (EXPLAIN runs there too)
+            schema: Tenant schema the statement ran in, if any
+            route: Endpoint that ran it, if any
+            statement: DBAPI statement text
+            parameters: DBAPI parameters (only kept redacted)
+            elapsed_ms: Execution time in milliseconds
+            explainable: False for executemany batches
+        """
+        key = (schema, fingerprint(statement))
+        logger.warning('Slow query (%.0f ms) in %s on %s: %s', elapsed_ms, schema or 'public',
+                       route or '-', normalize_statement(statement)[:500])
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                if len(self.entries) >= self.max_entries:
+                    rarest = min(self.entries, key=lambda k: self.entries[k]['count'])
+                    del self.entries[rarest]
+                entry = self.entries[key] = {
+                    'fingerprint': key[1],
+                    'schema': schema,
+                    'statement': normalize_statement(statement),
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'routes': {},
+                    'sample_parameters': redact(parameters),
+                    'plan': None,
+                    'plan_captured_at': None,
+                    'plan_error': None,
+                    'explaining': False,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['last_seen'] = datetime.utcnow().isoformat()
+            if route:
+                entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            explain = explainable and entry['count'] >= self.explain_after \
+                and entry['plan'] is None and entry['plan_error'] is None and not entry['explaining']
+            if explain:
+                entry['explaining'] = True
+
+        if explain:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+            self._executor.submit(self._explain, engine, key, schema, statement, parameters)
+
+    def _explain(self, engine, key, schema, statement, parameters):
+        options = 'ANALYZE, BUFFERS, FORMAT JSON' if safe_to_analyze(statement) else 'FORMAT JSON'
+        plan, error = None, None
+        try:
+            with engine.connect().execution_options(**{SKIP_OPTION: True}) as conn:
+                with conn.begin() as transaction:
+                    if schema:
+                        conn.exec_driver_sql(f'SET LOCAL search_path TO {schema}, public')
+                    conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}')
+                    plan = conn.exec_driver_sql(f'EXPLAIN ({options}) {statement}', parameters).scalar()
+                    # ANALYZE executed the statement; keep nothing it did
+                    transaction.rollback()
+        except Exception as e:
+            error = str(e)
+            logger.warning('EXPLAIN of slow query %s failed: %s', key[1], e)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry['explaining'] = False
+                entry['plan'] = plan
+                entry['plan_error'] = error
+                entry['plan_captured_at'] = datetime.utcnow().isoformat()
+
+    def report(self, schema=None):
+        """
+        Get slow statements, most total time first
+
+        Args:
+            schema: Only include entries of this tenant schema
+
+        Returns:
+            list: Entry dicts with mean_ms added
+        """
+        with self._lock:
+            entries = [dict(entry, routes=dict(entry['routes'])) for entry in self.entries.values()
+                       if schema is None or entry['schema'] == schema]
+        for entry in entries:
+            entry.pop('explaining')
+            entry['mean_ms'] = round(entry['total_ms'] / entry['count'], 1)
+            entry['total_ms'] = round(entry['total_ms'], 1)
+            entry['max_ms'] = round(entry['max_ms'], 1)
+        return sorted(entries, key=lambda entry: -entry['total_ms'])
+
+
+slow_query_log = SlowQueryLog()
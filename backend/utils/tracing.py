@@ -0,0 +1,182 @@
+"""Lightweight request tracing: spans, W3C traceparent and exporters"""
+import functools
+import importlib
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+# version-trace_id-parent_id-flags, https://www.w3.org/TR/trace-context/
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def parse_traceparent(value):
+    """
+    Parse a W3C traceparent header
+
+    Returns:
+        tuple: (trace_id, parent_span_id, sampled), or None if invalid
+    """
+    match = _TRACEPARENT.match((value or '').strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def format_traceparent(trace_id, span_id, sampled=True):
+    """Build a W3C traceparent header value"""
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+def new_span_id():
+    return secrets.token_hex(8)
+
+
+def new_trace_id():
+    return secrets.token_hex(16)
+
+
+class Trace:
+    """Spans of one sampled request; at most `max_spans` are kept"""
+
+    def __init__(self, trace_id, max_spans=500):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.spans = []
+        self.stack = []
+        self.dropped = 0
+
+    def start(self, name, attributes=None, parent_id=None):
+        """Open a span under the current one"""
+        span = {
+            'trace_id': self.trace_id,
+            'span_id': new_span_id(),
+            'parent_span_id': self.stack[-1]['span_id'] if self.stack else parent_id,
+            'name': name,
+            'start_time_unix_nano': time.time_ns(),
+            'attributes': dict(attributes or {}),
+            '_started': time.perf_counter(),
+        }
+        self.stack.append(span)
+        return span
+
+    def end(self, span, error=None):
+        """Close a span (and any left open inside it)"""
+        if not any(open_span is span for open_span in self.stack):
+            return
+        if error is not None:
+            span['status'] = 'error'
+            span['attributes']['error'] = f'{type(error).__name__}: {error}'
+        while self.stack:
+            top = self.stack.pop()
+            top['duration_ms'] = round((time.perf_counter() - top.pop('_started')) * 1000, 3)
+            if len(self.spans) < self.max_spans:
+                self.spans.append(top)
+            else:
+                self.dropped += 1
+            if top is span:
+                break
+
+
+def current_trace():
+    """Get the sampled trace of the current request, if any"""
+    return g.get('trace') if has_app_context() else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child span of the current request's trace
+
+    Does nothing when the request is not sampled.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    opened = trace.start(name, attributes)
+    try:
+        yield opened
+    except Exception as e:
+        trace.end(opened, e)
+        raise
+    trace.end(opened)
+
+
+def traced(name):
+    """
+    Decorator recording calls as spans
+
+    Nested calls of the same span name (e.g. User.to_dict inside
+    Project.to_dict) are folded into the outer span.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is None or (trace.stack and trace.stack[-1]['name'] == name):
+                return fn(*args, **kwargs)
+            with span(name, **{'code.function': fn.__qualname__}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class JsonLinesExporter:
+    """
+    Appends finished spans to a local file, one JSON object per line
+
+    Once the file would grow past `max_bytes` it is renamed to
+    `<path>.1` (replacing the previous one) and a new file is started,
+    so at most about twice `max_bytes` is kept on disk.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans):
+        lines = ''.join(json.dumps(s, separators=(',', ':'), default=str) + '\n' for s in spans)
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+                if size and size + len(lines) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+            except FileNotFoundError:
+                # Not written yet, or another worker rotated it first
+                pass
+            with open(self.path, 'a') as f:
+                f.write(lines)
+
+
+def load_exporter(spec, path, max_bytes=50 * 1024 * 1024):
+    """
+    Build the span exporter named by TRACE_EXPORTER
+
+    Args:
+        spec: 'jsonl', 'none', or 'package.module:Class' for a custom
+            exporter (constructed without arguments, with an export(spans)
+            method)
+        path: File for the 'jsonl' exporter
+        max_bytes: Size at which the 'jsonl' exporter rotates its file
+
+    Returns:
+        Exporter instance, or None to drop spans
+    """
+    if not spec or spec == 'none':
+        return None
+    if spec == 'jsonl':
+        return JsonLinesExporter(path, max_bytes)
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,147 @@
+"""Write-behind buffer for low-value, last-writer-wins column updates"""
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+from middleware.tenant_middleware import get_current_tenant
+from utils.flusher import PeriodicFlusher
+from utils.shards import group_by_engine
+
+logger = logging.getLogger(__name__)
+
+# Columns that may be written behind, per table. Values are coalesced by
+# keeping the greatest one, so only monotonic columns (timestamps) belong here.
+WRITE_BEHIND_COLUMNS = {
+    'users': {'last_login'},
+}
+
+
+class WriteBehindBuffer(PeriodicFlusher):
+    """
+    Coalesces timestamp-style updates per row and flushes them in batches
+
+    Repeated touches of the same row between flushes collapse into one
+    pending value. Pending updates are written every `interval` seconds,
+    which bounds how much is lost if a worker dies, and once more at
+    shutdown.
+    """
+
+    name = 'write_behind'
+
+    def __init__(self):
+        super().__init__()
+        self.max_pending = 10000
+        self.batch_size = 500
+        self._pending = {}
+
+    def init_app(self, app):
+        """Initialize buffer with Flask app"""
+        super().init_app(app, app.config['WRITE_BEHIND_FLUSH_INTERVAL_SECONDS'])
+        self.max_pending = app.config['WRITE_BEHIND_MAX_PENDING']
+        self.batch_size = app.config['WRITE_BEHIND_BATCH_SIZE']
+
+    def touch(self, table, row_id, **values):
+        """
+        Queue column updates for a row in the current tenant schema
+
+        Args:
+            table: Table name, must be listed in WRITE_BEHIND_COLUMNS
+            row_id: Primary key of the row
+            **values: Column values; the greatest pending value wins
+        """
+        allowed = WRITE_BEHIND_COLUMNS.get(table, set())
+        unknown = set(values) - allowed
+        if unknown:
+            raise ValueError(f'Columns not allowed for write-behind on {table}: {sorted(unknown)}')
+
+        tenant = get_current_tenant()
+        if tenant is None:
+            return
+
+        key = (tenant.schema_name, table, row_id)
+        with self._lock:
+            self._ensure_running()
+            pending = self._pending.setdefault(key, {})
+            for column, value in values.items():
+                current = pending.get(column)
+                if current is None or (value is not None and value > current):
+                    pending[column] = value
+            if len(self._pending) >= self.max_pending:
+                self.request_flush()
+
+    def pending(self, schema_name, table, row_id):
+        """Get values queued but not yet written for a row"""
+        with self._lock:
+            return dict(self._pending.get((schema_name, table, row_id), {}))
+
+    def _drain(self):
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _restore(self, batch):
+        for key, values in batch.items():
+            pending = self._pending.setdefault(key, {})
+            for column, value in values.items():
+                current = pending.get(column)
+                if current is None or (value is not None and value > current):
+                    pending[column] = value
+
+    def _reset(self):
+        self._pending = {}
+
+    def _write(self, batch):
+        # Group rows that update the same columns of the same table
+        groups = {}
+        for (schema, table, row_id), values in batch.items():
+            columns = tuple(sorted(values))
+            groups.setdefault((schema, table, columns), []).append((row_id, values))
+
+        written = 0
+        failed = {}
+        # One transaction per shard; a failed shard only re-queues its own rows
+        for engine, schemas in group_by_engine({key[0] for key in groups}).items():
+            shard_written = 0
+            try:
+                with engine.begin() as conn:
+                    for (schema, table, columns), rows in groups.items():
+                        if schema not in schemas:
+                            continue
+                        for start in range(0, len(rows), self.batch_size):
+                            chunk = rows[start:start + self.batch_size]
+                            conn.execute(*self._update_statement(schema, table, columns, chunk))
+                            shard_written += len(chunk)
+            except SQLAlchemyError as e:
+                logger.warning('Write-behind flush to shard failed: %s', e)
+                failed.update((key, values) for key, values in batch.items() if key[0] in schemas)
+                continue
+            written += shard_written
+        return written, failed
+
+    def _update_statement(self, schema, table, columns, rows):
+        """Build one UPDATE ... FROM (VALUES ...) for a chunk of rows"""
+        sql_table = db.metadata.tables[table]
+        dialect = db.engine.dialect
+        casts = {column: sql_table.c[column].type.compile(dialect=dialect) for column in columns}
+
+        params = {}
+        value_rows = []
+        for index, (row_id, values) in enumerate(rows):
+            params[f'id_{index}'] = row_id
+            cells = [f':id_{index}']
+            for column in columns:
+                params[f'{column}_{index}'] = values[column]
+                cells.append(f'CAST(:{column}_{index} AS {casts[column]})')
+            value_rows.append('(' + ', '.join(cells) + ')')
+
+        assignments = ', '.join(
+            f'{column} = GREATEST(t.{column}, v.{column})' for column in columns
+        )
+        statement = text(
+            f'UPDATE {schema}.{table} AS t SET {assignments} '
+            f'FROM (VALUES {", ".join(value_rows)}) AS v(id, {", ".join(columns)}) '
+            f'WHERE t.id = v.id'
+        )
+        return statement, params
+
+
+write_behind = WriteBehindBuffer()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { projectAPI, listAPI, taskAPI } from '../../utils/api';
 import './Board.css';
@@ -11,17 +11,140 @@ const Board = () => {
     const [loading, setLoading] = useState(true);
     const [newListName, setNewListName] = useState('');
     const [showNewList, setShowNewList] = useState(false);
+    const cursorRef = useRef(null);
 
+    // Load the board, then apply live changes pushed by the server instead
+    // of refetching it
     useEffect(() => {
-        loadBoard();
+        const controller = new AbortController();
+        let retryTimer = null;
+
+        const connect = async () => {
+            let delay = 3000;
+            try {
+                // Catch up once subscribed, so changes made between the
+                // cursor we hold and the subscription are not missed
+                await projectAPI.streamEvents(projectId, applyChange, controller.signal, catchUp);
+            } catch (error) {
+                if (controller.signal.aborted) return;
+                if (error.status === 401) {
+                    // Refreshing the token failed and the user was logged out
+                    return;
+                }
+                if (error.status === 503 && error.retryAfter) {
+                    // No stream slot free: poll for changes until one is
+                    await catchUp();
+                    delay = error.retryAfter * 1000;
+                } else {
+                    console.error('Board event stream failed:', error);
+                }
+            }
+            if (!controller.signal.aborted) {
+                retryTimer = setTimeout(connect, delay);
+            }
+        };
+
+        const start = async () => {
+            await loadBoard();
+            if (!controller.signal.aborted) {
+                connect();
+            }
+        };
+
+        start();
+        return () => {
+            controller.abort();
+            clearTimeout(retryTimer);
+        };
     }, [projectId]);
 
+    // Fetch only what changed after the cursor we hold
+    const catchUp = async () => {
+        if (cursorRef.current === null) {
+            // The board never loaded, so there is nothing to catch up from
+            await loadBoard();
+            return;
+        }
+        try {
+            let cursor = cursorRef.current;
+            let hasMore = true;
+            while (hasMore) {
+                const { data: delta } = await projectAPI.changes(projectId, cursor);
+                if (delta.project_deleted) {
+                    applyChange({ entity: 'project', op: 'deleted', id: Number(projectId) });
+                    return;
+                }
+                if (delta.project) {
+                    applyChange({ entity: 'project', op: 'updated', id: delta.project.id, data: delta.project });
+                }
+                ['list', 'task'].forEach((entity) => {
+                    const changes = delta[`${entity}s`];
+                    [...changes.created, ...changes.updated].forEach((item) =>
+                        applyChange({ entity, op: 'updated', id: item.id, data: item }));
+                    changes.deleted.forEach((id) => applyChange({ entity, op: 'deleted', id }));
+                });
+                if (delta.members.created.length || delta.members.deleted.length) {
+                    loadBoard();
+                }
+                // Live events may have moved the shared cursor meanwhile
+                cursor = delta.cursor;
+                cursorRef.current = Math.max(cursorRef.current || 0, cursor);
+                hasMore = delta.has_more;
+            }
+        } catch (error) {
+            // Cursor expired or request failed: reload the whole board
+            loadBoard();
+        }
+    };
+
+    const applyChange = (change) => {
+        const { entity, op, id, data } = change;
+
+        if (change.cursor) {
+            cursorRef.current = Math.max(cursorRef.current || 0, change.cursor);
+        }
+
+        // Events without a payload (too large, resync, members) fall back to a reload
+        if ((op !== 'deleted' && !data) || entity === 'member' || entity === 'board') {
+            loadBoard();
+            return;
+        }
+
+        if (entity === 'project') {
+            if (op === 'deleted') {
+                navigate('/dashboard');
+            } else {
+                setProject((current) => ({ ...current, ...data }));
+            }
+        } else if (entity === 'list') {
+            setLists((current) => {
+                if (op === 'deleted') {
+                    return current.filter((list) => list.id !== id);
+                }
+                const existing = current.find((list) => list.id === id);
+                const merged = { tasks: existing?.tasks || [], ...existing, ...data };
+                return [...current.filter((list) => list.id !== id), merged]
+                    .sort((a, b) => a.position - b.position);
+            });
+        } else if (entity === 'task') {
+            setLists((current) => current.map((list) => {
+                const tasks = (list.tasks || []).filter((task) => task.id !== id);
+                if (op !== 'deleted' && data.list_id === list.id) {
+                    tasks.push(data);
+                    tasks.sort((a, b) => a.position - b.position);
+                }
+                return { ...list, tasks };
+            }));
+        }
+    };
+
     const loadBoard = async () => {
         try {
             const [projectRes, listsRes] = await Promise.all([
                 projectAPI.get(projectId),
                 listAPI.getByProject(projectId),
             ]);
+            cursorRef.current = projectRes.data.cursor;
             setProject(projectRes.data);
             setLists(listsRes.data.lists);
         } catch (error) {
@@ -36,10 +159,10 @@ const Board = () => {
         if (!newListName.trim()) return;
 
         try {
-            await listAPI.create(projectId, { name: newListName });
+            const res = await listAPI.create(projectId, { name: newListName });
+            applyChange({ entity: 'list', op: 'created', id: res.data.list.id, data: res.data.list });
             setNewListName('');
             setShowNewList(false);
-            loadBoard();
         } catch (error) {
             console.error('Failed to create list:', error);
         }
@@ -47,8 +170,8 @@ const Board = () => {
 
     const handleCreateTask = async (listId, title) => {
         try {
-            await taskAPI.create(listId, { title });
-            loadBoard();
+            const res = await taskAPI.create(listId, { title });
+            applyChange({ entity: 'task', op: 'created', id: res.data.task.id, data: res.data.task });
         } catch (error) {
             console.error('Failed to create task:', error);
         }
@@ -33,6 +33,21 @@ api.interceptors.request.use((config) => {
     return config;
 });
 
+// Exchange the refresh token for a new access token; on failure, log out
+const refreshAccessToken = async () => {
+    try {
+        const response = await axios.post(`${API_BASE_URL}/auth/refresh`, {}, {
+            headers: { Authorization: `Bearer ${localStorage.getItem('refresh_token')}` }
+        });
+        localStorage.setItem('access_token', response.data.access_token);
+        return response.data.access_token;
+    } catch (refreshError) {
+        localStorage.clear();
+        window.location.href = '/login';
+        throw refreshError;
+    }
+};
+
 // Handle token refresh
 api.interceptors.response.use(
     (response) => response,
@@ -42,22 +57,10 @@ api.interceptors.response.use(
         if (error.response?.status === 401 && !originalRequest._retry) {
             originalRequest._retry = true;
 
-            const refreshToken = localStorage.getItem('refresh_token');
-            if (refreshToken) {
-                try {
-                    const response = await axios.post(`${API_BASE_URL}/auth/refresh`, {}, {
-                        headers: { Authorization: `Bearer ${refreshToken}` }
-                    });
-
-                    localStorage.setItem('access_token', response.data.access_token);
-                    originalRequest.headers.Authorization = `Bearer ${response.data.access_token}`;
-
-                    return api(originalRequest);
-                } catch (refreshError) {
-                    localStorage.clear();
-                    window.location.href = '/login';
-                    return Promise.reject(refreshError);
-                }
+            if (localStorage.getItem('refresh_token')) {
+                const accessToken = await refreshAccessToken();
+                originalRequest.headers.Authorization = `Bearer ${accessToken}`;
+                return api(originalRequest);
             }
         }
 
@@ -65,11 +68,69 @@ api.interceptors.response.use(
     }
 );
 
+const streamHeaders = () => {
+    const headers = { Accept: 'text/event-stream' };
+    const subdomain = localStorage.getItem('tenant_subdomain');
+    if (subdomain) {
+        headers['X-Tenant-Subdomain'] = subdomain;
+    }
+    const token = localStorage.getItem('access_token');
+    if (token) {
+        headers.Authorization = `Bearer ${token}`;
+    }
+    return headers;
+};
+
+// Stream Server-Sent Events with the same auth/tenant headers as axios.
+// EventSource cannot send custom headers, so the stream is read with fetch.
+// onOpen runs once the server has subscribed us, before any event is read.
+export const streamEvents = async (path, onEvent, signal, onOpen) => {
+    let response = await fetch(`${API_BASE_URL}${path}`, { headers: streamHeaders(), signal });
+    if (response.status === 401 && localStorage.getItem('refresh_token')) {
+        // Expired access token: refresh it like the axios interceptor does
+        await refreshAccessToken();
+        response = await fetch(`${API_BASE_URL}${path}`, { headers: streamHeaders(), signal });
+    }
+    if (!response.ok) {
+        const error = new Error(`Event stream failed with status ${response.status}`);
+        error.status = response.status;
+        // 503: the server has no stream slot free; poll until Retry-After
+        error.retryAfter = Number(response.headers.get('Retry-After')) || null;
+        throw error;
+    }
+
+    onOpen?.();
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const data = frame
+                .split('\n')
+                .filter((line) => line.startsWith('data: '))
+                .map((line) => line.slice(6))
+                .join('\n');
+            if (data) {
+                onEvent(JSON.parse(data));
+            }
+        }
+    }
+};
+
 // Auth API
 export const authAPI = {
     register: (data) => api.post('/auth/register', data),
     login: (data) => api.post('/auth/login', data),
-    logout: () => api.post('/auth/logout'),
+    logout: () => api.post('/auth/logout', { refresh_token: localStorage.getItem('refresh_token') }),
     getCurrentUser: () => api.get('/auth/me'),
 };
 
@@ -100,6 +161,11 @@ export const projectAPI = {
     delete: (id) => api.delete(`/projects/${id}`),
     addMember: (id, userId) => api.post(`/projects/${id}/members`, { user_id: userId }),
     removeMember: (id, userId) => api.delete(`/projects/${id}/members/${userId}`),
+    changes: (id, since) => api.get(`/projects/${id}/changes`, { params: { since } }),
+    // Archived (old completed) tasks, newest first; pass next_before for older pages
+    archive: (id, before) => api.get(`/projects/${id}/archive`, { params: { before } }),
+    archivedTask: (id, taskId, before) => api.get(`/projects/${id}/archive/${taskId}`, { params: { before } }),
+    streamEvents: (id, onEvent, signal, onOpen) => streamEvents(`/projects/${id}/events`, onEvent, signal, onOpen),
 };
 
 // List API
@@ -120,6 +186,15 @@ export const taskAPI = {
     move: (id, listId, position) => api.put(`/tasks/${id}/move`, { list_id: listId, position }),
     getByList: (listId) => api.get(`/tasks/lists/${listId}/tasks`),
     addComment: (id, content) => api.post(`/tasks/${id}/comments`, { content }),
+    // Newest first; pass the previous page's next_before to load older comments
+    getComments: (id, before) => api.get(`/tasks/${id}/comments`, { params: { before } }),
+    deleteComment: (id, commentId) => api.delete(`/tasks/${id}/comments/${commentId}`),
+};
+
+// Batch API: run several calls in one round trip. Each operation is
+// { method, path, body }; paths may reference earlier results ("$0.list.id").
+export const batchAPI = {
+    run: (operations, atomic = false) => api.post('/batch', { operations, atomic }),
 };
 
 export default api;